@@ -0,0 +1,337 @@
+"""The signed-in user's profile, settings and avatar."""
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from functools import partial
+import io
+import json
+import multiprocessing
+import os
+
+from flask import Blueprint, current_app, flash, redirect, render_template, request, send_from_directory, url_for
+from flask_login import current_user, login_required, logout_user
+from werkzeug.security import check_password_hash, generate_password_hash
+
+import avatars
+from extensions import db
+from mailer import send_template_email
+from models import User
+from social import friend_graph
+
+bp = Blueprint('account', __name__)
+
+@bp.route('/profile')
+@login_required
+def profile():
+    """Display the current user's profile"""
+    # Get user's friend count
+    friend_count = len(friend_graph().friend_ids(current_user.id))
+    
+    # Get recent scores/games (replace with your actual Score/Game model queries)
+    # Assuming you have a Score model - adjust based on your actual implementation
+    recent_scores = []
+    try:
+        recent_scores = current_user.scores[-5:] if hasattr(current_user, 'scores') else []
+    except:
+        recent_scores = []
+    
+    # Get recent games played (replace with your actual UserGame model queries)
+    recent_games = []
+    try:
+        recent_games = current_user.games[-5:] if hasattr(current_user, 'games') else []
+    except:
+        recent_games = []
+    
+    # Calculate additional stats
+    profile_stats = {
+        'account_age': current_user.get_account_age(),
+        'win_rate': current_user.get_win_rate(),
+        'friend_count': friend_count,
+        'total_coins': current_user.coins,
+        'games_played': current_user.games_played,
+        'wins': current_user.wins,
+        'high_score': current_user.high_score,
+        'last_login': current_user.last_login.strftime('%B %d, %Y at %I:%M %p') if current_user.last_login else 'Never'
+    }
+    
+    return render_template('profile.html', 
+                         user=current_user,
+                         stats=profile_stats,
+                         recent_scores=recent_scores,
+                         recent_games=recent_games,
+                         notification_settings=current_user.get_notification_settings())
+
+def allowed_file(filename):
+    return '.' in filename and \
+           filename.rsplit('.', 1)[1].lower() in current_app.config['ALLOWED_EXTENSIONS']
+
+def avatar_pool():
+    """Return the process pool that decodes and resizes avatar uploads.
+
+    The pool is created on first use inside a threaded server, so its
+    workers are spawned rather than forked from a process with live threads.
+    """
+    pool = current_app.extensions.get('avatar_pool')
+    if pool is None:
+        pool = current_app.extensions['avatar_pool'] = ProcessPoolExecutor(
+            max_workers=current_app.config['AVATAR_WORKERS'], mp_context=multiprocessing.get_context('spawn'))
+    return pool
+
+@bp.app_template_global()
+def avatar_url(avatar, size=150, fmt='webp'):
+    """URL of an avatar at `size` px; legacy single-file avatars are served as is"""
+    if avatars.is_variant_key(avatar):
+        filename = avatars.variant_name(avatar, size, fmt)
+    else:
+        filename = avatar or avatars.DEFAULT_AVATAR
+    return url_for('account.avatar_file', filename=filename)
+
+@bp.route('/avatars/<path:filename>')
+def avatar_file(filename):
+    """Serve avatar files; content-addressed variants are cached for a year"""
+    immutable = avatars.is_variant_key(filename.split('-', 1)[0])
+    response = send_from_directory(current_app.config['UPLOAD_FOLDER'], filename,
+                                   max_age=31536000 if immutable else 3600)
+    response.cache_control.public = True
+    if immutable:
+        response.cache_control.immutable = True
+    return response
+
+@bp.app_template_global()
+def avatar_has_variants(avatar):
+    return avatars.is_variant_key(avatar)
+
+def remove_avatar_files(avatar):
+    """Delete an avatar's files once no user refers to them.
+
+    Avatars are shared between users who upload the same picture, so the
+    users still pointing at it act as its reference count. The default
+    avatar is never removed.
+    """
+    if not avatar or avatar == avatars.DEFAULT_AVATAR:
+        return
+    if User.query.filter_by(avatar=avatar).first() is not None:
+        return
+    if avatars.is_variant_key(avatar):
+        paths = avatars.variant_paths(current_app.config['UPLOAD_FOLDER'], avatar)
+    else:
+        paths = [os.path.join(current_app.config['UPLOAD_FOLDER'], avatar)]
+    for path in paths:
+        try:
+            os.remove(path)
+        except OSError:
+            pass  # We can continue even if deletion fails
+
+def process_avatar_upload(user, data):
+    """Resize an uploaded avatar in the process pool, then switch the user to it.
+
+    The user keeps their current avatar until every variant has been written,
+    so pages never link to files that do not exist yet.
+    """
+    future = avatar_pool().submit(avatars.process_avatar, data, current_app.config['UPLOAD_FOLDER'])
+    future.add_done_callback(partial(_avatar_processed, current_app._get_current_object(), user.id, data))
+
+def _avatar_processed(app, user_id, data, future):
+    # Runs on the pool's management thread, outside any request
+    with app.app_context():
+        error = future.exception()
+        if error is not None:
+            current_app.logger.error(f"Avatar processing failed for user {user_id}: {error}")
+            return
+        key = future.result()
+        # Replace whatever avatar the user has now, which may be another upload
+        # that finished first; only switch if nothing changed it in between
+        while True:
+            row = db.session.execute(db.select(User.avatar).where(User.id == user_id)).first()
+            if row is None:
+                db.session.rollback()
+                return  # the account was deleted
+            old_avatar = row.avatar
+            updated = User.query.filter_by(id=user_id, avatar=old_avatar).update({User.avatar: key})
+            db.session.commit()
+            if updated:
+                break
+        if old_avatar != key:
+            remove_avatar_files(old_avatar)
+        # Another user may have dropped the last reference to these files
+        # between the pool finding them and the update above; write them again
+        if not avatars.variants_exist(current_app.config['UPLOAD_FOLDER'], key):
+            avatar_pool().submit(avatars.process_avatar, data, current_app.config['UPLOAD_FOLDER'])
+
+@bp.route('/settings')
+@login_required
+def settings():
+    # Pass the current time for displaying session info
+    current_time = datetime.now()
+    
+    # Load notification settings from JSON string to dict
+    if current_user.notification_settings:
+        try:
+            notifications = json.loads(current_user.notification_settings)
+        except:
+            notifications = {"email": [], "push": []}
+    else:
+        notifications = {"email": [], "push": []}
+    
+    return render_template('settings.html', current_time=current_time, notifications=notifications)
+
+@bp.route('/update_profile', methods=['POST'])
+@login_required
+def update_profile():
+    if request.method == 'POST':
+        # Validate username uniqueness if it's changed
+        new_username = request.form.get('username')
+        if new_username != current_user.username:
+            user_check = User.query.filter_by(username=new_username).first()
+            if user_check:
+                flash('Username already exists.', 'danger')
+                return redirect(url_for('account.settings'))
+        
+        # Validate email uniqueness if it's changed
+        new_email = request.form.get('email')
+        if new_email != current_user.email:
+            email_check = User.query.filter_by(email=new_email).first()
+            if email_check:
+                flash('Email already registered.', 'danger')
+                return redirect(url_for('account.settings'))
+            
+            # Email changed, need to verify again
+            current_user.email_confirmed = False
+            current_user.email = new_email
+            
+            # Send verification email
+            token = current_user.get_token()
+            verify_url = url_for('auth.confirm_email', token=token, _external=True)
+            
+            email_sent = send_template_email('verify_email', [new_email], verify_url=verify_url, new_address=True)
+            
+            if email_sent:
+                flash('Email updated! Please verify your new email address. Check your inbox.', 'warning')
+            else:
+                flash('Email updated but verification email could not be sent. Please contact support.', 'warning')
+        
+        # Update username
+        current_user.username = new_username
+        
+        # Update bio
+        current_user.bio = request.form.get('bio', '')
+        
+        # Handle profile picture upload
+        if 'avatar' in request.files:
+            avatar_file = request.files['avatar']
+            if avatar_file and avatar_file.filename:
+                if allowed_file(avatar_file.filename):
+                    data = avatar_file.read()
+                    # Only the header is read here; decoding happens in the pool
+                    from PIL import Image, UnidentifiedImageError
+                    try:
+                        Image.open(io.BytesIO(data))
+                    except (UnidentifiedImageError, OSError):
+                        flash('That file is not an image we can read.', 'danger')
+                        return redirect(url_for('account.settings'))
+                    process_avatar_upload(current_user, data)
+                    flash('Your new profile picture is being processed and will appear shortly.', 'info')
+                else:
+                    flash('Invalid file type. Please upload PNG, JPG, JPEG, or GIF files.', 'danger')
+                    return redirect(url_for('account.settings'))
+        
+        # Save all changes
+        db.session.commit()
+        flash('Your profile has been updated!', 'success')
+        return redirect(url_for('account.settings'))
+
+@bp.route('/change_password', methods=['POST'])
+@login_required
+def change_password():
+    if request.method == 'POST':
+        current_password = request.form.get('current_password')
+        new_password = request.form.get('new_password')
+        confirm_password = request.form.get('confirm_password')
+        
+        # Verify current password
+        if not check_password_hash(current_user.password, current_password):
+            flash('Current password is incorrect.', 'danger')
+            return redirect(url_for('account.settings'))
+        
+        # Verify new passwords match
+        if new_password != confirm_password:
+            flash('New passwords do not match.', 'danger')
+            return redirect(url_for('account.settings'))
+        
+        current_user.password = generate_password_hash(new_password, method='pbkdf2:sha256')
+        db.session.commit()
+        
+        flash('Your password has been updated!', 'success')
+        return redirect(url_for('account.settings'))
+
+@bp.route('/update_appearance', methods=['POST'])
+@login_required
+def update_appearance():
+    if request.method == 'POST':
+        theme = request.form.get('theme')
+        accent_color = request.form.get('accent_color', 'blue')
+        
+        current_user.theme = theme
+        current_user.accent_color = accent_color
+        db.session.commit()
+        
+        flash('Appearance settings saved!', 'success')
+        return redirect(url_for('account.settings'))
+
+@bp.route('/update_notifications', methods=['POST'])
+@login_required
+def update_notifications():
+    if request.method == 'POST':
+        email_notifications = request.form.getlist('notifications[]')
+        push_notifications = request.form.getlist('push_notifications[]')
+        
+        notification_settings = {
+            'email': email_notifications,
+            'push': push_notifications
+        }
+        
+        current_user.notification_settings = json.dumps(notification_settings)
+        db.session.commit()
+        
+        flash('Notification settings updated!', 'success')
+        return redirect(url_for('account.settings'))
+
+@bp.route('/logout_all', methods=['POST'])
+@login_required
+def logout_all():
+    # In a real application, you'd invalidate all sessions here
+    # For this example, we'll just log out the current user
+    logout_user()
+    flash('You have been logged out from all devices.', 'info')
+    return redirect(url_for('auth.login'))
+
+@bp.route('/delete_account', methods=['POST'])
+@login_required
+def delete_account():
+    password = request.form.get('password')
+    
+    # Verify password
+    if not check_password_hash(current_user.password, password):
+        flash('Password is incorrect.', 'danger')
+        return redirect(url_for('account.settings'))
+    
+    
+    user_id = current_user.id
+    
+    logout_user()
+    
+    # Delete user's data 
+    user = User.query.get(user_id)
+    
+    
+    # Delete user from database
+    avatar = user.avatar
+    graph = friend_graph()
+    friend_ids = graph.friend_ids(user_id)
+    db.session.delete(user)
+    db.session.commit()
+    # Their friends' cached friend lists and leaderboards still show them
+    graph.invalidate(user_id, *friend_ids)
+    remove_avatar_files(avatar)
+    
+    flash('Your account has been permanently deleted.', 'info')
+    return redirect(url_for('main.home'))
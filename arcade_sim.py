@@ -0,0 +1,279 @@
+"""Monte Carlo return-to-player simulator for the arcade games.
+
+Usage:
+    flask --app app arcade-sim slots --rounds 1e8
+    flask --app app arcade-sim mines --mines 5 --reveals 8
+    flask --app app arcade-sim all --rounds 1e7 --workers 8
+
+Payout parameters are imported from paytables, mines_odds and blackjack_engine,
+the same modules the game routes use, so the numbers reported here are the
+live ones. Each round is played out the way the routes play it (mines placed
+on a shuffled grid, a safe spot drawn per rung, a pop time drawn from the
+hazard curve) rather than sampled from the odds it is meant to check.
+Rounds are drawn in NumPy batches, spread over a process pool, and partial
+results are printed as chunks finish.
+"""
+import argparse
+import itertools
+import math
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import blackjack_engine
+import mines_odds
+import paytables
+
+GAMES = ['slots', 'plinko', 'mines', 'ladder', 'balloon', 'blackjack']
+BLACKJACK_DECK = np.frombuffer(blackjack_engine.FRESH_DECK, dtype=np.uint8).astype(np.int8)
+BLACKJACK_BATCH = 50000  # hands shuffled at once; bounds memory for 8-deck shoes
+MINES_BATCH = 200000  # boards shuffled at once
+
+
+def simulate_slots(rng, n, opts):
+    weights = np.array(paytables.SLOT_WEIGHTS)
+    symbols = len(paytables.SLOT_SYMBOLS)
+    reels = rng.choice(symbols, size=(n, 3), p=weights / weights.sum())
+
+    # Same lookup the spin routes use, indexed by the reels read as base-N digits
+    table = np.array(paytables.SLOT_MULTIPLIER_TABLE)
+    multipliers = table[paytables.slot_index(reels[:, 0], reels[:, 1], reels[:, 2])]
+    return opts.bet * multipliers
+
+
+def simulate_plinko(rng, n, opts):
+    # Each ball is an unbiased left/right bounce per row, exactly as PlinkoEngine draws it
+    payouts = np.array(paytables.PLINKO_PAYOUTS[opts.rows])
+    slots = rng.binomial(opts.rows, 0.5, size=n)
+    return np.floor(opts.bet * payouts[slots])
+
+
+def simulate_mines(rng, n, opts):
+    return np.concatenate([
+        _simulate_mines_batch(rng, min(MINES_BATCH, n - start), opts)
+        for start in range(0, n, MINES_BATCH)
+    ])
+
+
+def _simulate_mines_batch(rng, n, opts):
+    # Each board places its mines like the route's random.sample: the first opts.mines
+    # tiles of a shuffled grid. The player opens tiles 0..reveals-1 and cashes out.
+    tiles = np.tile(np.arange(mines_odds.GRID_SIZE, dtype=np.int8), (n, 1))
+    mine_positions = rng.permuted(tiles, axis=1)[:, :opts.mines]
+    hit = (mine_positions < opts.reveals).any(axis=1)
+    payout = int(opts.bet * mines_odds.multiplier(opts.mines, opts.reveals))
+    return np.where(hit, 0, payout)
+
+
+def simulate_ladder(rng, n, opts):
+    # Every rung shuffles the three spots and makes the first opts.safe_spots safe, as
+    # random.sample does in ladder_pick; the player picks a spot at random and cashes out
+    # on reaching opts.level
+    rungs = opts.level - 1
+    spots = np.tile(np.arange(3, dtype=np.int8), (n, rungs, 1))
+    safes = rng.permuted(spots, axis=2)[:, :, :opts.safe_spots]
+    choices = rng.integers(3, size=(n, rungs, 1), dtype=np.int8)
+    climbed = (safes == choices).any(axis=2).all(axis=1)
+    payout = int(opts.bet * paytables.next_multiplier(opts.level, opts.safe_spots))
+    return np.where(climbed, payout, 0)
+
+
+def balloon_pop_times(rng, n):
+    """Draw `n` pop times, stepping every balloon through the hazard curve as balloon_pop_time does"""
+    steps = np.zeros(n, dtype=np.int32)
+    flying = np.arange(n)
+    step = 0
+    while flying.size:
+        step += 1
+        pops = rng.random(flying.size) < paytables.balloon_pop_chance(step * paytables.BALLOON_HAZARD_STEP)
+        steps[flying[pops]] = step
+        flying = flying[~pops]
+    return steps * paytables.BALLOON_HAZARD_STEP
+
+
+def simulate_balloon(rng, n, opts):
+    # The cashout only pays if the server clock has not reached the pop time yet
+    popped = balloon_pop_times(rng, n) <= opts.cashout_time
+    payout = int(opts.bet * paytables.balloon_multiplier(opts.cashout_time))
+    return np.where(popped, 0, payout)
+
+
+def _blackjack_score(total, aces):
+    return np.where((aces > 0) & (total + 10 <= 21), total + 10, total)
+
+
+def simulate_blackjack(rng, n, opts):
+    return np.concatenate([
+        _simulate_blackjack_batch(rng, min(BLACKJACK_BATCH, n - start), opts)
+        for start in range(0, n, BLACKJACK_BATCH)
+    ])
+
+
+def _simulate_blackjack_batch(rng, n, opts):
+    # Each hand comes off a freshly shuffled shoe; the player hits below opts.stand_on
+    cards = rng.permuted(np.tile(BLACKJACK_DECK, (n, opts.decks)), axis=1)
+    rows = np.arange(n)
+    player_total = cards[:, 0] + cards[:, 1]
+    player_aces = (cards[:, 0] == 1).astype(np.int8) + (cards[:, 1] == 1)
+    dealer_total = cards[:, 2] + cards[:, 3]
+    dealer_aces = (cards[:, 2] == 1).astype(np.int8) + (cards[:, 3] == 1)
+    next_card = np.full(n, 4)
+
+    while True:
+        hitting = _blackjack_score(player_total, player_aces) < opts.stand_on
+        if not hitting.any():
+            break
+        card = cards[rows, next_card]
+        player_total += np.where(hitting, card, 0)
+        player_aces += hitting & (card == 1)
+        next_card += hitting
+    player_score = _blackjack_score(player_total, player_aces)
+    busted = player_score > 21
+
+    # The dealer only plays hands that did not bust
+    while True:
+        hitting = ~busted & (_blackjack_score(dealer_total, dealer_aces) < blackjack_engine.DEALER_STANDS_ON)
+        if not hitting.any():
+            break
+        card = cards[rows, next_card]
+        dealer_total += np.where(hitting, card, 0)
+        dealer_aces += hitting & (card == 1)
+        next_card += hitting
+    dealer_score = _blackjack_score(dealer_total, dealer_aces)
+
+    won = ~busted & ((dealer_score > 21) | (player_score > dealer_score))
+    pushed = ~busted & (player_score == dealer_score)
+    return np.where(won, 2 * opts.bet, np.where(pushed, opts.bet, 0))
+
+
+SIMULATORS = {
+    'slots': simulate_slots,
+    'plinko': simulate_plinko,
+    'mines': simulate_mines,
+    'ladder': simulate_ladder,
+    'balloon': simulate_balloon,
+    'blackjack': simulate_blackjack,
+}
+
+
+def run_chunk(game, n, seed, opts):
+    """Simulate `n` rounds and summarize them so chunks can be merged in order.
+
+    Net results are in units of the stake. Returns (rounds, sum, sum of squares,
+    final balance, highest balance, lowest balance, max drawdown), where the
+    balances are relative to the start of the chunk.
+    """
+    rng = np.random.default_rng(seed)
+    net = SIMULATORS[game](rng, n, opts) / opts.bet - 1.0
+    balance = np.concatenate(([0.0], np.cumsum(net)))
+    drawdown = (np.maximum.accumulate(balance) - balance).max()
+    return (n, net.sum(), np.square(net).sum(), balance[-1], balance.max(), balance.min(), drawdown)
+
+
+def merge_chunks(a, b):
+    """Combine the summaries of two consecutive chunks"""
+    n_a, sum_a, sq_a, end_a, high_a, low_a, dd_a = a
+    n_b, sum_b, sq_b, end_b, high_b, low_b, dd_b = b
+    return (
+        n_a + n_b,
+        sum_a + sum_b,
+        sq_a + sq_b,
+        end_a + end_b,
+        max(high_a, end_a + high_b),
+        min(low_a, end_a + low_b),
+        max(dd_a, dd_b, high_a - (end_a + low_b)),
+    )
+
+
+def describe(summary):
+    n, total, squares, _, _, _, drawdown = summary
+    mean = total / n
+    variance = squares / n - mean ** 2
+    half_width = 1.96 * math.sqrt(max(variance, 0.0) / n)
+    return {
+        'rounds': n,
+        'rtp': 1.0 + mean,
+        'rtp_ci': half_width,
+        'house_edge': -mean,
+        'variance': variance,
+        'max_drawdown': drawdown,
+    }
+
+
+def format_report(game, stats, elapsed):
+    return (
+        f"{game:<10} rounds={stats['rounds']:,}  "
+        f"RTP={stats['rtp'] * 100:.4f}% ±{stats['rtp_ci'] * 100:.4f}  "
+        f"edge={stats['house_edge'] * 100:.4f}%  "
+        f"var={stats['variance']:.4f}  "
+        f"max_drawdown={stats['max_drawdown']:,.1f} bets  "
+        f"({elapsed:.1f}s)"
+    )
+
+
+def simulate(game, opts, executor, out=sys.stdout):
+    """Run opts.rounds rounds of `game` across the pool and return the final stats"""
+    chunk_sizes = [opts.chunk_size] * (opts.rounds // opts.chunk_size)
+    if opts.rounds % opts.chunk_size:
+        chunk_sizes.append(opts.rounds % opts.chunk_size)
+    seeds = np.random.SeedSequence(opts.seed).spawn(len(chunk_sizes))
+
+    start = last_report = time.perf_counter()
+    summary = None
+    # map() yields in submission order, which the drawdown merge relies on
+    for result in executor.map(run_chunk, itertools.repeat(game), chunk_sizes, seeds, itertools.repeat(opts)):
+        summary = result if summary is None else merge_chunks(summary, result)
+        now = time.perf_counter()
+        if now - last_report >= opts.progress_interval and summary[0] < opts.rounds:
+            print('  ... ' + format_report(game, describe(summary), now - start), file=out, flush=True)
+            last_report = now
+
+    stats = describe(summary)
+    print(format_report(game, stats, time.perf_counter() - start), file=out, flush=True)
+    return stats
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog='flask arcade-sim', description=__doc__.splitlines()[0])
+    parser.add_argument('game', choices=GAMES + ['all'])
+    parser.add_argument('--rounds', type=lambda v: int(float(v)), default=10 ** 7, help='rounds per game (accepts 1e8)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--chunk-size', type=lambda v: int(float(v)), default=10 ** 6)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--bet', type=int, default=100, help='stake per round; payouts are truncated to whole coins')
+    parser.add_argument('--progress-interval', type=float, default=1.0, help='seconds between partial results')
+    parser.add_argument('--rows', type=int, default=paytables.PLINKO_DEFAULT_ROWS, choices=sorted(paytables.PLINKO_PAYOUTS))
+    parser.add_argument('--mines', type=int, default=3)
+    parser.add_argument('--reveals', type=int, default=5, help='safe tiles revealed before cashing out')
+    parser.add_argument('--safe-spots', type=int, default=1, choices=[1, 2])
+    parser.add_argument('--level', type=int, default=3, help='Ladder Climb level to cash out at')
+    parser.add_argument('--cashout-time', type=float, default=5.0, help='Balloon Rise seconds before cashing out')
+    parser.add_argument('--stand-on', type=int, default=17, help='blackjack player stands at this score')
+    parser.add_argument('--decks', type=int, default=blackjack_engine.DEFAULT_DECKS,
+                        choices=range(blackjack_engine.MIN_DECKS, blackjack_engine.MAX_DECKS + 1))
+    opts = parser.parse_args(argv)
+
+    if not mines_odds.MIN_MINES <= opts.mines <= mines_odds.MAX_MINES:
+        parser.error(f'--mines must be between {mines_odds.MIN_MINES} and {mines_odds.MAX_MINES}')
+    if not 0 <= opts.reveals <= mines_odds.GRID_SIZE - opts.mines:
+        parser.error('--reveals cannot exceed the number of safe tiles')
+    if opts.level < 1:
+        parser.error('--level must be at least 1')
+    if opts.rounds < 1 or opts.chunk_size < 1:
+        parser.error('--rounds and --chunk-size must be positive')
+    return opts
+
+
+def main(argv=None):
+    opts = parse_args(argv)
+    games = GAMES if opts.game == 'all' else [opts.game]
+    with ProcessPoolExecutor(max_workers=opts.workers) as executor:
+        for game in games:
+            simulate(game, opts, executor)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,219 @@
+"""Accounts: registration, email verification, login and password resets."""
+from datetime import datetime
+from functools import wraps
+
+from flask import Blueprint, current_app, flash, redirect, render_template, request, session, url_for
+from flask_login import current_user, login_required, login_user, logout_user
+from werkzeug.security import check_password_hash, generate_password_hash
+
+from extensions import db
+from mailer import send_template_email
+from models import User
+
+bp = Blueprint('auth', __name__)
+
+ADMIN_EMAILS = {'rosui@packer.edu','luarnaiz@packer.edu'} 
+
+def admin_required(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if not current_user.is_authenticated:
+            flash(('error', 'Please log in to access this page.'))
+            return redirect(url_for('auth.login'))
+        if current_user.email not in ADMIN_EMAILS:
+            flash('You do not have permission to access this page.', category='error')
+            return redirect(url_for('main.home'))
+        return f(*args, **kwargs)
+    return decorated_function
+
+@bp.route('/login', methods=['GET', 'POST'])
+def login():
+    if current_user.is_authenticated:
+        return redirect(url_for('main.home'))
+    
+    if request.method == 'POST':
+        email = request.form.get('email')
+        password = request.form.get('password')
+        remember = True if request.form.get('remember') else False
+        
+        user = User.query.filter_by(email=email).first()
+        
+        if not user or not check_password_hash(user.password, password):
+            flash('Please check your login details and try again.', 'danger')
+            return redirect(url_for('auth.login'))
+        
+        if not user.email_confirmed:
+            flash('Please verify your email before logging in. Check your inbox for the verification link.', 'warning')
+            
+            # Option to resend verification email
+            resend_url = url_for('auth.resend_confirmation')
+            flash(f'If you did not receive the email, <a href="{resend_url}">click here to resend</a>.', 'info')
+            return redirect(url_for('auth.login'))
+
+        
+        login_user(user, remember=remember)
+        session['theme'] = user.theme
+        next_page = request.args.get('next')
+        current_user.last_login = datetime.now()
+        db.session.commit()
+        return redirect(next_page) if next_page else redirect(url_for('main.home'))
+    
+    return render_template('login.html')
+
+@bp.route('/register', methods=['GET', 'POST'])
+def register():
+    if current_user.is_authenticated:
+        return redirect(url_for('main.home'))
+    
+    if request.method == 'POST':
+        username = request.form.get('username')
+        email = request.form.get('email')
+        password = request.form.get('password')
+        confirm_password = request.form.get('confirm_password')
+        
+        # Validation
+        user_check = User.query.filter_by(username=username).first()
+        if user_check:
+            flash('Username already exists.', 'danger')
+            return redirect(url_for('auth.register'))
+            
+        email_check = User.query.filter_by(email=email).first()
+        if email_check:
+            flash('Email already registered.', 'danger')
+            return redirect(url_for('auth.register'))
+            
+        if password != confirm_password:
+            flash('Passwords do not match.', 'danger')
+            return redirect(url_for('auth.register'))
+            
+        # Create new user
+        new_user = User(
+            username=username,
+            email=email,
+            password=generate_password_hash(password, method='pbkdf2:sha256'),
+            email_confirmed=False
+        )
+        
+        db.session.add(new_user)
+        db.session.commit()
+        
+        # Generate token and send verification email
+        token = new_user.get_token()
+        verify_url = url_for('auth.confirm_email', token=token, _external=True)
+        
+        email_sent = send_template_email('verify_email', [email], verify_url=verify_url, welcome=True)
+        db.session.commit()
+        
+        if email_sent:
+            flash('Your account has been created! Please check your email to verify your account.', 'success')
+        else:
+            flash('Your account has been created, but we could not send a verification email. Please contact support.', 'warning')
+            
+        return redirect(url_for('auth.login'))
+    
+    return render_template('register.html')
+
+@bp.route('/confirm_email/<token>')
+def confirm_email(token):
+    user = User.verify_email_token(token)
+    
+    if not user:
+        flash('The confirmation link is invalid or has expired.', 'danger')
+        return redirect(url_for('auth.login'))
+        
+    if user.email_confirmed:
+        flash('Your email has already been verified. Please login.', 'info')
+        return redirect(url_for('auth.login'))
+        
+    user.email_confirmed = True
+    db.session.commit()
+    
+    flash('Your email has been verified! You can now log in.', 'success')
+    return redirect(url_for('auth.login'))
+
+@bp.route('/resend_confirmation', methods=['GET', 'POST'])
+def resend_confirmation():
+    if current_user.is_authenticated:
+        return redirect(url_for('main.home'))
+    
+    if request.method == 'POST':
+        email = request.form.get('email')
+        user = User.query.filter_by(email=email).first()
+        
+        if user and not user.email_confirmed:
+            token = user.get_token()
+            verify_url = url_for('auth.confirm_email', token=token, _external=True)
+            
+            email_sent = send_template_email('verify_email', [email], verify_url=verify_url)
+            db.session.commit()
+            
+            if email_sent:
+                flash('A new verification email has been sent. Please check your inbox.', 'success')
+            else:
+                flash('We could not send a verification email. Please try again later.', 'danger')
+        else:
+            # Don't reveal if email exists for security
+            flash('If this email is registered and not verified, a new verification link has been sent.', 'info')
+            
+        return redirect(url_for('auth.login'))
+    
+    return render_template('resend_confirmation.html')
+
+@bp.route('/logout')
+@login_required
+def logout():
+    logout_user()
+    flash('You have been logged out.', 'info')
+
+    return redirect(url_for('main.home'))
+
+@bp.route('/reset_request', methods=['GET', 'POST'])
+def reset_request():
+    if current_user.is_authenticated:
+        return redirect(url_for('main.home'))
+    
+    if request.method == 'POST':
+        email = request.form.get('email')
+        user = User.query.filter_by(email=email).first()
+        
+        if user:
+            token = user.get_reset_token()
+            reset_url = url_for('auth.reset_token', token=token, _external=True)
+            
+            email_sent = send_template_email('reset_password', [email], reset_url=reset_url)
+            db.session.commit()
+            
+            if not email_sent:
+                current_app.logger.error(f"Failed to send password reset email to {email}")
+        
+        # Don't reveal if email exists for security
+        flash('If an account with that email exists, we\'ve sent instructions to reset your password.', 'info')
+        return redirect(url_for('auth.login'))
+    
+    return render_template('reset_request.html')
+
+@bp.route('/reset_password/<token>', methods=['GET', 'POST'])
+def reset_token(token):
+    if current_user.is_authenticated:
+        return redirect(url_for('main.home'))
+    
+    user = User.verify_reset_token(token)
+    if not user:
+        flash('Invalid or expired token.', 'warning')
+        return redirect(url_for('auth.reset_request'))
+    
+    if request.method == 'POST':
+        password = request.form.get('password')
+        confirm_password = request.form.get('confirm_password')
+        
+        if password != confirm_password:
+            flash('Passwords do not match.', 'danger')
+            return redirect(url_for('auth.reset_token', token=token))
+        
+        user.password = generate_password_hash(password, method='pbkdf2:sha256')
+        db.session.commit()
+        
+        flash('Your password has been updated! You can now log in.', 'success')
+        return redirect(url_for('auth.login'))
+    
+    return render_template('reset_token.html', token=token)
@@ -0,0 +1,78 @@
+"""Avatar image processing, meant to run in a worker process.
+
+An upload is decoded once, cropped to a centred square and written out at
+every size in AVATAR_SIZES as both WebP and PNG. Files are named after a
+hash of the normalized pixels, so a given name always has the same content
+and can be cached forever, and the same picture uploaded twice (even
+re-encoded or with different metadata) is only stored once. Nothing here
+touches Flask or the database.
+"""
+import hashlib
+import io
+import os
+
+AVATAR_SIZES = (32, 64, 150)
+AVATAR_FORMATS = ('webp', 'png')
+DEFAULT_AVATAR = 'default_avatar.png'
+
+
+def avatar_key(image):
+    """Name shared by all variants of a normalized image: a hash of its pixels"""
+    digest = hashlib.sha256(f'{image.mode}:{image.width}x{image.height}:'.encode())
+    digest.update(image.tobytes())
+    return digest.hexdigest()[:20]
+
+
+def variant_name(key, size, fmt):
+    return f'{key}-{size}.{fmt}'
+
+
+def is_variant_key(avatar):
+    """True if `avatar` is a key written by process_avatar, not a legacy filename"""
+    return bool(avatar) and '.' not in avatar
+
+
+def variant_paths(folder, key):
+    return [os.path.join(folder, variant_name(key, size, fmt))
+            for size in AVATAR_SIZES for fmt in AVATAR_FORMATS]
+
+
+def variants_exist(folder, key):
+    return all(os.path.exists(path) for path in variant_paths(folder, key))
+
+
+def process_avatar(data, folder):
+    """Write every size/format variant of the image in `data` to `folder`.
+
+    Returns the key the variants are stored under. If they already exist
+    nothing is encoded or written. Raises PIL's errors if the data is not an
+    image it can read.
+    """
+    # PIL is imported here, in the worker, so the web process only loads it
+    # for the header check on upload
+    from PIL import Image, ImageOps
+
+    largest = max(AVATAR_SIZES)
+
+    image = Image.open(io.BytesIO(data))
+    # For JPEGs, let the decoder downscale by up to 8x while decoding,
+    # which is far cheaper than decoding full size and resizing
+    image.draft('RGB', (largest, largest))
+    image = ImageOps.exif_transpose(image)
+    image = image.convert('RGBA' if image.mode in ('RGBA', 'LA', 'P') else 'RGB')
+    image = ImageOps.fit(image, (largest, largest), Image.LANCZOS)
+
+    key = avatar_key(image)
+    if variants_exist(folder, key):
+        return key
+
+    os.makedirs(folder, exist_ok=True)
+    for size in AVATAR_SIZES:
+        resized = image if size == largest else image.resize((size, size), Image.LANCZOS)
+        for fmt in AVATAR_FORMATS:
+            path = os.path.join(folder, variant_name(key, size, fmt))
+            # Write then rename, so a half-written file is never served
+            tmp_path = f'{path}.{os.getpid()}.tmp'
+            resized.save(tmp_path, format=fmt.upper(), **({'quality': 85, 'method': 4} if fmt == 'webp' else {'optimize': True}))
+            os.replace(tmp_path, path)
+    return key
@@ -0,0 +1,290 @@
+"""Blackjack rules as a compact state machine, independent of Flask.
+
+The engine only knows the shoe, hands and stakes. The blackjack route owns
+the coins: it charges stakes before calling deal/double/split and credits
+whatever payout a transition returns when the round settles.
+"""
+import random
+
+FRESH_DECK = bytes([1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 10, 10, 10] * 4)
+DEALER_STANDS_ON = 17
+MIN_DECKS = 1
+MAX_DECKS = 8
+DEFAULT_DECKS = 6
+DEFAULT_PENETRATION = 0.75  # fraction of the shoe dealt before the cut card
+
+
+class Shoe:
+    """N decks shuffled together once and dealt in order until the cut card.
+
+    The shuffled cards are an immutable byte string and dealing only moves
+    `position`, so a new hand costs no deck building or shuffling at all;
+    the shoe is reshuffled once the cut card comes out.
+    """
+
+    __slots__ = ('decks', 'penetration', 'cards', 'position')
+
+    def __init__(self, decks=DEFAULT_DECKS, penetration=DEFAULT_PENETRATION):
+        if not MIN_DECKS <= decks <= MAX_DECKS:
+            raise ValueError(f"A shoe holds {MIN_DECKS}-{MAX_DECKS} decks, not {decks}")
+        if not 0 < penetration < 1:
+            raise ValueError("Penetration must be between 0 and 1")
+        self.decks = decks
+        self.penetration = penetration
+        self.shuffle()
+
+    @property
+    def cut_card(self):
+        return int(len(self.cards) * self.penetration)
+
+    @property
+    def needs_shuffle(self):
+        return self.position >= self.cut_card
+
+    def shuffle(self):
+        cards = bytearray(FRESH_DECK * self.decks)
+        random.shuffle(cards)
+        self.cards = bytes(cards)
+        self.position = 0
+
+    def draw(self):
+        # Only a very long round can run past the last card; start a fresh shoe if so
+        if self.position >= len(self.cards):
+            self.shuffle()
+        card = self.cards[self.position]
+        self.position += 1
+        return card
+
+    def to_state(self):
+        return {
+            'decks': self.decks,
+            'penetration': self.penetration,
+            'cards': self.cards.hex(),
+            'position': self.position,
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        shoe = cls.__new__(cls)
+        shoe.decks = state['decks']
+        shoe.penetration = state['penetration']
+        shoe.cards = bytes.fromhex(state['cards'])
+        shoe.position = state['position']
+        return shoe
+
+
+class BlackjackEngine:
+    """One round of blackjack: the dealer's hand plus one or more player hands.
+
+    Hand totals are kept as hard totals plus an ace count and updated as each
+    card is drawn, so scoring a hand never re-walks its cards.
+    """
+
+    __slots__ = (
+        'shoe', 'player_hands', 'player_totals', 'player_aces',
+        'dealer', 'dealer_total', 'dealer_aces', 'bets', 'active_hand',
+        'game_over', 'message', 'can_split', 'can_double',
+    )
+
+    def __init__(self, shoe=None):
+        self.shoe = shoe
+        self.player_hands = [[]]
+        self.player_totals = [0]
+        self.player_aces = [0]
+        self.dealer = []
+        self.dealer_total = 0
+        self.dealer_aces = 0
+        self.bets = [0]
+        self.active_hand = 0
+        self.game_over = True
+        self.message = ""
+        self.can_split = False
+        self.can_double = False
+
+    @staticmethod
+    def _score(total, aces):
+        # Count one ace as 11 when it fits
+        return total + 10 if aces and total + 10 <= 21 else total
+
+    def score(self, hand_index):
+        return self._score(self.player_totals[hand_index], self.player_aces[hand_index])
+
+    @property
+    def scores(self):
+        return [self._score(t, a) for t, a in zip(self.player_totals, self.player_aces)]
+
+    @property
+    def dealer_score(self):
+        return self._score(self.dealer_total, self.dealer_aces)
+
+    def _is_pair(self, hand_index):
+        hand = self.player_hands[hand_index]
+        return len(hand) == 2 and hand[0] == hand[1]
+
+    def _draw_to_hand(self, hand_index):
+        card = self.shoe.draw()
+        self.player_hands[hand_index].append(card)
+        self.player_totals[hand_index] += card
+        self.player_aces[hand_index] += card == 1
+
+    def _draw_to_dealer(self):
+        card = self.shoe.draw()
+        self.dealer.append(card)
+        self.dealer_total += card
+        self.dealer_aces += card == 1
+
+    def deal(self, bet):
+        """Start a round with a single hand staked at `bet`, reshuffling at the cut card"""
+        if self.shoe.needs_shuffle:
+            self.shoe.shuffle()
+        self.player_hands = [[]]
+        self.player_totals = [0]
+        self.player_aces = [0]
+        self.dealer = []
+        self.dealer_total = 0
+        self.dealer_aces = 0
+        self.bets = [bet]
+        self.active_hand = 0
+        self.game_over = False
+        self.message = ""
+
+        self._draw_to_hand(0)
+        self._draw_to_hand(0)
+        self._draw_to_dealer()
+        self._draw_to_dealer()
+
+        self.can_split = self._is_pair(0)
+        self.can_double = True
+
+    def hit(self):
+        """Deal a card to the active hand; returns the payout if the round settles"""
+        self._draw_to_hand(self.active_hand)
+        self.can_split = False
+        self.can_double = False
+        if self.score(self.active_hand) > 21:
+            return self._next_hand()
+        return 0
+
+    def stand(self):
+        """Finish the active hand; returns the payout if the round settles"""
+        return self._next_hand()
+
+    def double(self):
+        """Double the active hand's stake, take exactly one card and move on.
+
+        The caller must already have charged the extra stake.
+        """
+        self.bets[self.active_hand] *= 2
+        self._draw_to_hand(self.active_hand)
+        return self._next_hand()
+
+    def split(self):
+        """Split the active pair into two hands, each dealt a second card.
+
+        The caller must already have charged the second hand's stake.
+        """
+        i = self.active_hand
+        first, second = self.player_hands[i]
+        self.player_hands[i:i + 1] = [[first], [second]]
+        self.player_totals[i:i + 1] = [first, second]
+        self.player_aces[i:i + 1] = [first == 1, second == 1]
+        self.bets.insert(i + 1, self.bets[i])
+        self._draw_to_hand(i)
+        self._draw_to_hand(i + 1)
+        self.can_split = False
+        return 0
+
+    def _next_hand(self):
+        if self.active_hand < len(self.player_hands) - 1:
+            self.active_hand += 1
+            self.can_double = True
+            self.can_split = self._is_pair(self.active_hand)
+            return 0
+        return self.settle()
+
+    def settle(self):
+        """Play the dealer's hand, end the round and return the total payout.
+
+        Stakes are taken up front, so a win pays back twice the stake, a push
+        returns it and a loss pays nothing.
+        """
+        self.game_over = True
+        self.can_split = False
+        self.can_double = False
+
+        scores = self.scores
+        if all(score > 21 for score in scores):
+            self.message = "All hands busted. Dealer doesn't need to play."
+            return 0
+
+        while self.dealer_score < DEALER_STANDS_ON:
+            self._draw_to_dealer()
+        dealer_score = self.dealer_score
+
+        results = []
+        payout = 0
+        for score, bet in zip(scores, self.bets):
+            if score > 21:
+                results.append("Busted")
+            elif dealer_score > 21 or score > dealer_score:
+                results.append("Win")
+                payout += bet * 2
+            elif score < dealer_score:
+                results.append("Loss")
+            else:
+                results.append("Push")
+                payout += bet
+
+        if len(results) == 1:
+            self.message = {
+                "Busted": "You busted! Dealer wins.",
+                "Win": "You win!",
+                "Loss": "Dealer wins!",
+                "Push": "It's a push!",
+            }[results[0]]
+        else:
+            wins = results.count("Win")
+            losses = results.count("Loss") + results.count("Busted")
+            pushes = results.count("Push")
+
+            message_parts = []
+            if wins > 0:
+                message_parts.append(f"{wins} win{'s' if wins > 1 else ''}")
+            if losses > 0:
+                message_parts.append(f"{losses} loss{'es' if losses > 1 else ''}")
+            if pushes > 0:
+                message_parts.append(f"{pushes} push{'es' if pushes > 1 else ''}")
+
+            net = payout - sum(self.bets)
+            self.message = "Game over! Results: " + ", ".join(message_parts) + f". Net change: {net} coins."
+        return payout
+
+    def to_state(self):
+        """Compact JSON-friendly snapshot for the game state store (without the shoe)"""
+        return {
+            'player_hands': self.player_hands,
+            'dealer': self.dealer,
+            'bets': self.bets,
+            'active_hand': self.active_hand,
+            'game_over': self.game_over,
+            'message': self.message,
+            'can_split': self.can_split,
+            'can_double': self.can_double,
+        }
+
+    @classmethod
+    def from_state(cls, state, shoe=None):
+        engine = cls(shoe)
+        engine.player_hands = [list(hand) for hand in state['player_hands']]
+        engine.player_totals = [sum(hand) for hand in engine.player_hands]
+        engine.player_aces = [hand.count(1) for hand in engine.player_hands]
+        engine.dealer = list(state['dealer'])
+        engine.dealer_total = sum(engine.dealer)
+        engine.dealer_aces = engine.dealer.count(1)
+        engine.bets = list(state['bets'])
+        engine.active_hand = state['active_hand']
+        engine.game_over = state['game_over']
+        engine.message = state['message']
+        engine.can_split = state['can_split']
+        engine.can_double = state['can_double']
+        return engine
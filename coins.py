@@ -0,0 +1,39 @@
+"""The coin balance: every change to User.coins goes through `adjust_coins`."""
+from events import coins_channel, on_commit, publish, user_channel
+from extensions import db
+from models import CoinLedger, User
+from social import friend_graph, rank_index
+
+
+def adjust_coins(user, delta, game, reason, stake=0):
+    """Atomically add `delta` coins to the user and record it in the ledger.
+
+    Runs a single `UPDATE ... SET coins = coins + delta` instead of a
+    load-then-save, so concurrent requests cannot lose updates. Debits are
+    only applied if the balance covers them; returns False otherwise.
+    When `delta` is the net result of several bets, pass their total as
+    `stake` so the balance must cover the stakes, not just the net loss.
+    The caller commits, so each request settles in one transaction; the
+    new balance is pushed to the user's live streams and the rank index
+    when it does.
+    """
+    required = max(-delta, stake)
+    if delta == 0 and not required:
+        return True
+
+    query = User.query.filter(User.id == user.id)
+    if required > 0:
+        query = query.filter(User.coins >= required)
+
+    updated = query.update({User.coins: User.coins + delta}, synchronize_session='fetch')
+    if not updated:
+        return False
+    if delta == 0:
+        return True
+
+    db.session.add(CoinLedger(user_id=user.id, delta=delta, game=game, reason=reason))
+    friend_graph().balance_changed(user.id)
+    on_commit(rank_index().update, (user.coins,), (user.coins - delta,))
+    publish(user_channel(user.id), 'balance', {'coins': user.coins, 'delta': delta, 'game': game})
+    publish(coins_channel(user.id), 'leaderboard', {'id': user.id, 'coins': user.coins})
+    return True
@@ -0,0 +1,373 @@
+"""`flask` commands: database setup and benchmarks.
+
+Registered on the app by `create_app`. Run them with e.g. `flask bench-friends`.
+"""
+import io
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from flask_login import login_user
+
+import avatars
+import game_state
+import loadtest
+import query_detector
+from account import avatar_pool
+from extensions import db
+from mailer import announce_game, email_templates, mail_dispatcher
+from models import FriendRequest, Game, User
+from response_cache import response_cache
+from social import friend_graph, friends
+
+
+def create_tables():
+    """Create any missing tables and the avatar folder; safe to run repeatedly"""
+    os.makedirs(current_app.config['UPLOAD_FOLDER'], exist_ok=True)
+    db.create_all()
+    game_state.metadata.create_all(db.engine)
+
+
+@click.command('init-db')
+@with_appcontext
+def init_db():
+    """Create the database tables."""
+    create_tables()
+    click.echo("Database ready.")
+
+
+@click.command('bench-friends')
+@with_appcontext
+@click.option('--sizes', default='10,100,500,2000', help='comma-separated friend counts to measure')
+@click.option('--repeat', default=20, help='page renders per measurement')
+def bench_friends(sizes, repeat):
+    """Time the /friends page against friend count.
+
+    Throwaway users and friendships are added in a transaction that is rolled
+    back at the end, so nothing is left in the database.
+    """
+    graph = friend_graph()
+    sizes = [int(size) for size in sizes.split(',')]
+    try:
+        me = User(username='bench_friends_me', email='bench_friends_me@example.invalid', password='!')
+        db.session.add(me)
+        db.session.flush()
+        added = 0
+        for size in sizes:
+            for i in range(added, size):
+                friend = User(username=f'bench_friends_{i}', email=f'bench_friends_{i}@example.invalid', password='!')
+                db.session.add(friend)
+                db.session.flush()
+                db.session.add(FriendRequest(user_id=me.id if i % 2 else friend.id,
+                                             friend_id=friend.id if i % 2 else me.id, status='accepted'))
+            db.session.flush()
+            added = max(added, size)
+
+            timings = {}
+            for label, warm in (('cold', False), ('warm', True)):
+                start = time.perf_counter()
+                for _ in range(repeat):
+                    if not warm:
+                        graph.invalidate(me.id)
+                    with current_app.test_request_context('/friends'):
+                        login_user(me)
+                        friends()
+                timings[label] = (time.perf_counter() - start) / repeat * 1000
+            click.echo(f"{size:>6} friends  cold={timings['cold']:.2f}ms  warm={timings['warm']:.2f}ms")
+    finally:
+        db.session.rollback()
+        graph.clear()
+
+
+@click.command('announce-game')
+@with_appcontext
+@click.argument('game_id', type=int)
+def announce_game_command(game_id):
+    """Email the new-game announcement for GAME_ID to everyone who opted in."""
+    game = db.session.get(Game, game_id)
+    if game is None:
+        raise click.ClickException(f"No game with id {game_id}.")
+    with current_app.test_request_context():
+        count = announce_game(game)
+    db.session.commit()
+    click.echo(f"Queued {count} announcement emails for {game.name}.")
+
+
+@click.command('arcade-cache-clear')
+@with_appcontext
+def cache_clear():
+    """Empty the response cache, e.g. after editing the game table by hand.
+
+    With RESPONSE_CACHE=memory this only reaches the command's own process;
+    restart the workers instead.
+    """
+    cache = response_cache()
+    if cache is None:
+        click.echo("The response cache is off.")
+        return
+    cache.clear()
+    click.echo("Response cache cleared.")
+
+
+@click.command('bench-mail')
+@with_appcontext
+@click.option('--count', default=10000, help='emails to queue')
+def bench_mail(count):
+    """Time queueing and delivering COUNT emails through the background dispatcher.
+
+    Point MAIL_SERVER/MAIL_PORT at a local stand-in first, for example
+    `python -m aiosmtpd -n -l localhost:8025` with MAIL_USE_TLS=0. The
+    outbox rows are addressed to example.invalid and left marked sent.
+    """
+    dispatcher = mail_dispatcher()
+    subject, text_body, html_body = email_templates().render(
+        'new_game', game=Game(name='Benchmark', description='Benchmark email', icon=''),
+        play_url='http://localhost/', settings_url='http://localhost/settings')
+
+    start = time.perf_counter()
+    dispatcher.enqueue_many(subject, (f'bench{i}@example.invalid' for i in range(count)), text_body, html_body,
+                            sender=current_app.config['MAIL_DEFAULT_SENDER'] or 'arcade@example.invalid')
+    db.session.commit()
+    queued = time.perf_counter() - start
+    while dispatcher.pending_count():
+        time.sleep(0.1)
+    elapsed = time.perf_counter() - start
+    click.echo(f"queued {count} in {queued:.2f}s, delivered in {elapsed:.2f}s "
+               f"({count / elapsed * 60:,.0f} emails/minute)")
+
+
+@click.command('bench-avatars')
+@with_appcontext
+@click.option('--count', default=40, help='uploads to process')
+@click.option('--size', default=2000, help='width and height of the test JPEG in pixels')
+def bench_avatars(count, size):
+    """Measure avatar uploads per second, inline versus the process pool.
+
+    Uses a synthetic photo-like JPEG and writes the variants to a temporary
+    directory that is removed afterwards.
+    """
+    import tempfile
+    from PIL import Image, ImageDraw, ImageFilter
+
+    image = Image.effect_noise((size, size), 64).convert('RGB')
+    draw = ImageDraw.Draw(image)
+    for i in range(0, size, max(size // 20, 1)):
+        draw.ellipse((i, i // 2, i + size // 4, i // 2 + size // 4), fill=(i % 256, 120, 255 - i % 256))
+    image = image.filter(ImageFilter.GaussianBlur(2))
+    # A different block of colour in each upload, so none of them are deduplicated
+    uploads = []
+    for i in range(count):
+        ImageDraw.Draw(image).rectangle((0, 0, size // 2, size // 2), fill=(i % 256, i // 256, 77))
+        buffer = io.BytesIO()
+        image.save(buffer, 'JPEG', quality=90)
+        uploads.append(buffer.getvalue())
+    click.echo(f"{count} uploads of a {size}x{size} JPEG ({len(uploads[0]) / 1024:.0f} KiB)")
+
+    with tempfile.TemporaryDirectory() as folder:
+        start = time.perf_counter()
+        for data in uploads[:max(count // 4, 1)]:
+            avatars.process_avatar(data, folder)
+        inline = max(count // 4, 1) / (time.perf_counter() - start)
+        click.echo(f"inline: {inline:.1f} uploads/s")
+
+        pool = avatar_pool()
+        list(pool.map(avatars.process_avatar, uploads[:current_app.config['AVATAR_WORKERS']], [folder] * current_app.config['AVATAR_WORKERS']))
+        start = time.perf_counter()
+        list(pool.map(avatars.process_avatar, uploads, [folder] * count))
+        pooled = count / (time.perf_counter() - start)
+        click.echo(f"pool ({current_app.config['AVATAR_WORKERS']} workers): {pooled:.1f} uploads/s")
+
+
+@click.command('query-report-diff')
+@click.argument('old', type=click.File())
+@click.argument('new', type=click.File())
+@click.option('--tolerance', default=0.5, help='ignore changes in average queries per request up to this')
+def query_report_diff(old, new, tolerance):
+    """Compare two query reports saved from /admin/queries or QUERY_REPORT_PATH.
+
+    Lines starting with ! are regressions: more queries per request, a new
+    repeated (N+1) statement or more slow queries. Exits 1 if there are any.
+    """
+    lines = query_detector.diff_reports(json.load(old), json.load(new), tolerance)
+    for line in lines:
+        click.echo(line)
+    if not lines:
+        click.echo("No changes.")
+    if any(line.startswith('!') for line in lines):
+        raise SystemExit(1)
+
+
+@click.command('arcade-load-test')
+@click.option('--users', default=50, help='players to seed and drive')
+@click.option('--friends', default=10, help='friends per player')
+@click.option('--iterations', default=20, help='actions each player takes')
+@click.option('--concurrency', default=4, help='threads driving the players')
+@click.option('--seed', default=0, help='fixes the users, friendships and each player\'s actions')
+@click.option('--database', help='URL of an empty database to use instead of a temporary SQLite file')
+@click.option('--output', type=click.Path(dir_okay=False), help='save the results here as JSON')
+@click.option('--baseline', type=click.File(), help='results saved earlier; exit 1 on regressions')
+@click.option('--tolerance', default=0.25, help='fraction by which p95 latency and throughput may get worse')
+@click.option('--query-report', type=click.Path(dir_okay=False), help='also run the query detector and save its report here')
+def load_test(users, friends, iterations, concurrency, seed, database, output, baseline, tolerance, query_report):
+    """Drive a fresh, seeded copy of the arcade with simulated players.
+
+    Builds a new app against DATABASE (a temporary SQLite file by default),
+    seeds USERS players with friendships, logs them in and has them play the
+    games and browse the leaderboard and friends pages (see loadtest.MIX).
+    Reports throughput, latency percentiles and SQL queries and commits per
+    request for each endpoint. Save a run with --output and check later runs
+    against it with --baseline. CSRF checks are off in the test app.
+    """
+    import tempfile
+    from app import create_app
+
+    settings = {'users': users, 'friends': friends, 'iterations': iterations,
+                'concurrency': concurrency, 'seed': seed}
+    with tempfile.TemporaryDirectory() as folder:
+        app = create_app({
+            'SECRET_KEY': 'load-test',
+            'SQLALCHEMY_DATABASE_URI': database or f"sqlite:///{os.path.join(folder, 'load.db')}",
+            'UPLOAD_FOLDER': folder,
+            'WTF_CSRF_ENABLED': False,
+            'METRICS': True,
+            'QUERY_DETECTOR': bool(query_report),
+            'QUERY_REPORT_PATH': None,
+            'PRELOAD': False,
+        })
+        with app.app_context():
+            if database and db.inspect(db.engine).has_table('user') and User.query.first():
+                raise click.ClickException("The load test needs an empty database.")
+            create_tables()
+            emails = loadtest.seed_database(users, friends, random.Random(seed))
+        click.echo(f"seeded {users} players; {users * iterations} actions on {concurrency} threads")
+
+        players, elapsed = loadtest.run(app, emails, iterations, concurrency, seed)
+        results = loadtest.summarize(players, elapsed, app.extensions['metrics'], settings)
+        if query_report:
+            app.extensions['query_detector'].write_report(query_report)
+        with app.app_context():
+            for engine in db.engines.values():
+                engine.dispose()
+
+    click.echo(f"{'endpoint':<26}{'requests':>9}{'errors':>7}{'p50':>9}{'p95':>9}{'p99':>9}{'queries':>9}{'commits':>9}")
+    for endpoint, stats in results['endpoints'].items():
+        click.echo(f"{endpoint:<26}{stats['requests']:>9}{stats['errors']:>7}{stats['p50_ms']:>7.1f}ms"
+                   f"{stats['p95_ms']:>7.1f}ms{stats['p99_ms']:>7.1f}ms"
+                   f"{stats['queries_per_request']:>9}{stats['commits_per_request']:>9}")
+    click.echo(f"{results['requests']} requests in {results['seconds']:.1f}s: {results['throughput']:.1f} requests/s, "
+               f"p50 {results['p50_ms']:.1f}ms, p95 {results['p95_ms']:.1f}ms, p99 {results['p99_ms']:.1f}ms, "
+               f"{results['commits']} commits, {results['errors']} errors")
+
+    if output:
+        with open(output, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    if baseline:
+        lines = loadtest.compare(json.load(baseline), results, tolerance)
+        for line in lines:
+            click.echo(line)
+        if any(line.startswith('!') for line in lines):
+            raise SystemExit(1)
+
+
+@click.command('arcade-sim', add_help_option=False,
+               context_settings={'ignore_unknown_options': True, 'allow_extra_args': True})
+@click.argument('args', nargs=-1, type=click.UNPROCESSED)
+def arcade_sim_command(args):
+    """Estimate each game's return to player by Monte Carlo simulation.
+
+    The arguments are passed to arcade_sim, e.g. `slots --rounds 1e8` or
+    `all --workers 8`; run `flask arcade-sim --help` for the full list.
+    """
+    import arcade_sim
+    arcade_sim.main(list(args))
+
+
+# Run in a fresh interpreter for each sample, so imports are really cold
+STARTUP_PROBE = '''
+import json, sys, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+flask_app = app.create_app()
+created = time.perf_counter()
+client = flask_app.test_client()
+client.get(sys.argv[1])
+first = time.perf_counter()
+client.get(sys.argv[1])
+second = time.perf_counter()
+print(json.dumps({
+    'import': imported - start, 'create_app': created - imported,
+    'first_request': first - created, 'second_request': second - first,
+    'deferred': [name for name in sys.argv[2:] if name not in sys.modules],
+}))
+'''
+
+# Modules that should only be loaded on first use
+DEFERRED_MODULES = ('PIL', 'flask_mail', 'mail_queue', 'email_templates', 'mines_odds', 'plinko_engine')
+
+
+@click.command('arcade-startup-bench')
+@click.option('--runs', default=5, help='fresh interpreters to start')
+@click.option('--path', default='/login', help='page to time the first request against')
+@click.option('--top', default=10, help='slowest imports to list')
+def startup_bench(runs, path, top):
+    """Measure cold start: import time, create_app and first-request latency.
+
+    Each run starts a new Python process that imports the app, builds it and
+    requests PATH twice. Medians are reported, along with the slowest imports
+    of the first run (from `python -X importtime`).
+    """
+    root = os.path.dirname(os.path.abspath(__file__))
+    samples = []
+    import_times = []
+    for run in range(runs):
+        command = [sys.executable]
+        if run == 0:
+            command += ['-X', 'importtime']
+        command += ['-c', STARTUP_PROBE, path, *DEFERRED_MODULES]
+        result = subprocess.run(command, cwd=root, capture_output=True, text=True)
+        if result.returncode:
+            raise click.ClickException(f"Startup probe failed:\n{result.stderr[-2000:]}")
+        samples.append(json.loads(result.stdout.strip().splitlines()[-1]))
+        if run == 0:
+            import_times = _parse_importtime(result.stderr)
+
+    for key in ('import', 'create_app', 'first_request', 'second_request'):
+        values = [sample[key] * 1000 for sample in samples]
+        click.echo(f"{key:>15}: {statistics.median(values):8.1f}ms  (min {min(values):.1f}ms)")
+    loaded = [name for name in DEFERRED_MODULES if name not in samples[0]['deferred']]
+    click.echo(f"not loaded at startup: {', '.join(samples[0]['deferred']) or 'none'}")
+    if loaded:
+        click.echo(f"loaded at startup (should be deferred): {', '.join(loaded)}")
+
+    click.echo("slowest imports made by the app and its dependencies (cumulative):")
+    for module, micros in import_times[:top]:
+        click.echo(f"  {micros / 1000:8.1f}ms  {module}")
+
+
+def _parse_importtime(stderr):
+    """Return (module, cumulative microseconds) for imports one level down, slowest first.
+
+    The probe's only top-level import is `app`, so this is what app.py (and
+    anything else imported at top level) pulls in directly.
+    """
+    times = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # Each nesting level indents the name by two more spaces
+        if (len(name) - len(name.lstrip())) // 2 == 1:
+            times.append((name.strip(), int(cumulative)))
+    return sorted(times, key=lambda entry: entry[1], reverse=True)
+
+
+COMMANDS = (init_db, bench_friends, announce_game_command, cache_clear, bench_mail, bench_avatars, startup_bench,
+            query_report_diff, load_test, arcade_sim_command)
@@ -0,0 +1,35 @@
+"""Jinja templates for outbound email, compiled once at startup.
+
+Each email lives in templates/email/ as a `.txt` and an `.html` body. The
+subject line is a template too, so it can mention e.g. the game being
+announced. Subjects and text bodies are plain text, so they are compiled
+without HTML autoescaping; only the HTML bodies are escaped.
+"""
+
+# Email name -> subject template
+SUBJECTS = {
+    'verify_email': 'Verify Your Email Address',
+    'reset_password': 'Password Reset Request',
+    'new_game': 'New on Online Arcade: {{ game.name }}',
+}
+
+
+class EmailTemplates:
+    """Compiled subject, text and HTML templates for every email in SUBJECTS"""
+
+    def __init__(self, jinja_env):
+        # Same loader, globals and filters as the app's environment
+        text_env = jinja_env.overlay(autoescape=False)
+        self._templates = {
+            name: (
+                text_env.from_string(subject),
+                text_env.get_template(f'email/{name}.txt'),
+                jinja_env.get_template(f'email/{name}.html'),
+            )
+            for name, subject in SUBJECTS.items()
+        }
+
+    def render(self, name, **context):
+        """Return (subject, text body, html body) for email `name`"""
+        subject, text, html = self._templates[name]
+        return subject.render(context), text.render(context), html.render(context)
@@ -0,0 +1,266 @@
+"""Live updates: a per-user server-sent event stream fed by a pub/sub broker.
+
+Events are published to channels: `user:<id>` carries what concerns one
+user (their balance, friend requests) and `coins:<id>` carries a user's new
+balance to whoever shows it on a leaderboard. A stream at /events subscribes
+to the user's own channel and to the coins channels of the user and their
+friends.
+
+`publish` only queues an event on the database session; it reaches the
+broker when that transaction commits and is dropped if it rolls back, so
+pages never see a balance that was not saved. `on_commit` defers any other
+work (such as dropping a cached leaderboard) the same way. The broker is set by
+EVENT_BROKER:
+
+- `memory`: in-process queues. Only streams served by the same process
+  see an event, so use it with a single worker.
+- `sql`: an events table that every stream polls. Works across workers
+  that share the database.
+- an import string (`module:factory`) for anything else; the factory is
+  called with the app and returns an EventBroker.
+"""
+from abc import ABC, abstractmethod
+from collections import defaultdict
+import itertools
+import json
+import queue
+import threading
+import time
+
+from flask import Blueprint, Response, current_app, has_app_context, request
+from flask_login import current_user, login_required
+from sqlalchemy import Column, Float, Integer, MetaData, String, Table, Text, delete, event, func, insert, select
+from sqlalchemy.orm import Session
+from werkzeug.utils import import_string
+
+from extensions import db
+
+bp = Blueprint('events', __name__)
+
+RETRY_MS = 3000  # how long the browser waits before reconnecting a dropped stream
+
+
+def user_channel(user_id):
+    return f'user:{user_id}'
+
+def coins_channel(user_id):
+    return f'coins:{user_id}'
+
+
+class EventBroker(ABC):
+    """Interface shared by the event brokers"""
+
+    @abstractmethod
+    def publish_many(self, events):
+        """Deliver (channel, event, data) tuples; `data` is already JSON"""
+
+    @abstractmethod
+    def subscribe(self, channels, last_id=None):
+        """Return a subscription to `channels`, resuming after `last_id` if the broker keeps history"""
+
+
+class MemoryEventBroker(EventBroker):
+    """In-process pub/sub: each subscription is a bounded queue.
+
+    A stream that falls `max_queued` events behind drops the newest ones;
+    every event carries a full value (a balance, not just a delta), so the
+    next one that gets through puts the page right again.
+    """
+
+    def __init__(self, max_queued=100):
+        self.max_queued = max_queued
+        self._subscriptions = defaultdict(set)  # channel -> subscriptions
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def publish_many(self, events):
+        with self._lock:
+            deliveries = [(next(self._ids), channel, name, data, list(self._subscriptions.get(channel, ())))
+                          for channel, name, data in events]
+        for event_id, channel, name, data, subscriptions in deliveries:
+            for subscription in subscriptions:
+                try:
+                    subscription.queue.put_nowait((event_id, name, data))
+                except queue.Full:
+                    pass
+
+    def subscribe(self, channels, last_id=None):
+        subscription = MemorySubscription(self, channels)
+        with self._lock:
+            for channel in channels:
+                self._subscriptions[channel].add(subscription)
+        return subscription
+
+    def _unsubscribe(self, subscription):
+        with self._lock:
+            for channel in subscription.channels:
+                subscribers = self._subscriptions.get(channel)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._subscriptions[channel]
+
+
+class MemorySubscription:
+    def __init__(self, broker, channels):
+        self.broker = broker
+        self.channels = channels
+        self.queue = queue.Queue(broker.max_queued)
+
+    def wait(self, timeout):
+        """Return the (id, event, data) frames waiting, blocking up to `timeout` seconds for the first"""
+        try:
+            frames = [self.queue.get(timeout=timeout)]
+        except queue.Empty:
+            return []
+        while True:
+            try:
+                frames.append(self.queue.get_nowait())
+            except queue.Empty:
+                return frames
+
+    def close(self):
+        self.broker._unsubscribe(self)
+
+
+class SQLEventBroker(EventBroker):
+    """Events as rows in a SQL table (SQLite or PostgreSQL), polled by each subscription.
+
+    Rows are written on their own connection after the publishing
+    transaction has committed, and deleted `retention` seconds later. A
+    reconnecting stream resumes from the Last-Event-ID its browser sends.
+    """
+
+    def __init__(self, engine, poll_interval=1.0, retention=300):
+        self.engine = engine
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self._next_purge = 0.0
+        metadata = MetaData()
+        self.table = Table(
+            'live_event', metadata,
+            Column('id', Integer, primary_key=True, autoincrement=True),
+            Column('channel', String(64), nullable=False, index=True),
+            Column('event', String(32), nullable=False),
+            Column('data', Text, nullable=False),
+            Column('created_at', Float, nullable=False, index=True),
+        )
+        metadata.create_all(engine)
+
+    def publish_many(self, events):
+        now = time.time()
+        with self.engine.begin() as connection:
+            connection.execute(insert(self.table), [
+                {'channel': channel, 'event': name, 'data': data, 'created_at': now}
+                for channel, name, data in events
+            ])
+            if now >= self._next_purge:
+                self._next_purge = now + self.retention / 10
+                connection.execute(delete(self.table).where(self.table.c.created_at < now - self.retention))
+
+    def subscribe(self, channels, last_id=None):
+        if last_id is None:
+            with self.engine.connect() as connection:
+                last_id = connection.execute(select(func.max(self.table.c.id))).scalar() or 0
+        return SQLSubscription(self, channels, last_id)
+
+
+class SQLSubscription:
+    def __init__(self, broker, channels, last_id):
+        self.broker = broker
+        self.channels = channels
+        self.last_id = last_id
+
+    def wait(self, timeout):
+        """Poll every `poll_interval` seconds until frames arrive or `timeout` seconds pass"""
+        table = self.broker.table
+        deadline = time.monotonic() + timeout
+        while True:
+            with self.broker.engine.connect() as connection:
+                rows = connection.execute(
+                    select(table.c.id, table.c.event, table.c.data)
+                    .where(table.c.channel.in_(self.channels), table.c.id > self.last_id)
+                    .order_by(table.c.id)
+                ).all()
+            if rows:
+                self.last_id = rows[-1].id
+                return [tuple(row) for row in rows]
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return []
+            time.sleep(min(remaining, self.broker.poll_interval))
+
+    def close(self):
+        pass
+
+
+def event_broker():
+    """Return the configured EventBroker, creating it on first use"""
+    broker = current_app.extensions.get('event_broker')
+    if broker is None:
+        name = current_app.config['EVENT_BROKER']
+        if name == 'memory':
+            broker = MemoryEventBroker()
+        elif name == 'sql':
+            broker = SQLEventBroker(db.engine, poll_interval=current_app.config['EVENT_POLL_INTERVAL'],
+                                    retention=current_app.config['EVENT_RETENTION'])
+        else:
+            broker = import_string(name)(current_app._get_current_object())
+        current_app.extensions['event_broker'] = broker
+    return broker
+
+
+def publish(channel, name, data):
+    """Queue an event for `channel`, to be sent when the current transaction commits"""
+    db.session.info.setdefault('pending_events', []).append((channel, name, json.dumps(data, separators=(',', ':'))))
+
+
+def on_commit(callback, *args):
+    """Call `callback(*args)` when the current transaction commits; never if it rolls back"""
+    db.session.info.setdefault('pending_callbacks', []).append((callback, args))
+
+
+def _send_pending(session):
+    events = session.info.pop('pending_events', None)
+    if events and has_app_context():
+        event_broker().publish_many(events)
+    for callback, args in session.info.pop('pending_callbacks', ()):
+        callback(*args)
+
+
+def _drop_pending(session, previous_transaction):
+    session.info.pop('pending_events', None)
+    session.info.pop('pending_callbacks', None)
+
+
+# Session events are process-wide, so register them once, when this module is imported
+event.listen(Session, 'after_commit', _send_pending)
+event.listen(Session, 'after_soft_rollback', _drop_pending)
+
+
+@bp.route('/events')
+@login_required
+def stream():
+    """Server-sent events for the signed-in user: balance, friends' balances and friend requests"""
+    from social import friend_graph  # social publishes events, so it imports this module
+
+    user_id = current_user.id
+    channels = [user_channel(user_id)] + [coins_channel(i) for i in friend_graph().friend_ids(user_id) | {user_id}]
+    subscription = event_broker().subscribe(channels, request.headers.get('Last-Event-ID', type=int))
+    keepalive = current_app.config['EVENT_KEEPALIVE']
+
+    # Runs after the request context is gone, so it must not touch the app or the database session
+    def generate():
+        try:
+            yield f'retry: {RETRY_MS}\n\n'
+            while True:
+                frames = subscription.wait(keepalive)
+                if not frames:
+                    yield ': keepalive\n\n'
+                for event_id, name, data in frames:
+                    yield f'id: {event_id}\nevent: {name}\ndata: {data}\n\n'
+        finally:
+            subscription.close()
+
+    return Response(generate(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
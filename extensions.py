@@ -0,0 +1,13 @@
+"""Flask extensions, created unbound and attached to an app by `create_app`.
+
+Flask-Mail is not here: it is only needed by the mail workers, so
+`mailer.mail_dispatcher` imports and initialises it on first use.
+"""
+from flask_login import LoginManager
+from flask_sqlalchemy import SQLAlchemy
+from flask_wtf.csrf import CSRFProtect
+
+db = SQLAlchemy()
+login_manager = LoginManager()
+login_manager.login_view = 'auth.login'
+csrf = CSRFProtect()
@@ -0,0 +1,125 @@
+"""Server-side storage for in-progress game state.
+
+Games used to keep their whole state (decks, hands, mine positions...) in the
+signed session cookie, which was re-serialized and re-signed on every request.
+Now only an opaque game id lives in the cookie and the state itself is kept in
+one of the stores below.
+"""
+from abc import ABC, abstractmethod
+import copy
+import json
+import time
+
+from sqlalchemy import Column, Float, MetaData, String, Table, Text, delete, insert, select, update
+
+from lru import LRUCache
+
+
+class GameStateStore(ABC):
+    """Interface shared by the game state backends"""
+
+    @abstractmethod
+    def get(self, game_id):
+        """Return the state stored under `game_id`, or None"""
+
+    @abstractmethod
+    def set(self, game_id, state):
+        """Store `state` (a JSON-serializable dict) under `game_id`"""
+
+    @abstractmethod
+    def delete(self, game_id):
+        """Forget the state stored under `game_id`, if any"""
+
+    @abstractmethod
+    def replace(self, game_id, expected, state):
+        """Store `state` (or delete the entry if None) only if the stored state still equals `expected`.
+
+        Returns whether it did. Two requests racing to replace the same state
+        cannot both succeed, so a route that claims a game this way before
+        paying out pays it once.
+        """
+
+
+class MemoryGameStateStore(GameStateStore):
+    """In-process LRU store; entries expire `ttl` seconds after their last write.
+
+    State is kept as Python objects, so there is no serialization cost, but it
+    is per-process: use the SQL store when running several workers. `get` and
+    `set` copy the state, so a route editing what it loaded changes nothing
+    until it saves.
+    """
+
+    def __init__(self, max_entries=10000, ttl=3600):
+        self._entries = LRUCache(max_entries, ttl)
+
+    def get(self, game_id):
+        return copy.deepcopy(self._entries.get(game_id))
+
+    def set(self, game_id, state):
+        self._entries.set(game_id, copy.deepcopy(state))
+
+    def delete(self, game_id):
+        self._entries.delete(game_id)
+
+    def replace(self, game_id, expected, state):
+        return self._entries.replace(game_id, expected, copy.deepcopy(state))
+
+
+# The SQL store's table. It is created by `flask init-db` along with the models'
+# tables, not on first use, so no request opens a transaction just to create it.
+metadata = MetaData()
+game_state_table = Table(
+    'game_state', metadata,
+    Column('id', String(64), primary_key=True),
+    Column('state', Text, nullable=False),
+    Column('expires_at', Float, nullable=False, index=True),
+)
+
+
+class SQLGameStateStore(GameStateStore):
+    """Stores state as compact JSON rows in a SQL database (SQLite or PostgreSQL).
+
+    Statements run on the given SQLAlchemy session and are not committed
+    here: a game's state is saved by the route's own commit, in the same
+    transaction as the coin change it goes with.
+    """
+
+    def __init__(self, session, ttl=86400):
+        self.session = session
+        self.ttl = ttl
+        self.table = game_state_table
+
+    def get(self, game_id):
+        row = self.session.execute(
+            select(self.table.c.state, self.table.c.expires_at).where(self.table.c.id == game_id)
+        ).first()
+        if row is None or row.expires_at < time.time():
+            return None
+        return json.loads(row.state)
+
+    def _values(self, state):
+        return {'state': json.dumps(state, separators=(',', ':')), 'expires_at': time.time() + self.ttl}
+
+    def set(self, game_id, state):
+        values = self._values(state)
+        result = self.session.execute(update(self.table).where(self.table.c.id == game_id).values(**values))
+        if result.rowcount == 0:
+            self.session.execute(insert(self.table).values(id=game_id, **values))
+
+    def delete(self, game_id):
+        self.session.execute(delete(self.table).where(self.table.c.id == game_id))
+
+    def replace(self, game_id, expected, state):
+        # The row lock taken by the UPDATE/DELETE makes a racing request wait and then match nothing
+        table = self.table
+        matches = (table.c.id == game_id) & (table.c.state == json.dumps(expected, separators=(',', ':')))
+        if state is None:
+            result = self.session.execute(delete(table).where(matches))
+        else:
+            result = self.session.execute(update(table).where(matches).values(**self._values(state)))
+        return result.rowcount == 1
+
+    def purge_expired(self):
+        """Delete expired rows, to be committed by the caller; returns how many were removed"""
+        result = self.session.execute(delete(self.table).where(self.table.c.expires_at < time.time()))
+        return result.rowcount
@@ -0,0 +1,170 @@
+"""The games: a registry of game plugins, the catalogue and shared game state helpers.
+
+Each game lives in its own module in this package and describes itself with
+a GamePlugin: its blueprint, the page players land on, and import strings
+for its engine and odds table. The registry only imports the games listed
+in the GAMES setting, so a node can serve a subset of them. Game modules
+import their engines inside the views, so an engine is only loaded by the
+first request that plays it.
+"""
+import importlib.metadata
+import secrets
+
+from flask import Blueprint, abort, current_app, jsonify, redirect, render_template, session, url_for
+from flask_login import login_required
+from werkzeug.utils import import_string
+
+from extensions import db
+from game_state import MemoryGameStateStore, SQLGameStateStore
+from models import Game
+from response_cache import cached_response
+
+bp = Blueprint('games', __name__)
+
+# Built-in games, entry-point style: name -> 'module:attribute' of its GamePlugin.
+# Installed packages can add more under the 'arcade.games' entry point group.
+GAME_ENTRY_POINTS = {
+    'blackjack': 'games.blackjack:plugin',
+    'mines': 'games.mines:plugin',
+    'slots': 'games.slots:plugin',
+    'plinko': 'games.plinko:plugin',
+    'balloon': 'games.balloon:plugin',
+    'ladder': 'games.ladder:plugin',
+}
+
+
+class GamePlugin:
+    """What a game registers with the arcade.
+
+    `endpoint` is the game's main page. `engine` and `odds` are import
+    strings, resolved on first use; `odds` may name a table or a function
+    returning one, and is served at /games/<name>/odds.
+    """
+
+    def __init__(self, name, title, blueprint, endpoint, image=None, engine=None, odds=None):
+        self.name = name
+        self.title = title
+        self.blueprint = blueprint
+        self.endpoint = endpoint
+        self.image = image
+        self.engine_path = engine
+        self.odds_path = odds
+
+    @property
+    def engine(self):
+        return import_string(self.engine_path) if self.engine_path else None
+
+    def odds_table(self):
+        if not self.odds_path:
+            return None
+        odds = import_string(self.odds_path)
+        return odds() if callable(odds) else odds
+
+
+class GameRegistry:
+    """The games this app serves, keyed by name, in catalogue order"""
+
+    def __init__(self, entry_points=None):
+        self.entry_points = dict(GAME_ENTRY_POINTS if entry_points is None else entry_points)
+        for entry_point in importlib.metadata.entry_points(group='arcade.games'):
+            self.entry_points.setdefault(entry_point.name, entry_point.value)
+        self.plugins = {}
+
+    def init_app(self, app):
+        """Import the games named in GAMES (all of them if unset) and register their blueprints"""
+        names = app.config.get('GAMES') or list(self.entry_points)
+        for name in names:
+            if name not in self.entry_points:
+                raise ValueError(f"Unknown game {name!r}; known games are {', '.join(self.entry_points)}")
+            plugin = import_string(self.entry_points[name])
+            app.register_blueprint(plugin.blueprint)
+            self.plugins[name] = plugin
+        app.extensions['game_registry'] = self
+
+    def get(self, name):
+        return self.plugins.get(name)
+
+    def find(self, title):
+        """Return the plugin for a Game row's name, or None if this node does not serve it"""
+        return next((plugin for plugin in self.plugins.values() if plugin.title.lower() == title.lower()), None)
+
+    def __iter__(self):
+        return iter(self.plugins.values())
+
+
+def game_registry():
+    return current_app.extensions['game_registry']
+
+def game_state_store():
+    """Return the configured GameStateStore, creating it on first use"""
+    store = current_app.extensions.get('game_state')
+    if store is None:
+        if current_app.config['GAME_STATE_BACKEND'] == 'sql':
+            store = SQLGameStateStore(db.session, ttl=current_app.config['GAME_STATE_TTL'])
+        else:
+            store = MemoryGameStateStore(ttl=current_app.config['GAME_STATE_TTL'])
+        current_app.extensions['game_state'] = store
+    return store
+
+def load_game_state(name):
+    """Return the state of the user's current `name` game, or None"""
+    game_id = session.get(f'{name}_game_id')
+    if not game_id:
+        return None
+    return game_state_store().get(game_id)
+
+def save_game_state(name, state):
+    """Store game state server-side; the cookie only carries its opaque id.
+
+    With the SQL store the state is written by the route's next commit.
+    """
+    game_id = session.get(f'{name}_game_id')
+    if not game_id:
+        game_id = secrets.token_urlsafe(16)
+        session[f'{name}_game_id'] = game_id
+    game_state_store().set(game_id, state)
+
+def claim_game_state(name, expected, state=None):
+    """Swap the stored state of the user's `name` game for `state` (None ends the game), if it is still `expected`.
+
+    Settle paths call this before paying out: it returns False when another
+    request changed or settled the game first, and then nothing is paid.
+    """
+    game_id = session.get(f'{name}_game_id')
+    if not game_id or not game_state_store().replace(game_id, expected, state):
+        return False
+    if state is None:
+        session.pop(f'{name}_game_id', None)
+    return True
+
+def clear_game_state(name):
+    game_id = session.pop(f'{name}_game_id', None)
+    if game_id:
+        game_state_store().delete(game_id)
+
+@bp.route('/games')
+@login_required
+@cached_response
+def games():
+    return render_template('games.html', games=list(game_registry()))
+
+@bp.route('/play_game/<int:game_id>')
+@login_required
+def play_game(game_id):
+    game = Game.query.get_or_404(game_id)
+    plugin = game_registry().find(game.name)
+    if plugin is None:
+        abort(404)
+    return redirect(url_for(plugin.endpoint))
+
+@bp.route('/games/<name>/odds')
+def odds(name):
+    plugin = game_registry().get(name)
+    table = plugin.odds_table() if plugin else None
+    if table is None:
+        abort(404)
+    # The tables never change while the app is running, so let clients cache them
+    response = jsonify(table)
+    response.cache_control.public = True
+    response.cache_control.max_age = 86400
+    return response
@@ -0,0 +1,157 @@
+"""Balloon Rise: the multiplier grows with time; cash out before the balloon pops.
+
+The round runs on the server's clock. When the bet is placed the pop point
+is drawn from the hazard curve in paytables and kept in the game state,
+never sent to the client. Opening the round's event stream launches the
+balloon: the client gets the growth curve once and animates it locally,
+and the stream sends `pop` when the balloon pops. A cashout is paid at the
+multiplier for the time the server has seen pass since launch.
+"""
+import json
+import time
+
+from flask import Blueprint, Response, flash, jsonify, redirect, render_template, request, stream_with_context, url_for
+from flask_login import current_user, login_required
+
+import paytables
+from coins import adjust_coins
+from extensions import db
+from games import GamePlugin, claim_game_state, clear_game_state, load_game_state, save_game_state
+
+bp = Blueprint('balloon', __name__)
+plugin = GamePlugin('balloon', 'Balloon Rise', bp, 'balloon.balloon_rise', image='images/avatars/balloon_rise.jpg',
+                    engine='paytables')
+
+STREAM_CHECK_INTERVAL = 1.0  # seconds between the stream's checks for a cashout
+
+def load_round():
+    """Return the current round, marking it popped once the server clock passes its pop point"""
+    game = load_game_state('balloon')
+    if not game:
+        return game
+    changed = False
+    if 'pop_time' not in game:
+        # A round started before pop points were drawn up front; keep the point drawn for it
+        game['pop_time'] = paytables.balloon_pop_time()
+        changed = True
+    if not game.get('popped') and not game.get('cashout') and elapsed(game) >= game['pop_time']:
+        game['popped'] = True
+        changed = True
+    if changed:
+        save_game_state('balloon', game)
+        db.session.commit()
+    return game
+
+def elapsed(game):
+    """Seconds since the balloon was launched, by the server's clock"""
+    launched_at = game.get('launched_at')
+    return 0.0 if launched_at is None else time.time() - launched_at
+
+def _event(name, data):
+    return f'event: {name}\ndata: {json.dumps(data)}\n\n'
+
+@bp.route('/games/balloon_rise', methods=['GET', 'POST'])
+@login_required
+def balloon_rise():
+    if request.method == 'GET' and request.args.get('reset') == 'true':
+        clear_game_state('balloon')
+        db.session.commit()
+
+    if request.method == 'POST':
+        try:
+            bet = int(request.form.get('bet', 0))
+        except:
+            flash("Invalid bet.", "danger")
+            return redirect(url_for('balloon.balloon_rise'))
+
+        if bet <= 0 or bet > current_user.coins:
+            flash("Invalid bet amount.", "danger")
+            return redirect(url_for('balloon.balloon_rise'))
+
+        # Deduct bet
+        if not adjust_coins(current_user, -bet, 'balloon', 'bet'):
+            flash("Invalid bet amount.", "danger")
+            return redirect(url_for('balloon.balloon_rise'))
+
+        # Start game session; the clock starts when the stream launches the balloon
+        save_game_state('balloon', {
+            'bet': bet,
+            'pop_time': paytables.balloon_pop_time(),
+            'launched_at': None,
+            'popped': False,
+            'cashout': False
+        })
+        db.session.commit()
+        return redirect(url_for('balloon.balloon_rise'))
+
+    game = load_round()
+    return render_template('games/balloon_rise.html', game=game)
+
+@bp.route('/games/balloon_rise/stream')
+@login_required
+def balloon_stream():
+    """Server-sent events for the round: `schedule` straight away, then `pop` or `ended`"""
+    game = load_round()
+    if not game or game.get('popped') or game.get('cashout'):
+        return Response(_event('ended', {}), mimetype='text/event-stream')
+
+    if game.get('launched_at') is None:
+        game['launched_at'] = time.time()
+        save_game_state('balloon', game)
+        db.session.commit()
+    pops_at = game['launched_at'] + game['pop_time']
+
+    def generate():
+        yield _event('schedule', {
+            'elapsed': elapsed(game),
+            'rate': paytables.BALLOON_GROWTH_RATE,
+            'exponent': paytables.BALLOON_GROWTH_EXPONENT,
+            'max': paytables.BALLOON_MAX_MULTIPLIER,
+        })
+        # Wake up now and then, so a cashed-out round does not hold the stream open until its pop point.
+        # The session is closed before each sleep so the stream does not hold a database connection.
+        while (remaining := pops_at - time.time()) > 0:
+            db.session.close()
+            time.sleep(min(remaining, STREAM_CHECK_INTERVAL))
+            current = load_game_state('balloon')
+            if not current or current.get('cashout'):
+                yield _event('ended', {})
+                return
+        yield _event('pop', {'multiplier': round(paytables.balloon_multiplier(game['pop_time']), 2)})
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@bp.route('/games/balloon_rise/cashout')
+@login_required
+def balloon_cashout():
+    game = load_round()
+    if not game or game.get('cashout'):
+        return redirect(url_for('balloon.balloon_rise'))
+    # Paid for the time the server has seen, whatever the page showed
+    seconds = elapsed(game)
+    if game.get('popped') or seconds >= game['pop_time']:
+        flash("The balloon popped before you cashed out.", "danger")
+        return redirect(url_for('balloon.balloon_rise'))
+
+    if not claim_game_state('balloon', game, dict(game, cashout=True)):
+        return redirect(url_for('balloon.balloon_rise'))
+    multiplier = paytables.balloon_multiplier(seconds)
+    payout = int(game['bet'] * multiplier)
+
+    adjust_coins(current_user, payout, 'balloon', 'cashout')
+    db.session.commit()
+
+    flash(f"You cashed out with a multiplier of {multiplier:.2f}x and won {payout} coins!", "success")
+    return redirect(url_for('balloon.balloon_rise'))
+
+@bp.route('/games/balloon_rise/check')
+@login_required
+def balloon_check():
+    """The round's status by the server's clock, for clients that cannot keep a stream open"""
+    game = load_round()
+    if not game or game.get('cashout'):
+        return jsonify({'status': 'ended'})
+    if game.get('popped'):
+        return jsonify({'status': 'popped'})
+    return jsonify({'status': 'ok', 'multiplier': round(paytables.balloon_multiplier(elapsed(game)), 2)})
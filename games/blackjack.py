@@ -0,0 +1,98 @@
+"""Blackjack against the dealer, dealt from a persistent multi-deck shoe."""
+from flask import Blueprint, current_app, flash, redirect, render_template, request, url_for
+from flask_login import current_user, login_required
+
+from coins import adjust_coins
+from extensions import db
+from games import GamePlugin, claim_game_state, clear_game_state, load_game_state, save_game_state
+
+bp = Blueprint('blackjack', __name__)
+plugin = GamePlugin('blackjack', 'Blackjack', bp, 'blackjack.blackjack', image='images/avatars/blackjack.jpg',
+                    engine='blackjack_engine')
+
+def load_blackjack_shoe():
+    """Return the shoe for the user's table, opening a fresh one on first play"""
+    from blackjack_engine import Shoe
+
+    state = load_game_state('blackjack_shoe')
+    if state:
+        return Shoe.from_state(state)
+    return Shoe(current_app.config['BLACKJACK_DECKS'], current_app.config['BLACKJACK_PENETRATION'])
+
+@bp.route('/games/blackjack', methods=['GET', 'POST'])
+@login_required
+def blackjack():
+    from blackjack_engine import BlackjackEngine
+
+    if request.args.get('action') == 'new':
+        clear_game_state('blackjack')
+        db.session.commit()
+        return redirect(url_for('blackjack.blackjack'))
+
+    if request.method == 'POST':
+        bet = int(request.form.get('bet', 0))
+        if bet <= 0 or bet > current_user.coins:
+            flash("Invalid bet amount", "danger")
+            return redirect(url_for('blackjack.blackjack'))
+
+        # Take the stake up front; the engine's settlement pays back winnings and pushes
+        if not adjust_coins(current_user, -bet, 'blackjack', 'bet'):
+            flash("Invalid bet amount", "danger")
+            return redirect(url_for('blackjack.blackjack'))
+
+        engine = BlackjackEngine(load_blackjack_shoe())
+        engine.deal(bet)
+        save_game_state('blackjack', engine.to_state())
+        save_game_state('blackjack_shoe', engine.shoe.to_state())
+        db.session.commit()
+        return redirect(url_for('blackjack.blackjack'))
+
+    # The shoe is only needed when cards are about to be drawn
+    state = load_game_state('blackjack')
+    action = request.args.get('action')
+    acting = state is not None and action in ('hit', 'stand', 'double', 'split') and not state['game_over']
+    if state:
+        engine = BlackjackEngine.from_state(state, load_blackjack_shoe() if acting else None)
+    else:
+        engine = BlackjackEngine()
+
+    # Process player actions
+    if acting:
+        stake = engine.bets[engine.active_hand]
+        if action == 'double':
+            allowed = engine.can_double and adjust_coins(current_user, -stake, 'blackjack', 'double')
+        elif action == 'split':
+            allowed = engine.can_split and adjust_coins(current_user, -stake, 'blackjack', 'split')
+        else:
+            allowed = True
+
+        if allowed:
+            payout = getattr(engine, action)()
+            # Claim the round before paying: of two racing actions, the second finds it changed
+            if claim_game_state('blackjack', state, engine.to_state()):
+                if engine.game_over:
+                    adjust_coins(current_user, payout, 'blackjack', 'payout')
+                save_game_state('blackjack_shoe', engine.shoe.to_state())
+                db.session.commit()
+            else:
+                db.session.rollback()  # including any extra stake charged above
+                state = load_game_state('blackjack')
+                engine = BlackjackEngine.from_state(state) if state else BlackjackEngine()
+
+        if request.headers.get("X-Requested-With") != "XMLHttpRequest":
+            return redirect(url_for('blackjack.blackjack'))
+
+    # Doubling and splitting also need enough coins for another stake
+    stake = engine.bets[engine.active_hand]
+    template = 'games/_blackjack_partial.html' if request.headers.get("X-Requested-With") == "XMLHttpRequest" else 'games/blackjack.html'
+    return render_template(template,
+                           player_hands=engine.player_hands,
+                           active_hand=engine.active_hand,
+                           dealer=engine.dealer,
+                           game_over=engine.game_over,
+                           bets=engine.bets,
+                           message=engine.message,
+                           scores=engine.scores,
+                           can_split=engine.can_split and current_user.coins >= stake,
+                           can_double=engine.can_double and current_user.coins >= stake,
+                           dealer_score=engine.dealer_score)
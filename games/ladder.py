@@ -0,0 +1,94 @@
+"""Ladder Climb: pick a safe spot on each rung to raise the multiplier."""
+import random
+
+from flask import Blueprint, flash, redirect, render_template, request, url_for
+from flask_login import current_user, login_required
+
+from coins import adjust_coins
+from extensions import db
+from games import GamePlugin, claim_game_state, clear_game_state, load_game_state, save_game_state
+from paytables import next_multiplier
+
+bp = Blueprint('ladder', __name__)
+plugin = GamePlugin('ladder', 'Ladder Climb', bp, 'ladder.ladder_climb', image='images/avatars/ladder_climb.jpg',
+                    engine='paytables', odds='paytables:LADDER_MULTIPLIERS')
+
+@bp.route('/ladder_climb', methods=['GET', 'POST'])
+@login_required
+def ladder_climb():
+    if request.method == 'POST':
+        bet = int(request.form.get('bet', 0))
+        safe_spots = int(request.form.get('safe_spots', 1))
+        safe_spots = max(1, min(2, safe_spots))
+
+        if bet < 1 or bet > current_user.coins:
+            flash('Invalid bet amount.', 'danger')
+            return redirect(url_for('ladder.ladder_climb'))
+
+        if not adjust_coins(current_user, -bet, 'ladder', 'bet'):
+            flash('Invalid bet amount.', 'danger')
+            return redirect(url_for('ladder.ladder_climb'))
+
+        save_game_state('ladder', {
+            'bet': bet,
+            'level': 1,
+            'multiplier': 1.0,
+            'safe_spots': safe_spots,
+            'history': [],
+            'active': True
+        })
+        db.session.commit()
+        return redirect(url_for('ladder.ladder_climb'))
+
+    game = load_game_state('ladder')
+    return render_template('games/ladder_climb.html', game=game)
+
+@bp.route('/ladder_pick/<choice>', methods=['POST'])
+@login_required
+def ladder_pick(choice):
+    game = load_game_state('ladder')
+    if not game or not game['active']:
+        flash('No active game.', 'danger')
+        return redirect(url_for('ladder.ladder_climb'))
+
+    spots = ['left', 'middle', 'right']
+    safes = random.sample(spots, game.get('safe_spots', 1))
+    success = choice in safes
+
+    game['history'].append({
+        'choice': choice,
+        'safes': safes,
+        'success': success
+    })
+
+    if success:
+        game['level'] += 1
+        game['multiplier'] = next_multiplier(game['level'], game['safe_spots'])
+    else:
+        game['active'] = False
+
+    save_game_state('ladder', game)
+    db.session.commit()
+    return redirect(url_for('ladder.ladder_climb'))
+
+@bp.route('/ladder_cashout')
+@login_required
+def ladder_cashout():
+    game = load_game_state('ladder')
+    if game and game['active'] and claim_game_state('ladder', game):
+        winnings = int(game['bet'] * game['multiplier'])
+        adjust_coins(current_user, winnings, 'ladder', 'cashout')
+        flash(f'You cashed out with {winnings} coins!', 'success')
+    else:
+        flash('No active game to cash out.', 'warning')
+
+    clear_game_state('ladder')
+    db.session.commit()
+    return redirect(url_for('ladder.ladder_climb'))
+
+@bp.route('/ladder_climb/reset')
+@login_required
+def ladder_reset():
+    clear_game_state('ladder')
+    db.session.commit()
+    return redirect(url_for('ladder.ladder_climb'))
@@ -0,0 +1,134 @@
+"""Mines: pick tiles on a 5x5 grid without hitting a mine, cash out any time."""
+from flask import Blueprint, flash, jsonify, redirect, render_template, request, url_for
+from flask_login import current_user, login_required
+
+from coins import adjust_coins
+from extensions import db
+from games import GamePlugin, claim_game_state, clear_game_state, load_game_state, save_game_state
+
+bp = Blueprint('mines', __name__)
+plugin = GamePlugin('mines', 'Mines', bp, 'mines.mines', image='images/avatars/mines.jpg',
+                    engine='mines_odds', odds='mines_odds:odds_table')
+
+@bp.route('/games/mines', methods=['GET', 'POST'])
+@login_required
+def mines():
+    import random
+    import mines_odds
+
+    # Reset game session if user clicks "Play Again"
+    if request.method == 'GET' and request.args.get('reset') == 'true':
+        clear_game_state('mines')
+        db.session.commit()
+
+    # Start a new game
+    if request.method == 'POST':
+        try:
+            bet = int(request.form.get('bet', 0))
+            mine_count = int(request.form.get('mines', 3))
+        except ValueError:
+            flash("Invalid input.", "danger")
+            return redirect(url_for('mines.mines'))
+
+        # Validate inputs
+        if bet <= 0 or bet > current_user.coins or not (mines_odds.MIN_MINES <= mine_count <= mines_odds.MAX_MINES):
+            flash("Invalid bet or number of mines (1–24 allowed).", "danger")
+            return redirect(url_for('mines.mines'))
+
+        # Deduct bet and initialize game board
+        if not adjust_coins(current_user, -bet, 'mines', 'bet'):
+            flash("Insufficient coins.", "danger")
+            return redirect(url_for('mines.mines'))
+
+        grid_size = mines_odds.GRID_SIZE
+        mine_positions = random.sample(range(grid_size), mine_count)
+
+        save_game_state('mines', {
+            'bet': bet,
+            'mines': mine_count,
+            'mine_positions': mine_positions,
+            'safe_revealed': [],
+            'grid_size': grid_size,
+            'active': True
+        })
+        db.session.commit()
+
+        return redirect(url_for('mines.mines'))
+
+    # Load existing game
+    game = load_game_state('mines')
+    multiplier = None
+
+    # Look up multiplier if game is active
+    if game and game['active']:
+        multiplier = mines_odds.multiplier(game['mines'], len(game['safe_revealed']))
+
+    return render_template('games/mines.html', game=game, current_user=current_user, multiplier=multiplier)
+
+@bp.route('/games/mines/pick/<int:tile>', methods=['POST'])
+@login_required
+def mines_pick(tile):
+    import mines_odds
+
+    game = load_game_state('mines')
+    if not game or not game['active']:
+        return jsonify({'success': False, 'error': 'No active game'})
+
+    if tile in game['safe_revealed']:
+        return jsonify({'success': False, 'error': 'Tile already revealed'})
+
+    is_mine = tile in game['mine_positions']
+    
+    if is_mine:
+        game['active'] = False
+        save_game_state('mines', game)
+        db.session.commit()
+        
+        return jsonify({
+            'success': True,
+            'is_mine': True,
+            'mine_positions': game['mine_positions'],
+            'game_over': True
+        })
+
+    game['safe_revealed'].append(tile)
+
+    revealed = len(game['safe_revealed'])
+    multiplier = mines_odds.multiplier(game['mines'], revealed)
+
+    won = revealed == game['grid_size'] - game['mines']
+    if won:
+        game['active'] = False
+
+    save_game_state('mines', game)
+    db.session.commit()
+
+    return jsonify({
+        'success': True,
+        'is_mine': False,
+        'safe_revealed': revealed,
+        'multiplier': multiplier,
+        'payout': game['bet'] * multiplier,
+        'won': won,
+        'game_over': won
+    })
+
+@bp.route('/games/mines/cashout')
+@login_required
+def mines_cashout():
+    import mines_odds
+
+    game = load_game_state('mines')
+    if not game or not game['active'] or not claim_game_state('mines', game):
+        return redirect(url_for('mines.mines'))
+
+    bet = game['bet']
+    multiplier = mines_odds.multiplier(game['mines'], len(game['safe_revealed']))
+
+    # Compute winnings and update user balance
+    winnings = int(bet * multiplier)
+    adjust_coins(current_user, winnings, 'mines', 'cashout')
+    db.session.commit()
+    flash(f"Cashed out for {winnings} coins!", "success")
+    
+    return redirect(url_for('mines.mines'))
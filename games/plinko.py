@@ -0,0 +1,84 @@
+"""Plinko: the server drops the ball and the page animates the path it took."""
+from flask import Blueprint, jsonify, render_template, request
+from flask_login import current_user, login_required
+
+import paytables
+from coins import adjust_coins
+from extensions import db
+from games import GamePlugin
+
+bp = Blueprint('plinko', __name__)
+plugin = GamePlugin('plinko', 'Plinko', bp, 'plinko.plinko', image='images/avatars/plinko.jpg',
+                    engine='plinko_engine', odds='paytables:PLINKO_PAYOUTS')
+
+@bp.route('/games/plinko')
+@login_required
+def plinko():
+    import plinko_engine
+
+    engine = plinko_engine.get_engine()
+    return render_template('games/plinko.html', current_user=current_user,
+                           rows=engine.rows, payouts=engine.payouts)
+
+@bp.route('/games/plinko/play', methods=['POST'])
+@login_required
+def plinko_play():
+    import plinko_engine
+
+    try:
+        bet = int(request.form.get('bet_amount', 0))
+        rows = int(request.form.get('rows', paytables.PLINKO_DEFAULT_ROWS))
+    except (ValueError, TypeError):
+        return jsonify(success=False, message="Invalid input."), 400
+
+    engine = plinko_engine.get_engine(rows)
+    if engine is None:
+        return jsonify(success=False, message="Unsupported board size."), 400
+
+    if bet <= 0 or bet > current_user.coins:
+        return jsonify(success=False, message="Invalid bet."), 400
+
+    # The server decides where the ball lands; the client only animates the path.
+    # The stake and the payout are settled as one net change.
+    path, slot = engine.drop()
+    multiplier = engine.multiplier(slot)
+    winnings = int(bet * multiplier)
+    if not adjust_coins(current_user, winnings - bet, 'plinko', 'drop', stake=bet):
+        return jsonify(success=False, message="Insufficient balance."), 400
+    db.session.commit()
+
+    return jsonify(success=True, path=engine.path_bits(path), slot=slot, multiplier=multiplier,
+                   win_amount=winnings, new_balance=current_user.coins)
+
+@bp.route('/games/plinko/batch', methods=['POST'])
+@login_required
+def plinko_batch():
+    import plinko_engine
+
+    data = request.get_json(silent=True) or request.form
+    try:
+        bet = int(data.get('bet', 0))
+        count = int(data.get('count', 1))
+        rows = int(data.get('rows', paytables.PLINKO_DEFAULT_ROWS))
+    except (ValueError, TypeError):
+        return jsonify(success=False, message="Invalid input."), 400
+
+    engine = plinko_engine.get_engine(rows)
+    if engine is None:
+        return jsonify(success=False, message="Unsupported board size."), 400
+
+    if not 1 <= count <= plinko_engine.MAX_BATCH:
+        return jsonify(success=False, message=f"You can drop 1-{plinko_engine.MAX_BATCH} balls at once."), 400
+
+    stake = bet * count
+    if bet <= 0 or stake > current_user.coins:
+        return jsonify(success=False, message="Invalid bet."), 400
+
+    # Every ball is resolved up front and settled as one net change
+    _, slots = engine.drop_many(count)
+    winnings = sum(int(bet * engine.multiplier(slot)) for slot in slots)
+    if not adjust_coins(current_user, winnings - stake, 'plinko', f'batch x{count}', stake=stake):
+        return jsonify(success=False, message="Insufficient balance."), 400
+    db.session.commit()
+
+    return jsonify(success=True, slots=slots, win_amount=winnings, new_balance=current_user.coins)
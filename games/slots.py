@@ -0,0 +1,79 @@
+"""Slots: three weighted reels, paid from the tables in paytables."""
+import json
+import random
+
+from flask import Blueprint, Response, jsonify, render_template, request, stream_with_context
+from flask_login import current_user, login_required
+
+import paytables
+from coins import adjust_coins
+from extensions import csrf, db
+from games import GamePlugin
+
+bp = Blueprint('slots', __name__)
+plugin = GamePlugin('slots', 'Slots', bp, 'slots.slots_animated', image='images/avatars/slots.jpg',
+                    engine='paytables', odds='paytables:SLOT_TRIPLE_MULTIPLIERS')
+
+@bp.route('/games/slots_animated')
+@login_required
+def slots_animated():
+    return render_template('games/slots_animated.html')
+
+@bp.route('/games/slots/spin', methods=['POST'])
+@login_required
+@csrf.exempt
+def slots_spin():
+    import random
+    data = request.get_json()
+    bet = int(data.get('bet', 0))
+
+    if bet <= 0 or bet > current_user.coins:
+        return jsonify({'error': 'Invalid bet'}), 400
+
+    # Settle the stake and the win as one net change
+    spin = random.choices(paytables.SLOT_SYMBOLS, paytables.SLOT_WEIGHTS, k=3)
+    win = bet * paytables.slots_multiplier(spin)
+    if not adjust_coins(current_user, win - bet, 'slots', 'spin', stake=bet):
+        return jsonify({'error': 'Invalid bet'}), 400
+    db.session.commit()
+    return jsonify({'symbols': spin, 'win': win, 'coins': current_user.coins})
+
+@bp.route('/games/slots/spin_batch', methods=['POST'])
+@login_required
+def slots_spin_batch():
+    data = request.get_json(silent=True) or {}
+    try:
+        bet = int(data.get('bet', 0))
+        count = int(data.get('count', 1))
+    except (ValueError, TypeError):
+        return jsonify({'error': 'Invalid input'}), 400
+
+    if not 1 <= count <= paytables.SLOT_MAX_BATCH:
+        return jsonify({'error': f'You can spin 1-{paytables.SLOT_MAX_BATCH} times at once'}), 400
+
+    stake = bet * count
+    if bet <= 0 or stake > current_user.coins:
+        return jsonify({'error': 'Invalid bet'}), 400
+
+    # Draw every reel of every spin in one call, then score each spin with a table lookup
+    reels = random.choices(range(len(paytables.SLOT_SYMBOLS)), cum_weights=paytables.SLOT_CUM_WEIGHTS, k=3 * count)
+    spins = [reels[i:i + 3] for i in range(0, len(reels), 3)]
+    wins = [bet * paytables.SLOT_MULTIPLIER_TABLE[paytables.slot_index(*spin)] for spin in spins]
+    total = sum(wins)
+
+    if not adjust_coins(current_user, total - stake, 'slots', f'batch x{count}', stake=stake):
+        return jsonify({'error': 'Invalid bet'}), 400
+    db.session.commit()
+    coins = current_user.coins
+
+    if not data.get('stream'):
+        return jsonify({'spins': spins, 'wins': wins, 'win': total, 'coins': coins})
+
+    # NDJSON: one line per spin so the client can animate while the rest arrives,
+    # then a summary line. The coins are already settled at this point.
+    def generate():
+        for spin, win in zip(spins, wins):
+            yield json.dumps({'spin': spin, 'win': win}) + '\n'
+        yield json.dumps({'done': True, 'win': total, 'coins': coins}) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
@@ -0,0 +1,210 @@
+"""Load test: seed a throwaway copy of the arcade and drive it with simulated players.
+
+Each virtual player logs in with its own test client, then repeatedly picks
+an action from MIX: a slots spin, a round of mines, blackjack, plinko or
+balloon, or a look at the leaderboard or friends page. Requests go through the WSGI app in process, so the numbers
+measure the app and its database, not a network or an HTTP server.
+
+Which actions each player takes is fixed by the seed; game outcomes are not.
+Latency is timed per request. SQL statements and commits per request come
+from the app's own metrics (see metrics.py). `summarize` turns a run into a
+JSON-ready dict, and `compare` checks it against a saved baseline.
+"""
+from collections import defaultdict
+import random
+import statistics
+import threading
+import time
+
+from werkzeug.security import generate_password_hash
+
+from extensions import db
+from models import FriendRequest, User
+
+# Action -> relative weight
+MIX = {
+    'slots': 25,
+    'mines': 15,
+    'blackjack': 15,
+    'plinko': 15,
+    'balloon': 10,
+    'leaderboard': 10,
+    'friends': 10,
+}
+BET = 10
+PASSWORD = 'load-test'
+STARTING_COINS = 10_000_000  # nobody goes broke during a run
+PERCENTILES = (50, 90, 95, 99)
+COUNT_TOLERANCE = 0.5  # queries or commits per request
+
+
+def seed_database(users, friends, rng):
+    """Add `users` confirmed players, each befriending about `friends` others; returns their emails"""
+    password = generate_password_hash(PASSWORD)
+    players = [User(username=f'load{i}', email=f'load{i}@example.invalid', password=password,
+                    email_confirmed=True, coins=STARTING_COINS) for i in range(users)]
+    db.session.add_all(players)
+    db.session.flush()
+
+    ids = [player.id for player in players]
+    pairs = set()
+    for user_id in ids:
+        for friend_id in rng.sample(ids, min(friends + 1, len(ids))):
+            if friend_id != user_id:
+                pairs.add((min(user_id, friend_id), max(user_id, friend_id)))
+    db.session.add_all(FriendRequest(user_id=a, friend_id=b, status='accepted') for a, b in sorted(pairs))
+    db.session.commit()
+    return [player.email for player in players]
+
+
+class VirtualPlayer:
+    """One logged-in player with its own cookies, timing every request it makes"""
+
+    def __init__(self, app, email, seed):
+        self.client = app.test_client()
+        self.email = email
+        self.rng = random.Random(seed)
+        self.timings = defaultdict(list)  # endpoint -> seconds per request
+        self.errors = defaultdict(int)
+
+    def request(self, endpoint, method, url, **kwargs):
+        start = time.perf_counter()
+        response = self.client.open(url, method=method, **kwargs)
+        self.timings[endpoint].append(time.perf_counter() - start)
+        if response.status_code >= 500:
+            self.errors[endpoint] += 1
+        return response
+
+    def login(self):
+        self.request('auth.login', 'POST', '/login', data={'email': self.email, 'password': PASSWORD})
+
+    def step(self):
+        action = self.rng.choices(list(MIX), weights=list(MIX.values()))[0]
+        getattr(self, action)()
+
+    def slots(self):
+        self.request('slots.slots_spin', 'POST', '/games/slots/spin', json={'bet': BET})
+
+    def mines(self):
+        import mines_odds
+
+        self.request('mines.mines', 'POST', '/games/mines', data={'bet': BET, 'mines': 3})
+        for tile in self.rng.sample(range(mines_odds.GRID_SIZE), self.rng.randint(1, 5)):
+            result = self.request('mines.mines_pick', 'POST', f'/games/mines/pick/{tile}').get_json() or {}
+            if result.get('game_over') or not result.get('success'):
+                return
+        self.request('mines.mines_cashout', 'GET', '/games/mines/cashout')
+
+    def blackjack(self):
+        headers = {'X-Requested-With': 'XMLHttpRequest'}
+        self.request('blackjack.blackjack', 'POST', '/games/blackjack', data={'bet': BET})
+        for _ in range(self.rng.randint(0, 2)):
+            self.request('blackjack.blackjack', 'GET', '/games/blackjack?action=hit', headers=headers)
+        self.request('blackjack.blackjack', 'GET', '/games/blackjack?action=stand', headers=headers)
+
+    def plinko(self):
+        self.request('plinko.plinko_play', 'POST', '/games/plinko/play', data={'bet_amount': BET})
+
+    def balloon(self):
+        # A page that lost its event stream: one status check, then a cashout on the server's clock
+        self.request('balloon.balloon_rise', 'POST', '/games/balloon_rise', data={'bet': BET})
+        status = self.request('balloon.balloon_check', 'GET', '/games/balloon_rise/check').get_json() or {}
+        if status.get('status') == 'ok':
+            self.request('balloon.balloon_cashout', 'GET', '/games/balloon_rise/cashout')
+
+    def leaderboard(self):
+        self.request('social.leaderboard', 'GET', '/leaderboard')
+
+    def friends(self):
+        self.request('social.friends', 'GET', '/friends')
+
+
+def run(app, emails, iterations, concurrency, seed):
+    """Log every player in, then have each take `iterations` actions; returns (players, seconds)"""
+    players = [VirtualPlayer(app, email, seed + i) for i, email in enumerate(emails)]
+    for player in players:
+        player.login()
+
+    def drive(group):
+        for _ in range(iterations):
+            for player in group:
+                player.step()
+
+    threads = [threading.Thread(target=drive, args=(players[i::concurrency],)) for i in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return players, time.perf_counter() - start
+
+
+def _percentiles(seconds):
+    if len(seconds) < 2:
+        return {f'p{p}_ms': round(seconds[0] * 1000, 3) for p in PERCENTILES}
+    cuts = statistics.quantiles(seconds, n=100, method='inclusive')
+    return {f'p{p}_ms': round(cuts[p - 1] * 1000, 3) for p in PERCENTILES}
+
+
+def summarize(players, elapsed, request_metrics, settings):
+    """The run as a dict ready to be saved as JSON; logins are reported but not counted in throughput"""
+    timings = defaultdict(list)
+    errors = defaultdict(int)
+    for player in players:
+        for endpoint, seconds in player.timings.items():
+            timings[endpoint].extend(seconds)
+        for endpoint, count in player.errors.items():
+            errors[endpoint] += count
+    queries = {labels[0]: total for labels, total in request_metrics.queries.totals().items()}
+    commits = {labels[0]: total for labels, total in request_metrics.commits.totals().items()}
+
+    endpoints = {}
+    for endpoint, seconds in sorted(timings.items()):
+        query_sum, count = queries.get(endpoint, (0, 0))
+        commit_sum, _ = commits.get(endpoint, (0, 0))
+        endpoints[endpoint] = {
+            'requests': len(seconds),
+            'errors': errors[endpoint],
+            **_percentiles(seconds),
+            'max_ms': round(max(seconds) * 1000, 3),
+            'queries_per_request': round(query_sum / count, 2) if count else 0,
+            'commits_per_request': round(commit_sum / count, 2) if count else 0,
+        }
+    measured = [s for endpoint, seconds in timings.items() if endpoint != 'auth.login' for s in seconds]
+    return {
+        'settings': settings,
+        'requests': len(measured),
+        'errors': sum(errors.values()),
+        'seconds': round(elapsed, 3),
+        'throughput': round(len(measured) / elapsed, 2),
+        **_percentiles(measured),
+        'commits': int(sum(total for total, _ in commits.values())),
+        'endpoints': endpoints,
+    }
+
+
+def compare(old, new, tolerance=0.25):
+    """Lines describing how `new` differs from the baseline `old`; lines starting with ! are regressions.
+
+    Throughput and p95 latency may get `tolerance` (a fraction) worse before
+    they count; queries and commits per request may rise by COUNT_TOLERANCE.
+    """
+    lines = []
+    if new['throughput'] < old['throughput'] * (1 - tolerance):
+        lines.append(f"! throughput {old['throughput']} -> {new['throughput']} requests/s")
+    for endpoint in sorted(set(old['endpoints']) | set(new['endpoints'])):
+        before, after = old['endpoints'].get(endpoint), new['endpoints'].get(endpoint)
+        if before is None:
+            lines.append(f"+ {endpoint}: new, p95 {after['p95_ms']}ms")
+            continue
+        if after is None:
+            lines.append(f"- {endpoint}: not exercised")
+            continue
+        if after['p95_ms'] > before['p95_ms'] * (1 + tolerance):
+            lines.append(f"! {endpoint}: p95 {before['p95_ms']}ms -> {after['p95_ms']}ms")
+        for key in ('queries_per_request', 'commits_per_request'):
+            if after[key] > before[key] + COUNT_TOLERANCE:
+                lines.append(f"! {endpoint}: {key.replace('_', ' ')} {before[key]} -> {after[key]}")
+        if after['errors'] and after['errors'] / after['requests'] > before['errors'] / before['requests']:
+            lines.append(f"! {endpoint}: {after['errors']} errors in {after['requests']} requests")
+    return lines
@@ -0,0 +1,63 @@
+"""A thread-safe LRU whose entries expire a fixed time after they are stored.
+
+Shared by the in-memory game state store and the in-memory response cache.
+"""
+from collections import OrderedDict
+import threading
+import time
+
+
+class LRUCache:
+    """At most `max_entries` values, each kept for `ttl` seconds after its last `set`"""
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the value stored under `key`, or None if it is missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def replace(self, key, expected, value):
+        """Store `value` under `key` (delete it if None) only if the live value equals `expected`.
+
+        Returns whether it did; the check and the swap happen under one lock.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic() or entry[1] != expected:
+                return False
+            if value is None:
+                del self._entries[key]
+            else:
+                self._entries[key] = (time.monotonic() + self.ttl, value)
+                self._entries.move_to_end(key)
+            return True
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,304 @@
+"""Background delivery for outbound email.
+
+Request handlers used to call `mail.send()` directly and wait for a fresh SMTP
+connection and TLS handshake on every message. Now a message is written to the
+`mail_outbox` table and its id handed to a small pool of worker threads. Each
+worker keeps one SMTP connection open between messages, retries failures with
+exponential backoff, and marks the row sent or failed. Bulk sends are
+inserted and claimed in batches, so thousands of messages cost a handful of
+transactions rather than several per message.
+
+Outbox rows are written in the caller's transaction, and the workers are only
+woken once it commits: a request that bails out and rolls back sends nothing,
+and one that commits has its mail in the outbox. Nothing is lost if the
+process dies either: rows that were never delivered become due again and are
+picked up by the next sweep.
+
+A claimed batch is leased: its rows are hidden from other workers until the
+lease runs out. The worker renews the lease every half lease while it sends,
+so a slow server cannot make a batch outlive it and go out twice. Results are
+only recorded on rows the worker still holds.
+"""
+import json
+import queue
+import secrets
+import threading
+import time
+
+from flask_mail import Message
+from sqlalchemy import Column, Float, Index, Integer, MetaData, String, Table, Text, func, insert, select, update
+
+from events import on_commit
+
+PENDING = 'pending'
+SENT = 'sent'
+FAILED = 'failed'
+SWEEP = None  # queue item telling a worker to drain every due message
+
+
+class MailDispatcher:
+    """Outbox table plus a pool of worker threads that drain it.
+
+    `enqueue` and `enqueue_many` add rows on the caller's SQLAlchemy session
+    and leave the commit to the caller. The workers use their own connections
+    from `engine` and push an app context so Flask-Mail can read its config.
+    """
+
+    def __init__(self, app, mail, session, engine, workers=2, max_queue=1000, batch_size=200,
+                 max_attempts=5, backoff=2.0, lease=60, idle_timeout=30, poll_interval=5):
+        self.app = app
+        self.mail = mail
+        self.session = session
+        self.engine = engine
+        self.workers = workers
+        self.batch_size = batch_size  # messages claimed and marked sent per transaction
+        self.max_attempts = max_attempts
+        self.backoff = backoff  # seconds before the first retry; doubles each attempt
+        self.lease = lease  # seconds a claimed row is hidden from other workers; renewed while sending
+        self.idle_timeout = idle_timeout  # close an unused SMTP connection after this long
+        self.poll_interval = poll_interval  # seconds between outbox sweeps when idle
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._threads = []
+        self._stopping = threading.Event()
+        self._start_lock = threading.Lock()
+
+        metadata = MetaData()
+        self.table = Table(
+            'mail_outbox', metadata,
+            Column('id', Integer, primary_key=True),
+            Column('subject', String(255), nullable=False),
+            Column('sender', String(255)),
+            Column('recipients', Text, nullable=False),  # JSON list
+            Column('body', Text),
+            Column('html', Text),
+            Column('status', String(10), nullable=False, default=PENDING),
+            Column('attempts', Integer, nullable=False, default=0),
+            Column('next_attempt_at', Float, nullable=False),
+            Column('last_error', Text),
+            Column('claim', String(16), index=True),  # token of the worker batch holding the lease
+            Column('created_at', Float, nullable=False),
+            Index('ix_mail_outbox_status_due', 'status', 'next_attempt_at'),
+        )
+        metadata.create_all(engine)
+
+    def enqueue(self, subject, recipients, body, html, sender=None):
+        """Add a message to the outbox; a worker is woken when the caller commits. Returns its id"""
+        now = time.time()
+        message_id = self.session.execute(insert(self.table).values(
+            subject=subject, sender=sender, recipients=json.dumps(list(recipients)),
+            body=body, html=html, status=PENDING, attempts=0,
+            next_attempt_at=now, created_at=now,
+        )).inserted_primary_key[0]
+        on_commit(self.wake, message_id)
+        return message_id
+
+    def enqueue_many(self, subject, recipients, body, html, sender=None, batch_size=1000):
+        """Add one message per recipient, all with the same rendered content.
+
+        Rows are inserted `batch_size` at a time, and every worker is woken
+        to drain them when the caller commits. Returns the number queued.
+        """
+        count = 0
+        batch = []
+        for recipient in recipients:
+            batch.append(recipient)
+            if len(batch) >= batch_size:
+                count += self._insert_batch(subject, batch, body, html, sender)
+                batch = []
+        if batch:
+            count += self._insert_batch(subject, batch, body, html, sender)
+        on_commit(self.wake, SWEEP)
+        return count
+
+    def wake(self, message_id=SWEEP):
+        """Hand a committed message to a worker, or with SWEEP have every worker drain the outbox"""
+        self.start()
+        items = [SWEEP] * self.workers if message_id is SWEEP else [message_id]
+        for item in items:
+            try:
+                self._queue.put_nowait(item)
+            except queue.Full:
+                break  # still in the outbox; the next sweep will send it
+
+    def _insert_batch(self, subject, recipients, body, html, sender):
+        now = time.time()
+        self.session.execute(insert(self.table), [
+            {'subject': subject, 'sender': sender, 'recipients': json.dumps([recipient]),
+             'body': body, 'html': html, 'status': PENDING, 'attempts': 0,
+             'next_attempt_at': now, 'created_at': now}
+            for recipient in recipients
+        ])
+        return len(recipients)
+
+    def start(self):
+        """Start the worker threads if they are not running yet.
+
+        Called lazily from `wake` so threads are created in the process
+        that serves requests, not in a parent that later forks.
+        """
+        if self._threads:
+            return
+        with self._start_lock:
+            if self._threads:
+                return
+            self._stopping.clear()
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f'mail-worker-{i}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def stop(self, timeout=10):
+        """Ask the workers to finish their current message and exit"""
+        self._stopping.set()
+        for _ in self._threads:
+            try:
+                self._queue.put_nowait(SWEEP)  # wake idle workers so they see the flag
+            except queue.Full:
+                break  # busy workers check it between messages
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def pending_count(self):
+        with self.engine.connect() as conn:
+            return conn.scalar(select(func.count()).select_from(self.table).where(self.table.c.status == PENDING))
+
+    def _run(self):
+        with self.app.app_context():
+            worker = _Worker(self)
+            try:
+                while not self._stopping.is_set():
+                    try:
+                        message_id = self._queue.get(timeout=self.poll_interval)
+                    except queue.Empty:
+                        worker.close_if_idle()
+                        message_id = SWEEP
+                    if message_id is not SWEEP:
+                        worker.deliver(self._claim(message_id=message_id))
+                        continue
+                    while not self._stopping.is_set():
+                        rows = self._claim()
+                        if not rows:
+                            break
+                        worker.deliver(rows)
+            finally:
+                worker.close()
+
+    def _claim(self, message_id=None):
+        """Take the lease on due messages and return their rows.
+
+        Claims `message_id` if given, otherwise up to `batch_size` of the
+        oldest due messages. Rows already leased by another worker are
+        skipped, so the result may be empty.
+        """
+        now = time.time()
+        token = secrets.token_hex(8)
+        table = self.table
+        due = (table.c.status == PENDING) & (table.c.next_attempt_at <= now)
+        if message_id is not None:
+            target = table.c.id == message_id
+        else:
+            target = table.c.id.in_(
+                select(table.c.id).where(due).order_by(table.c.next_attempt_at).limit(self.batch_size)
+            )
+        with self.engine.begin() as conn:
+            conn.execute(
+                update(table)
+                .where(target, due)
+                .values(attempts=table.c.attempts + 1, next_attempt_at=now + self.lease, claim=token)
+            )
+            return conn.execute(select(table).where(table.c.claim == token)).all()
+
+    def _renew(self, token):
+        """Extend the lease on the rows still claimed by `token`; returns the ids of those rows"""
+        table = self.table
+        held = (table.c.claim == token) & (table.c.status == PENDING)
+        with self.engine.begin() as conn:
+            conn.execute(update(table).where(held).values(next_attempt_at=time.time() + self.lease))
+            return set(conn.scalars(select(table.c.id).where(held)))
+
+    def _finish(self, message_ids, token, **values):
+        """Record results for rows still claimed by `token`; a worker that lost its lease changes nothing"""
+        if not message_ids:
+            return
+        table = self.table
+        with self.engine.begin() as conn:
+            conn.execute(update(table).where(table.c.id.in_(message_ids), table.c.claim == token).values(**values))
+
+
+class _Worker:
+    """One worker thread's SMTP connection, opened on demand and kept between messages"""
+
+    def __init__(self, dispatcher):
+        self.dispatcher = dispatcher
+        self.connection = None
+        self.last_used = 0.0
+
+    def deliver(self, rows):
+        """Send claimed rows over this worker's connection and record the results.
+
+        After two failures in a row the server is assumed to be unreachable,
+        and the rest of the batch is retried later instead of being sent now.
+        The lease is renewed every half lease; rows it no longer covers have
+        been claimed again by another worker and are skipped.
+        """
+        dispatcher = self.dispatcher
+        sent = []
+        failures = 0
+        held = None
+        renew_at = time.monotonic() + dispatcher.lease / 2
+        for i, row in enumerate(rows):
+            if time.monotonic() >= renew_at:
+                held = dispatcher._renew(row.claim)
+                renew_at = time.monotonic() + dispatcher.lease / 2
+            if held is not None and row.id not in held:
+                continue
+            if failures >= 2:
+                self._retry_later([rest for rest in rows[i:] if held is None or rest.id in held],
+                                  'Deferred after repeated failures')
+                break
+            try:
+                message = Message(row.subject, sender=row.sender, recipients=json.loads(row.recipients),
+                                  body=row.body, html=row.html)
+                self._connection().send(message)
+            except Exception as e:
+                # The connection may be the problem; start the next send on a fresh one
+                self.close()
+                failures += 1
+                self._retry_later([row], str(e))
+                continue
+            failures = 0
+            sent.append(row.id)
+            self.last_used = time.monotonic()
+        if rows:
+            dispatcher._finish(sent, rows[0].claim, status=SENT, last_error=None)
+
+    def _retry_later(self, rows, error):
+        dispatcher = self.dispatcher
+        for row in rows:
+            if row.attempts >= dispatcher.max_attempts:
+                dispatcher.app.logger.error(f"Email {row.id} failed after {row.attempts} attempts: {error}")
+                dispatcher._finish([row.id], row.claim, status=FAILED, last_error=error)
+            else:
+                delay = dispatcher.backoff * 2 ** (row.attempts - 1)
+                # Released, so renewing the rest of the batch does not push the retry back
+                dispatcher._finish([row.id], row.claim, next_attempt_at=time.time() + delay, last_error=error,
+                                   claim=None)
+
+    def _connection(self):
+        if self.connection is None:
+            connection = self.dispatcher.mail.connect()
+            self.connection = connection.__enter__()
+        return self.connection
+
+    def close_if_idle(self):
+        if self.connection is not None and time.monotonic() - self.last_used > self.dispatcher.idle_timeout:
+            self.close()
+
+    def close(self):
+        if self.connection is not None:
+            try:
+                self.connection.__exit__(None, None, None)
+            except Exception:
+                pass  # the server may already have dropped us
+            self.connection = None
@@ -0,0 +1,79 @@
+"""Outbound email: rendering from templates/email/ and queueing for the workers.
+
+Flask-Mail, the outbox dispatcher and the compiled email templates are all
+created on first use, so processes that never send email never load them.
+"""
+import json
+
+from flask import current_app, url_for
+
+from extensions import db
+from models import User
+
+
+def mail_dispatcher():
+    """Return the background MailDispatcher, creating its outbox table on first use"""
+    app = current_app._get_current_object()
+    dispatcher = app.extensions.get('mail_dispatcher')
+    if dispatcher is None:
+        from flask_mail import Mail
+        from mail_queue import MailDispatcher
+
+        dispatcher = MailDispatcher(app, Mail(app), db.session, db.engine,
+                                    workers=app.config['MAIL_WORKERS'],
+                                    max_queue=app.config['MAIL_QUEUE_SIZE'],
+                                    batch_size=app.config['MAIL_BATCH_SIZE'],
+                                    max_attempts=app.config['MAIL_MAX_ATTEMPTS'])
+        app.extensions['mail_dispatcher'] = dispatcher
+    return dispatcher
+
+def email_templates():
+    """Return the compiled EmailTemplates, compiling them on first use"""
+    templates = current_app.extensions.get('email_templates')
+    if templates is None:
+        from email_templates import EmailTemplates
+
+        templates = current_app.extensions['email_templates'] = EmailTemplates(current_app.jinja_env)
+    return templates
+
+def send_email(subject, recipients, text_body, html_body):
+    """Queue an email for background delivery once the caller commits; returns False if it could not be queued"""
+    try:
+        mail_dispatcher().enqueue(subject, recipients, text_body, html_body,
+                                  sender=current_app.config['MAIL_DEFAULT_SENDER'])
+        return True
+    except Exception as e:
+        current_app.logger.error(f"Email queueing failed: {e}")
+        return False
+
+def send_template_email(name, recipients, **context):
+    """Render email `name` from templates/email/ and queue it"""
+    subject, text_body, html_body = email_templates().render(name, **context)
+    return send_email(subject, recipients, text_body, html_body)
+
+def announce_game(game):
+    """Email every verified user who opted into new-game notifications.
+
+    The email is rendered once for everyone and the outbox rows are inserted
+    in batches; they go out when the caller commits. Returns the number of
+    emails queued.
+    """
+    subject, text_body, html_body = email_templates().render(
+        'new_game', game=game,
+        play_url=url_for('games.play_game', game_id=game.id, _external=True),
+        settings_url=url_for('account.settings', _external=True),
+    )
+    rows = db.session.execute(
+        db.select(User.email, User.notification_settings)
+        .where(User.email_confirmed.is_(True), User.notification_settings.contains('"new_games"'))
+    )
+    # The LIKE above is only a pre-filter; the parsed settings decide
+    recipients = []
+    for email, settings in rows:
+        try:
+            if 'new_games' in json.loads(settings).get('email', []):
+                recipients.append(email)
+        except (ValueError, AttributeError):
+            continue
+    return mail_dispatcher().enqueue_many(subject, recipients, text_body, html_body,
+                                          sender=current_app.config['MAIL_DEFAULT_SENDER'])
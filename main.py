@@ -0,0 +1,59 @@
+"""The home page, the navbar fragment and admin tools."""
+from flask import Blueprint, Response, abort, current_app, flash, jsonify, render_template, request
+
+from auth import admin_required
+from coins import adjust_coins
+from extensions import csrf, db
+from models import Game, User
+from response_cache import cached_response
+
+bp = Blueprint('main', __name__)
+
+@bp.route('/')
+@cached_response
+def home():
+    games = Game.query.limit(4).all()  # Featured games
+    return render_template('home.html', games=games)
+
+@bp.route("/navbar")
+@cached_response
+def navbar():
+    return render_template("navbar.html")
+
+@csrf.exempt
+@bp.route('/set_coins', methods=['GET', 'POST'])
+@admin_required
+def set_coins():
+    if request.method == 'POST':
+        user_id = request.form.get('user_id')
+        new_amount = request.form.get('new_amount')
+
+        try:
+            user = User.query.get(int(user_id))
+            if user:
+                if adjust_coins(user, int(new_amount) - user.coins, 'admin', 'set_coins'):
+                    db.session.commit()
+                else:
+                    flash(('error', "Coin balance cannot be negative."))
+            else:
+                flash(('error', f"No user found with ID {user_id}."))
+        except Exception as e:
+            flash(('error', f"Error updating coins: {str(e)}"))
+
+    users = User.query.all()
+    return render_template('set_coins.html', users=users)
+
+@bp.route('/admin/metrics')
+@admin_required
+def admin_metrics():
+    """Request metrics for this process, in Prometheus text format"""
+    return Response(current_app.extensions['metrics'].render(), mimetype='text/plain; version=0.0.4')
+
+@bp.route('/admin/queries')
+@admin_required
+def admin_queries():
+    """Per-endpoint query counts and repeated statements, when QUERY_DETECTOR is on"""
+    detector = current_app.extensions.get('query_detector')
+    if detector is None:
+        abort(404)
+    return jsonify(detector.report())
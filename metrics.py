@@ -0,0 +1,232 @@
+"""Per-request performance metrics, exported in Prometheus text format.
+
+For every request we record, labelled by Flask endpoint:
+
+- latency
+- SQL statements issued and time spent in them
+- session commits
+- the size of the session cookie the client holds afterwards
+
+We also record how long each template takes to render, and how often
+cached pages are hits, misses or skipped (see response_cache.py). SQL and commits
+are counted with SQLAlchemy events on every engine and session, but only
+inside a request, so the mail workers and CLI commands are not counted.
+Everything is kept in memory per process; scrape each worker.
+
+The same events time each statement for anything registered with
+`on_statement`, such as the query detector, so a statement is only timed once.
+"""
+from bisect import bisect_left
+import threading
+import time
+
+from flask import before_render_template, current_app, g, has_request_context, request, request_finished, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+COOKIE_BUCKETS = (0, 128, 256, 512, 1024, 2048, 4096)
+
+
+class Histogram:
+    """A Prometheus histogram with one series per label value tuple"""
+
+    def __init__(self, name, help, labelnames, buckets):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self._series = {}  # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * len(self.buckets) + [0, 0]
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def totals(self):
+        """{label values: (sum, count)} for every series"""
+        with self._lock:
+            return {labels: (values[-2], values[-1]) for labels, values in self._series.items()}
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = sorted((labels, list(values)) for labels, values in self._series.items())
+        for labels, values in series:
+            label_text = ','.join(f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, labels))
+            prefix = label_text + ',' if label_text else ''
+            cumulative = 0
+            for bound, count in zip(self.buckets, values):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{prefix}le="+Inf"}} {values[-1]}')
+            lines.append(f'{self.name}_sum{{{label_text}}} {values[-2]:.6g}')
+            lines.append(f'{self.name}_count{{{label_text}}} {values[-1]}')
+        return '\n'.join(lines)
+
+
+class Counter:
+    """A Prometheus counter with one series per label value tuple"""
+
+    def __init__(self, name, help, labelnames):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._series[labels] = self._series.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        with self._lock:
+            series = sorted(self._series.items())
+        for labels, value in series:
+            label_text = ','.join(f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, labels))
+            lines.append(f'{self.name}{{{label_text}}} {value}')
+        return '\n'.join(lines)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class RequestMetrics:
+    """The app's metrics, plus the hooks that feed them"""
+
+    def __init__(self, app=None):
+        self.requests = Counter('arcade_requests_total', 'Requests handled', ('endpoint', 'method', 'status'))
+        self.latency = Histogram('arcade_request_duration_seconds', 'Time to build the response',
+                                 ('endpoint',), LATENCY_BUCKETS)
+        self.queries = Histogram('arcade_request_sql_queries', 'SQL statements per request',
+                                 ('endpoint',), COUNT_BUCKETS)
+        self.sql_time = Histogram('arcade_request_sql_seconds', 'Time spent in SQL per request',
+                                  ('endpoint',), LATENCY_BUCKETS)
+        self.commits = Histogram('arcade_request_commits', 'Session commits per request',
+                                 ('endpoint',), COUNT_BUCKETS)
+        self.cookie_size = Histogram('arcade_session_cookie_bytes', 'Size of the session cookie after the request',
+                                     ('endpoint',), COOKIE_BUCKETS)
+        self.render_time = Histogram('arcade_template_render_seconds', 'Time to render a template',
+                                     ('template',), LATENCY_BUCKETS)
+        self.response_cache = Counter('arcade_response_cache_total', 'Response cache lookups by result',
+                                      ('endpoint', 'result'))
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions['metrics'] = self
+        app.before_request(self._start_request)
+        # request_finished, unlike after_request, sees the response after the session is saved
+        request_finished.connect(self._finish_request, app)
+        app.teardown_request(self._teardown_request)
+        before_render_template.connect(self._start_render, app)
+        template_rendered.connect(self._finish_render, app)
+        _listen_to_sqlalchemy()
+
+    def render(self):
+        """All metrics in Prometheus text exposition format"""
+        return '\n'.join(metric.render() for metric in (
+            self.requests, self.latency, self.queries, self.sql_time,
+            self.commits, self.cookie_size, self.render_time, self.response_cache,
+        )) + '\n'
+
+    def _start_request(self):
+        g.metrics = {'start': time.perf_counter(), 'queries': 0, 'sql_time': 0.0, 'commits': 0, 'renders': []}
+
+    def _finish_request(self, sender, response, **extra):
+        self._observe(response.status_code, _session_cookie_size(response))
+
+    def _teardown_request(self, error):
+        # Only still pending if the request failed without a response
+        if error is not None:
+            self._observe(500, None)
+
+    def _observe(self, status, cookie_size):
+        stats = g.pop('metrics', None)
+        if stats is None:
+            return
+        endpoint = request.endpoint or 'unmatched'
+        self.requests.inc(endpoint, request.method, str(status))
+        self.latency.observe(time.perf_counter() - stats['start'], endpoint)
+        self.queries.observe(stats['queries'], endpoint)
+        self.sql_time.observe(stats['sql_time'], endpoint)
+        self.commits.observe(stats['commits'], endpoint)
+        if cookie_size is not None:
+            self.cookie_size.observe(cookie_size, endpoint)
+
+    def _start_render(self, sender, template, context, **extra):
+        stats = g.get('metrics')
+        if stats is not None:
+            stats['renders'].append(time.perf_counter())
+
+    def _finish_render(self, sender, template, context, **extra):
+        stats = g.get('metrics')
+        if stats is not None and stats['renders']:
+            self.render_time.observe(time.perf_counter() - stats['renders'].pop(), template.name or 'string')
+
+
+def _session_cookie_size(response):
+    """Bytes of session cookie the client holds after `response`"""
+    name = current_app.config['SESSION_COOKIE_NAME']
+    for header in response.headers.getlist('Set-Cookie'):
+        if header.startswith(f'{name}='):
+            return len(header.split(';', 1)[0]) - len(name) - 1
+    return len(request.cookies.get(name, ''))
+
+
+def on_statement(app, callback):
+    """Call `callback(statement, seconds)` for every SQL statement run during one of `app`'s requests"""
+    app.extensions.setdefault('statement_callbacks', []).append(callback)
+    _listen_to_sqlalchemy()
+
+
+def _request_stats():
+    if has_request_context():
+        return g.get('metrics')
+    return None
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # The start time lives on the statement's execution context, which is thrown
+    # away if the statement fails, so an error cannot leave a stale start behind
+    if context is not None and has_request_context() and (
+            'metrics' in g or current_app.extensions.get('statement_callbacks')):
+        context._metrics_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = getattr(context, '_metrics_start', None)
+    if start is None or not has_request_context():
+        return
+    elapsed = time.perf_counter() - start
+    stats = g.get('metrics')
+    if stats is not None:
+        stats['queries'] += 1
+        stats['sql_time'] += elapsed
+    for callback in current_app.extensions.get('statement_callbacks', ()):
+        callback(statement, elapsed)
+
+
+def _after_commit(session):
+    stats = _request_stats()
+    if stats is not None:
+        stats['commits'] += 1
+
+
+def _listen_to_sqlalchemy():
+    # Listeners are process-wide, so register them once however many apps are built
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(Session, 'after_commit', _after_commit)
@@ -0,0 +1,47 @@
+"""Mines payout multipliers, precomputed once at import.
+
+The fair multiplier after revealing `r` safe tiles on a board with `m` mines is
+the inverse of the chance of surviving that many picks:
+
+    C(t, r) / C(t - m, r)  ==  prod((t - i) / (t - m - i) for i in range(r))
+
+where t is the number of tiles. Every Mines route and the /games/mines/odds
+endpoint read from the same tables, so the board, the pick response and the
+cashout always agree.
+"""
+from fractions import Fraction
+from math import comb
+
+GRID_SIZE = 25
+MIN_MINES = 1
+MAX_MINES = GRID_SIZE - 1
+
+
+def exact_multiplier(mines, revealed):
+    """Closed-form multiplier as an exact Fraction"""
+    return Fraction(comb(GRID_SIZE, revealed), comb(GRID_SIZE - mines, revealed))
+
+
+# Indexed as TABLE[mines][revealed]; row `m` covers 0..GRID_SIZE - m reveals
+EXACT_MULTIPLIERS = tuple(
+    tuple(exact_multiplier(m, r) for r in range(GRID_SIZE - m + 1))
+    for m in range(GRID_SIZE)
+)
+MULTIPLIERS = tuple(tuple(float(x) for x in row) for row in EXACT_MULTIPLIERS)
+BASIS_POINTS = tuple(tuple(int(x * 10000) for x in row) for row in EXACT_MULTIPLIERS)
+
+
+def multiplier(mines, revealed):
+    """Multiplier for `revealed` safe tiles on a board with `mines` mines"""
+    return MULTIPLIERS[mines][revealed]
+
+
+def odds_table():
+    """JSON-friendly view of the tables for the client"""
+    return {
+        'grid_size': GRID_SIZE,
+        'min_mines': MIN_MINES,
+        'max_mines': MAX_MINES,
+        'multipliers': MULTIPLIERS,
+        'basis_points': BASIS_POINTS,
+    }
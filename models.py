@@ -0,0 +1,144 @@
+from datetime import datetime
+import json
+
+from flask import current_app
+from flask_login import UserMixin
+from itsdangerous import URLSafeTimedSerializer as Serializer
+
+from extensions import db, login_manager
+
+
+class User(db.Model, UserMixin):
+    id = db.Column(db.Integer, primary_key=True)
+    created = db.Column(db.DateTime, default=datetime.now)
+    username = db.Column(db.String(50), unique=True, nullable=False)
+    email = db.Column(db.String(150), unique=True, nullable=False)
+    password = db.Column(db.String(300), nullable=False)
+    coins = db.Column(db.Integer, default=1000, index=True)
+    is_admin = db.Column(db.Boolean, default=False)
+    avatar = db.Column(db.String(100), default='default_avatar.png', index=True)
+    bio = db.Column(db.Text, nullable=True)
+    theme = db.Column(db.String(20), default='dark')
+    accent_color = db.Column(db.String(20), default='blue')
+    notification_settings = db.Column(db.Text, default='{"email": ["friend_requests", "game_invites", "new_games", "leaderboard_updates"], "push": ["all"]}')
+    games = db.relationship('UserGame', backref='user', lazy=True)
+    scores = db.relationship('Score', backref='user', lazy=True)
+    email_confirmed = db.Column(db.Boolean, default=False)
+    profile_picture = db.Column(db.String(255))
+    games_played = db.Column(db.Integer, default=0)
+    wins = db.Column(db.Integer, default=0)
+    high_score = db.Column(db.Integer, default=0)
+    last_login = db.Column(db.DateTime)
+
+    def get_notification_settings(self):
+        """Parse notification settings JSON"""
+        try:
+            return json.loads(self.notification_settings) if self.notification_settings else {}
+        except:
+            return {"email": [], "push": []}
+
+    def get_win_rate(self):
+        """Calculate win rate percentage"""
+        if self.games_played == 0:
+            return 0
+        return round((self.wins / self.games_played) * 100, 1)
+
+    def get_account_age(self):
+        """Get account age in a readable format"""
+        if not self.created:
+            return "Unknown"
+        
+        duration = datetime.now() - self.created
+        
+        if duration.days < 1:
+            return "Less than a day"
+        elif duration.days < 30:
+            return f"{duration.days} day{'s' if duration.days > 1 else ''}"
+        elif duration.days < 365:
+            months = duration.days // 30
+            return f"{months} month{'s' if months > 1 else ''}"
+        else:
+            years = duration.days // 365
+            return f"{years} year{'s' if years > 1 else ''}"
+
+    def get_token(self, expires_sec=1800):
+        s = Serializer(current_app.config['SECRET_KEY'])
+        return s.dumps({'user_id': self.id}, salt='email-confirm')
+    
+    def get_reset_token(self):
+        s = Serializer(current_app.config['SECRET_KEY'])
+        return s.dumps({'user_id': self.id}, salt='password-reset')
+    
+
+    @staticmethod
+    def verify_email_token(token):
+        s = Serializer(current_app.config['SECRET_KEY'])
+        try:
+            user_id = s.loads(token, salt='email-confirm', max_age=86400)['user_id']  # 24 hours
+        except:
+            return None
+        return User.query.get(user_id)
+
+    @staticmethod
+    def verify_reset_token(token):
+        s = Serializer(current_app.config['SECRET_KEY'])
+        try:
+            user_id = s.loads(token, salt='password-reset', max_age=1800)['user_id']  # 30 minutes
+        except:
+            return None
+        return User.query.get(user_id)
+
+class Game(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    description = db.Column(db.Text, nullable=False)
+    icon = db.Column(db.String(100), nullable=False)
+    price = db.Column(db.Integer, default=0)
+    users = db.relationship('UserGame', backref='game', lazy=True)
+    scores = db.relationship('Score', backref='game', lazy=True)
+
+class UserGame(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    game_id = db.Column(db.Integer, db.ForeignKey('game.id'), nullable=False)
+    purchase_date = db.Column(db.DateTime, default=datetime.now)
+
+class Score(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    game_id = db.Column(db.Integer, db.ForeignKey('game.id'), nullable=False)
+    score = db.Column(db.Integer, nullable=False)
+    date = db.Column(db.DateTime, default=datetime.now)
+
+class FriendRequest(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    friend_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    status = db.Column(db.String(20), default='pending')  # pending, accepted, declined
+    created_at = db.Column(db.DateTime, default=datetime.now)
+    updated_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
+
+    # Each side of a friendship is looked up by user and status
+    __table_args__ = (
+        db.Index('ix_friend_request_user_status', 'user_id', 'status'),
+        db.Index('ix_friend_request_friend_status', 'friend_id', 'status'),
+    )
+
+class CoinLedger(db.Model):
+    """Append-only audit trail of every change to a user's coin balance.
+
+    Rows outlive the account they belong to: deleting a user only clears
+    `user_id` (where the database enforces foreign keys). Query entries with
+    CoinLedger.query.filter_by(user_id=...).
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='SET NULL'), nullable=True, index=True)
+    delta = db.Column(db.Integer, nullable=False)  # signed: bets are negative, payouts positive
+    game = db.Column(db.String(50), nullable=False)
+    reason = db.Column(db.String(50), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.now)
+
+
+@login_manager.user_loader
+def load_user(user_id):
+    return User.query.get(int(user_id))
@@ -0,0 +1,82 @@
+"""Payout parameters for the arcade games.
+
+The game routes and the arcade_sim tool both read from here, so tuning a
+table and measuring its return-to-player always use the same numbers.
+"""
+import itertools
+import random
+
+# Slots
+SLOT_SYMBOLS = ['🍒', '🍋', '💎', '🍉', '🍌']  # 🍌 = no payout
+SLOT_WEIGHTS = [0.25, 0.10, 0.05, 0.25, 0.35]
+SLOT_TRIPLE_MULTIPLIERS = {'💎': 1000, '🍒': 10, '🍋': 20, '🍉': 5}
+SLOT_PAIR_SYMBOL = '🍒'  # any two of these pay SLOT_PAIR_MULTIPLIER
+SLOT_PAIR_MULTIPLIER = 2
+SLOT_MAX_BATCH = 10000  # spins settled by one /games/slots/spin_batch request
+
+# Plinko: one payout per slot, keyed by the number of rows of pins
+PLINKO_PAYOUTS = {
+    8: [5.6, 2.1, 1.1, 1, 0.5, 1, 1.1, 2.1, 5.6],
+    14: [7.1, 4, 1.9, 1.4, 1.3, 1.1, 1, 0.5, 1, 1.1, 1.3, 1.4, 1.9, 4, 7.1],
+}
+PLINKO_DEFAULT_ROWS = 14
+
+# Ladder Climb: multiplier for each level, keyed by number of safe spots
+LADDER_MULTIPLIERS = {
+    1: tuple(2.0 ** i for i in range(10)),
+    2: tuple(1.4 ** i for i in range(10)),
+}
+
+# Balloon Rise
+BALLOON_MAX_MULTIPLIER = 100
+BALLOON_MAX_POP_CHANCE = 0.95
+BALLOON_GROWTH_RATE = 0.04  # multiplier = 1 + rate * seconds ** exponent
+BALLOON_GROWTH_EXPONENT = 1.5
+BALLOON_HAZARD_STEP = 0.2  # seconds; the balloon can only pop on a multiple of this
+
+
+def slots_multiplier(spin):
+    """Return the payout multiplier for a spin of three symbols"""
+    if spin[0] == spin[1] == spin[2] and spin[0] in SLOT_TRIPLE_MULTIPLIERS:
+        return SLOT_TRIPLE_MULTIPLIERS[spin[0]]
+    if spin.count(SLOT_PAIR_SYMBOL) == 2:
+        return SLOT_PAIR_MULTIPLIER
+    return 0
+
+
+# Multiplier for every possible spin, indexed by the reels' symbol indices read
+# as base-N digits; see slot_index
+SLOT_MULTIPLIER_TABLE = tuple(
+    slots_multiplier([SLOT_SYMBOLS[i] for i in triple])
+    for triple in itertools.product(range(len(SLOT_SYMBOLS)), repeat=3)
+)
+SLOT_CUM_WEIGHTS = tuple(itertools.accumulate(SLOT_WEIGHTS))
+
+
+def slot_index(a, b, c):
+    """Position of the spin (a, b, c) of symbol indices in SLOT_MULTIPLIER_TABLE"""
+    n = len(SLOT_SYMBOLS)
+    return (a * n + b) * n + c
+
+
+def next_multiplier(level, safe_spots):
+    """Return the Ladder Climb multiplier for `level`, capped at the top rung"""
+    table = LADDER_MULTIPLIERS[1 if safe_spots == 1 else 2]
+    return table[min(level, len(table)) - 1]
+
+
+def balloon_multiplier(inflation_time):
+    return min(1.0 + BALLOON_GROWTH_RATE * inflation_time ** BALLOON_GROWTH_EXPONENT, BALLOON_MAX_MULTIPLIER)
+
+
+def balloon_pop_chance(inflation_time):
+    """Chance the balloon pops at the step `inflation_time` seconds in, if it has not yet"""
+    return min(0.02 * inflation_time ** 1.05, BALLOON_MAX_POP_CHANCE)
+
+
+def balloon_pop_time(rng=random):
+    """Draw the second at which a balloon pops, stepping through the hazard curve once"""
+    step = 1
+    while rng.random() >= balloon_pop_chance(step * BALLOON_HAZARD_STEP):
+        step += 1
+    return step * BALLOON_HAZARD_STEP
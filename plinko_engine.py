@@ -0,0 +1,59 @@
+"""Server-side Plinko outcomes.
+
+A drop is a path of left/right bounces, one per row of pins, drawn as the
+bits of a random integer (1 = right). The slot it lands in is the number of
+right bounces, so slots follow a binomial distribution. The client only
+animates the path it is given.
+"""
+import random
+from math import comb
+
+import paytables
+
+MAX_BATCH = 1000  # balls settled by one /games/plinko/batch request
+
+
+class PlinkoEngine:
+    """Draws drops for a board with `rows` rows of pins and one payout per slot"""
+
+    def __init__(self, rows, payouts):
+        if len(payouts) != rows + 1:
+            raise ValueError(f"A {rows}-row board needs {rows + 1} payouts, not {len(payouts)}")
+        self.rows = rows
+        self.payouts = tuple(payouts)
+        self.probabilities = tuple(comb(rows, k) / 2 ** rows for k in range(rows + 1))
+        self.expected_return = sum(p * m for p, m in zip(self.probabilities, self.payouts))
+        # Slot for every possible path, so resolving a drop is a single lookup
+        self._slots = bytes(bin(path).count('1') for path in range(1 << rows))
+
+    def drop(self):
+        """Return (path, slot) for one ball"""
+        path = random.getrandbits(self.rows)
+        return path, self._slots[path]
+
+    def drop_many(self, count):
+        """Return (paths, slots) for `count` balls.
+
+        All the bounces come from a single `getrandbits` call, which is then
+        cut into one `rows`-bit path per ball.
+        """
+        bits = random.getrandbits(self.rows * count) if count else 0
+        mask = (1 << self.rows) - 1
+        paths = [(bits >> (i * self.rows)) & mask for i in range(count)]
+        return paths, [self._slots[path] for path in paths]
+
+    def path_bits(self, path):
+        """Expand a path into per-row bounces (0 = left, 1 = right), top row first"""
+        return [(path >> row) & 1 for row in range(self.rows)]
+
+    def multiplier(self, slot):
+        return self.payouts[slot]
+
+
+# One engine per supported board size, built once at import
+ENGINES = {rows: PlinkoEngine(rows, payouts) for rows, payouts in paytables.PLINKO_PAYOUTS.items()}
+
+
+def get_engine(rows=paytables.PLINKO_DEFAULT_ROWS):
+    """Return the engine for a board size, or None if it is not offered"""
+    return ENGINES.get(rows)
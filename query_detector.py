@@ -0,0 +1,149 @@
+"""Slow-query and N+1 detection, for debug and staging.
+
+Every SQL statement run during a request is reduced to a fingerprint (its
+text with literals and IN-lists collapsed) and counted. When the same
+fingerprint runs QUERY_REPEAT_THRESHOLD times in one request, which is the
+shape of an N+1, or a single statement takes longer than SLOW_QUERY_MS,
+it is logged with the endpoint and the app frames that issued it.
+
+The detector also keeps a per-endpoint summary. It is served at
+/admin/queries, written to QUERY_REPORT_PATH at exit if that is set, and
+two saved reports can be compared with `flask query-report-diff`.
+"""
+import atexit
+from collections import Counter
+import json
+import os
+import re
+import threading
+import traceback
+
+from flask import current_app, g, request
+
+import metrics
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+_SPACE = re.compile(r'\s+')
+
+
+def fingerprint(statement):
+    """Normalise a SQL statement so calls that differ only in values compare equal"""
+    statement = _STRING.sub('?', statement)
+    statement = _NUMBER.sub('?', statement)
+    statement = _SPACE.sub(' ', statement).strip()
+    return _IN_LIST.sub('(?...)', statement)
+
+
+# The detector's own frames, and the metrics listener that hands it statements
+_PLUMBING = {__file__, metrics.__file__}
+
+
+def stack_summary(root, limit=6):
+    """The innermost `limit` frames from files under `root`, outside virtualenvs"""
+    frames = [frame for frame in traceback.extract_stack()
+              if frame.filename.startswith(root) and 'site-packages' not in frame.filename
+              and frame.filename not in _PLUMBING]
+    return [f'{os.path.relpath(frame.filename, root)}:{frame.lineno} in {frame.name}' for frame in frames[-limit:]]
+
+
+class QueryDetector:
+    """Per-request statement counting and a running per-endpoint report"""
+
+    def __init__(self, app=None):
+        self._report = {}
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.root = app.root_path
+        self.repeat_threshold = app.config['QUERY_REPEAT_THRESHOLD']
+        self.slow_seconds = app.config['SLOW_QUERY_MS'] / 1000
+        app.extensions['query_detector'] = self
+        app.before_request(self._start_request)
+        app.teardown_request(self._finish_request)
+        if app.config.get('QUERY_REPORT_PATH'):
+            atexit.register(self.write_report, app.config['QUERY_REPORT_PATH'])
+        # Statements are timed by the metrics module's SQLAlchemy listeners
+        metrics.on_statement(app, self.record)
+
+    def _start_request(self):
+        g.query_audit = {'counts': Counter(), 'sql_time': 0.0, 'slow': 0}
+
+    def record(self, statement, elapsed):
+        audit = g.get('query_audit')
+        if audit is None:
+            return
+        key = fingerprint(statement)
+        audit['counts'][key] += 1
+        audit['sql_time'] += elapsed
+        if audit['counts'][key] == self.repeat_threshold:
+            current_app.logger.warning(
+                "Repeated query in %s: ran %d times so far\n  %s\n  from %s",
+                request.endpoint, self.repeat_threshold, key, ' <- '.join(reversed(stack_summary(self.root))))
+        if elapsed > self.slow_seconds:
+            audit['slow'] += 1
+            current_app.logger.warning(
+                "Slow query in %s: %.1fms\n  %s\n  from %s",
+                request.endpoint, elapsed * 1000, key, ' <- '.join(reversed(stack_summary(self.root))))
+
+    def _finish_request(self, error):
+        audit = g.pop('query_audit', None)
+        if audit is None:
+            return
+        counts = audit['counts']
+        total = sum(counts.values())
+        endpoint = request.endpoint or 'unmatched'
+        with self._lock:
+            entry = self._report.setdefault(endpoint, {
+                'requests': 0, 'queries': 0, 'max_queries': 0, 'sql_ms': 0.0, 'slow_queries': 0, 'repeated': {},
+            })
+            entry['requests'] += 1
+            entry['queries'] += total
+            entry['max_queries'] = max(entry['max_queries'], total)
+            entry['sql_ms'] += audit['sql_time'] * 1000
+            entry['slow_queries'] += audit['slow']
+            for key, count in counts.items():
+                if count >= self.repeat_threshold:
+                    repeated = entry['repeated'].setdefault(key, {'requests': 0, 'max_repeats': 0})
+                    repeated['requests'] += 1
+                    repeated['max_repeats'] = max(repeated['max_repeats'], count)
+
+    def report(self):
+        """Per-endpoint summary, with averages, ready to be saved as JSON"""
+        with self._lock:
+            report = json.loads(json.dumps(self._report))
+        for entry in report.values():
+            entry['avg_queries'] = round(entry['queries'] / entry['requests'], 2)
+            entry['sql_ms'] = round(entry['sql_ms'], 2)
+        return dict(sorted(report.items()))
+
+    def write_report(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.report(), f, indent=2, sort_keys=True)
+
+
+def diff_reports(old, new, tolerance=0.5):
+    """Lines describing how per-endpoint query behaviour changed between two reports"""
+    lines = []
+    for endpoint in sorted(set(old) | set(new)):
+        before, after = old.get(endpoint), new.get(endpoint)
+        if before is None:
+            lines.append(f"+ {endpoint}: new, {after['avg_queries']} queries/request")
+            continue
+        if after is None:
+            lines.append(f"- {endpoint}: not exercised")
+            continue
+        if abs(after['avg_queries'] - before['avg_queries']) > tolerance:
+            lines.append(f"{'!' if after['avg_queries'] > before['avg_queries'] else ' '} {endpoint}: "
+                         f"{before['avg_queries']} -> {after['avg_queries']} queries/request")
+        for key in after['repeated'].keys() - before['repeated'].keys():
+            lines.append(f"! {endpoint}: new repeated query (up to {after['repeated'][key]['max_repeats']}x): {key}")
+        for key in before['repeated'].keys() - after['repeated'].keys():
+            lines.append(f"  {endpoint}: repeated query fixed: {key}")
+        if after['slow_queries'] > before['slow_queries']:
+            lines.append(f"! {endpoint}: slow queries {before['slow_queries']} -> {after['slow_queries']}")
+    return lines
+
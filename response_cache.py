@@ -0,0 +1,234 @@
+"""A cache for rendered pages, with ETag revalidation.
+
+Views decorated with @cached_response are rendered once per variant and
+then served from the cache. A variant is the endpoint and path, the
+viewer's theme and whether they are signed in, plus, for a signed-in user,
+their id and name, so a page is never served to the wrong user.
+
+The balance changes with every bet, so it is not part of the key: elements
+marked `data-live-coins` have the viewer's current balance filled in when a
+cached page is served, and the event stream keeps them up to date after
+that. Every cached response carries an ETag (covering that balance), and a
+browser revalidating with If-None-Match gets a 304 without the page being
+rendered or sent. Requests
+with flash messages waiting skip the cache, and a response is only stored
+if the view left the session untouched.
+
+The whole cache is cleared when a commit adds, changes or removes a Game
+row; after editing the table outside the app, run `flask arcade-cache-clear`.
+The backend is set by RESPONSE_CACHE:
+
+- `memory`: an in-process LRU. Each worker has its own, and a Game change
+  only clears the cache of the worker that made it.
+- `disk`: files in RESPONSE_CACHE_DIR, shared by every worker on the host.
+- `none`: no caching.
+"""
+from abc import ABC, abstractmethod
+from functools import wraps
+import hashlib
+import json
+import os
+import re
+import tempfile
+import time
+
+from flask import Response, current_app, has_app_context, request, session
+from flask_login import current_user
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from events import on_commit
+from lru import LRUCache
+from models import Game
+
+# An element marked data-live-coins, with the balance as its only content
+LIVE_COINS = re.compile(rb'(<(\w+)\b[^>]*\bdata-live-coins\b[^>]*>)[^<]*(</\2>)')
+
+
+class ResponseCache(ABC):
+    """Interface shared by the response cache backends"""
+
+    @abstractmethod
+    def get(self, key):
+        """Return the (etag, mimetype, body) stored under `key`, or None"""
+
+    @abstractmethod
+    def set(self, key, etag, mimetype, body):
+        """Store a rendered response under `key`"""
+
+    @abstractmethod
+    def clear(self):
+        """Forget every cached response"""
+
+
+class MemoryResponseCache(ResponseCache):
+    """In-process LRU; entries expire `ttl` seconds after they are stored"""
+
+    def __init__(self, max_entries=1000, ttl=300):
+        self._entries = LRUCache(max_entries, ttl)
+
+    def get(self, key):
+        return self._entries.get(key)
+
+    def set(self, key, etag, mimetype, body):
+        self._entries.set(key, (etag, mimetype, body))
+
+    def clear(self):
+        self._entries.clear()
+
+
+class DiskResponseCache(ResponseCache):
+    """One file per entry in `directory`: a JSON header line, then the body.
+
+    Files are written to a temporary name and renamed into place, so readers
+    in other workers never see half an entry. A read touches the file, and
+    the least recently touched files go once there are more than
+    `max_entries`.
+    """
+
+    def __init__(self, directory, max_entries=1000, ttl=300):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.ttl = ttl
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(key.encode()).hexdigest() + '.cache')
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                header = json.loads(f.readline())
+                body = f.read()
+        except (OSError, ValueError):
+            return None
+        if header['key'] != key:
+            return None
+        if header['expires_at'] < time.time():
+            self._remove(path)
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return header['etag'], header['mimetype'], body
+
+    def set(self, key, etag, mimetype, body):
+        header = {'key': key, 'etag': etag, 'mimetype': mimetype, 'expires_at': time.time() + self.ttl}
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(json.dumps(header).encode() + b'\n')
+            f.write(body)
+        os.replace(temp_path, self._path(key))
+        self._evict()
+
+    def clear(self):
+        for path in self._entry_paths():
+            self._remove(path)
+
+    def _entry_paths(self):
+        return [os.path.join(self.directory, name) for name in os.listdir(self.directory) if name.endswith('.cache')]
+
+    def _evict(self):
+        paths = self._entry_paths()
+        if len(paths) <= self.max_entries:
+            return
+        touched = []
+        for path in paths:
+            try:
+                touched.append((os.path.getmtime(path), path))
+            except OSError:
+                pass
+        touched.sort()
+        for _, path in touched[:len(touched) - self.max_entries]:
+            self._remove(path)
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def response_cache():
+    """Return the configured ResponseCache, creating it on first use; None when caching is off"""
+    if 'response_cache' not in current_app.extensions:
+        name = current_app.config['RESPONSE_CACHE']
+        size, ttl = current_app.config['RESPONSE_CACHE_SIZE'], current_app.config['RESPONSE_CACHE_TTL']
+        if name == 'memory':
+            cache = MemoryResponseCache(max_entries=size, ttl=ttl)
+        elif name == 'disk':
+            directory = current_app.config['RESPONSE_CACHE_DIR'] or os.path.join(current_app.instance_path, 'response_cache')
+            cache = DiskResponseCache(directory, max_entries=size, ttl=ttl)
+        elif name == 'none':
+            cache = None
+        else:
+            raise ValueError(f"Unknown RESPONSE_CACHE {name!r}; use memory, disk or none")
+        current_app.extensions['response_cache'] = cache
+    return current_app.extensions['response_cache']
+
+
+def _variant():
+    """What besides the URL changes the page: theme, auth state and who is signed in"""
+    if current_user.is_authenticated:
+        return ['user', current_user.theme, current_user.id, current_user.username]
+    return ['anonymous', session.get('theme')]
+
+
+def _conditional(etag, mimetype, body):
+    if current_user.is_authenticated:
+        coins = str(current_user.coins or 0).encode()
+        body = LIVE_COINS.sub(lambda match: match.group(1) + coins + match.group(3), body)
+        etag = f'{etag}-{coins.decode()}'
+    response = Response(body, mimetype=mimetype)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache' if current_user.is_authenticated else 'no-cache'
+    response.vary.add('Cookie')
+    return response.make_conditional(request)
+
+
+def _count(result):
+    metrics = current_app.extensions.get('metrics')
+    if metrics is not None:
+        metrics.response_cache.inc(request.endpoint, result)
+
+
+def cached_response(view):
+    """Serve `view` from the response cache; for GET views whose page depends only on the URL and the viewer"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        cache = response_cache()
+        if cache is None or request.method != 'GET' or '_flashes' in session:
+            return view(*args, **kwargs)
+
+        key = json.dumps([request.endpoint, request.full_path] + _variant())
+        entry = cache.get(key)
+        if entry is not None:
+            _count('hit')
+            return _conditional(*entry)
+
+        was_modified = session.modified
+        response = current_app.make_response(view(*args, **kwargs))
+        if response.status_code != 200 or response.is_streamed or (session.modified and not was_modified):
+            _count('skip')
+            return response
+        _count('miss')
+        body = response.get_data()
+        etag = hashlib.sha1(body).hexdigest()
+        cache.set(key, etag, response.mimetype, body)
+        return _conditional(etag, response.mimetype, body)
+    return wrapper
+
+
+def _note_catalog_change(session, flush_context, instances):
+    """Clear the cache once a flush that touches the Game table commits"""
+    if has_app_context() and any(isinstance(obj, Game) for obj in (*session.new, *session.dirty, *session.deleted)):
+        cache = response_cache()
+        if cache is not None:
+            on_commit(cache.clear)
+
+
+# Listening on the Session class covers every session the app creates
+event.listen(Session, 'before_flush', _note_catalog_change)
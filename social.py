@@ -0,0 +1,448 @@
+"""Friends and leaderboards."""
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from datetime import datetime
+import threading
+import time
+
+from flask import Blueprint, current_app, flash, has_app_context, jsonify, redirect, render_template, request, url_for
+from flask_login import current_user, login_required
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from events import on_commit, publish, user_channel
+from extensions import db
+from models import FriendRequest, User
+
+bp = Blueprint('social', __name__)
+
+LEADERBOARD_SIZE = 20
+
+class FriendGraph:
+    """Friendships as a cached adjacency set per user.
+
+    A user's friend ids come from two indexed lookups (one per side of the
+    FriendRequest row) and are cached for FRIEND_CACHE_TTL seconds; the
+    friend routes invalidate both users whenever a friendship changes.
+    Friends-only leaderboards are cached the same way for a shorter TTL and
+    dropped when a change to the balance of anyone on them commits.
+    Invalidating a user or dropping their leaderboard bumps their generation,
+    and a lookup only caches its result if the generation it started under
+    still holds, so a read that raced a change cannot put the old data back.
+    The caches are per-process, so the TTLs bound staleness across workers.
+    """
+
+    def __init__(self, ttl=300, leaderboard_ttl=30):
+        self.ttl = ttl
+        self.leaderboard_ttl = leaderboard_ttl
+        self._adjacency = {}  # user_id -> (expires_at, frozenset of friend ids)
+        self._leaderboards = {}  # user_id -> (expires_at, list of rows)
+        self._generations = {}  # user_id -> times the user's cached entries were dropped
+        self._lock = threading.Lock()
+
+    def friend_ids(self, user_id):
+        with self._lock:
+            entry = self._adjacency.get(user_id)
+            generation = self._generations.get(user_id, 0)
+        if entry and entry[0] > time.monotonic():
+            return entry[1]
+
+        accepted = FriendRequest.status == 'accepted'
+        query = db.select(FriendRequest.friend_id).where(FriendRequest.user_id == user_id, accepted).union_all(
+            db.select(FriendRequest.user_id).where(FriendRequest.friend_id == user_id, accepted))
+        ids = frozenset(db.session.scalars(query))
+        with self._lock:
+            if self._generations.get(user_id, 0) == generation:
+                self._adjacency[user_id] = (time.monotonic() + self.ttl, ids)
+        return ids
+
+    def invalidate(self, *user_ids):
+        with self._lock:
+            for user_id in user_ids:
+                self._generations[user_id] = self._generations.get(user_id, 0) + 1
+                self._adjacency.pop(user_id, None)
+                self._leaderboards.pop(user_id, None)
+
+    def balance_changed(self, user_id):
+        """Once the transaction commits, drop the cached leaderboards that show `user_id`.
+
+        Dropping them any earlier would let a concurrent request rebuild and
+        cache a board from the balances that are about to change.
+        """
+        on_commit(self.drop_leaderboards, self.friend_ids(user_id) | {user_id})
+
+    def drop_leaderboards(self, user_ids):
+        with self._lock:
+            for user_id in user_ids:
+                self._generations[user_id] = self._generations.get(user_id, 0) + 1
+                self._leaderboards.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._adjacency.clear()
+            self._leaderboards.clear()
+
+    def leaderboard(self, user_id):
+        """Rank the user among their friends, richest first.
+
+        Returns dicts with id, username, coins and rank; users with equal
+        coins share a rank, as on the global leaderboard. The rows come from
+        one IN query ordered on the coins index.
+        """
+        with self._lock:
+            entry = self._leaderboards.get(user_id)
+            generation = self._generations.get(user_id, 0)
+        if entry and entry[0] > time.monotonic():
+            return entry[1]
+
+        ids = self.friend_ids(user_id) | {user_id}
+        rows = db.session.execute(
+            db.select(User.id, User.username, User.coins)
+            .where(User.id.in_(ids))
+            .order_by(User.coins.desc(), User.id)
+        ).all()
+
+        board = []
+        for position, row in enumerate(rows, start=1):
+            rank = board[-1]['rank'] if board and board[-1]['coins'] == row.coins else position
+            board.append({'id': row.id, 'username': row.username, 'coins': row.coins, 'rank': rank})
+        with self._lock:
+            if self._generations.get(user_id, 0) == generation:
+                self._leaderboards[user_id] = (time.monotonic() + self.leaderboard_ttl, board)
+        return board
+
+    def are_friends(self, user_id, other_id):
+        return other_id in self.friend_ids(user_id)
+
+    def friends(self, user_id):
+        """Return the user's friends, loaded with a single IN query"""
+        ids = self.friend_ids(user_id)
+        if not ids:
+            return []
+        return User.query.filter(User.id.in_(ids)).order_by(User.username).all()
+
+    def pending_requests(self, user_id):
+        """Return (request, sender) pairs for requests waiting on the user"""
+        return (db.session.query(FriendRequest, User)
+                .join(User, User.id == FriendRequest.user_id)
+                .filter(FriendRequest.friend_id == user_id, FriendRequest.status == 'pending')
+                .order_by(FriendRequest.created_at)
+                .all())
+
+    def friendship(self, user_id, other_id):
+        """Return the accepted FriendRequest row linking the two users, or None"""
+        if not self.are_friends(user_id, other_id):
+            return None
+        return FriendRequest.query.filter(
+            ((FriendRequest.user_id == user_id) & (FriendRequest.friend_id == other_id)) |
+            ((FriendRequest.user_id == other_id) & (FriendRequest.friend_id == user_id))
+        ).filter_by(status='accepted').first()
+
+def friend_graph():
+    """Return the app's FriendGraph, creating it on first use"""
+    graph = current_app.extensions.get('friend_graph')
+    if graph is None:
+        graph = current_app.extensions['friend_graph'] = FriendGraph(ttl=current_app.config['FRIEND_CACHE_TTL'],
+                                                             leaderboard_ttl=current_app.config['FRIEND_LEADERBOARD_TTL'])
+    return graph
+
+class RankIndex:
+    """Every user's balance in one sorted array, so a rank is a bisection.
+
+    Counting the users above a balance in SQL walks the index over all of
+    them, which gets slower the lower the user ranks. Here rank and the gap
+    to the next rank cost O(log N) whatever the table size. The array is
+    loaded on first use and kept in step as changes commit: `adjust_coins`
+    reports balance changes, and users added, deleted or edited through the
+    ORM are picked up at flush. It is reloaded every `ttl` seconds, which
+    bounds how stale it gets across workers or after bulk edits outside the
+    ORM; `clear` forces a reload.
+    """
+
+    def __init__(self, ttl=60):
+        self.ttl = ttl
+        self._coins = None  # array('q') of every balance, ascending
+        self._expires_at = 0.0
+        self._lock = threading.Lock()
+
+    def _sorted_coins(self):
+        with self._lock:
+            if self._coins is not None and self._expires_at > time.monotonic():
+                return self._coins
+        coins = array('q', sorted(db.session.scalars(db.select(User.coins).where(User.coins.isnot(None)))))
+        with self._lock:
+            self._coins = coins
+            self._expires_at = time.monotonic() + self.ttl
+        return coins
+
+    def rank(self, coins):
+        """1-based rank of a balance; users with equal coins share a rank"""
+        sorted_coins = self._sorted_coins()
+        with self._lock:
+            return len(sorted_coins) - bisect_right(sorted_coins, coins) + 1
+
+    def coins_to_next_rank(self, coins):
+        """Coins needed to move up one rank (0 if already #1)"""
+        sorted_coins = self._sorted_coins()
+        with self._lock:
+            i = bisect_right(sorted_coins, coins)
+            return sorted_coins[i] - coins if i < len(sorted_coins) else 0
+
+    def update(self, added=(), removed=()):
+        """Apply committed balance changes: balances that appeared and balances that went away"""
+        with self._lock:
+            coins = self._coins
+            if coins is None:
+                return
+            for value in removed:
+                i = bisect_left(coins, value)
+                if i < len(coins) and coins[i] == value:
+                    del coins[i]
+            for value in added:
+                insort(coins, value)
+
+    def clear(self):
+        with self._lock:
+            self._coins = None
+
+def rank_index():
+    """Return the app's RankIndex, creating it on first use"""
+    index = current_app.extensions.get('rank_index')
+    if index is None:
+        index = current_app.extensions['rank_index'] = RankIndex(ttl=current_app.config['LEADERBOARD_RANK_TTL'])
+    return index
+
+def _note_user_changes(session, flush_context):
+    """Queue the balances of users inserted, deleted or edited in this flush for the rank index"""
+    if not has_app_context():
+        return
+    added, removed = [], []
+    for user in session.new:
+        if isinstance(user, User) and user.coins is not None:
+            added.append(user.coins)
+    for user in session.deleted:
+        if isinstance(user, User) and user.coins is not None:
+            removed.append(user.coins)
+    for user in session.dirty:
+        if isinstance(user, User):
+            history = inspect(user).attrs.coins.history
+            if history.has_changes():
+                added.extend(value for value in history.added if value is not None)
+                removed.extend(value for value in history.deleted if value is not None)
+    if added or removed:
+        on_commit(rank_index().update, added, removed)
+
+# Listening on the Session class covers every session the app creates
+event.listen(Session, 'after_flush', _note_user_changes)
+
+@bp.route('/friends')
+@login_required
+def friends():
+    graph = friend_graph()
+    friends = graph.friends(current_user.id)
+
+    # Pending requests where current user is the receiver, with their senders
+    pending = graph.pending_requests(current_user.id)
+    pending_requests = [fr for fr, _ in pending]
+    request_senders = [sender for _, sender in pending]
+
+    return render_template('friends.html', friends=friends, pending_requests=pending_requests, 
+                           request_senders=request_senders, User=User)
+
+@bp.route('/add_friend', methods=['POST'])
+@login_required
+def add_friend():
+    username = request.form.get('username')
+    
+    if not username:
+        flash('Please enter a username.', 'danger')
+        return redirect(url_for('social.friends'))
+    
+    friend = User.query.filter_by(username=username).first()
+    
+    if not friend:
+        flash('User not found.', 'danger')
+        return redirect(url_for('social.friends'))
+    
+    if friend.id == current_user.id:
+        flash('You cannot add yourself as a friend.', 'danger')
+        return redirect(url_for('social.friends'))
+    
+    # Check if friend request already exists
+    existing_request = FriendRequest.query.filter(
+        ((FriendRequest.user_id == current_user.id) & (FriendRequest.friend_id == friend.id)) |
+        ((FriendRequest.user_id == friend.id) & (FriendRequest.friend_id == current_user.id))
+    ).first()
+    
+    if existing_request:
+        flash('Friend request already exists or you are already friends.', 'warning')
+        return redirect(url_for('social.friends'))
+    
+    # Create friend request
+    friend_request = FriendRequest(user_id=current_user.id, friend_id=friend.id)
+    db.session.add(friend_request)
+    db.session.flush()
+    publish(user_channel(friend.id), 'friend_request', {
+        'id': friend_request.id, 'username': current_user.username, 'url': url_for('social.friends'),
+    })
+    db.session.commit()
+    
+    flash(f'Friend request sent to {friend.username}!', 'success')
+    return redirect(url_for('social.friends'))
+
+@bp.route('/accept_friend/<int:request_id>')
+@login_required
+def accept_friend(request_id):
+    friend_request = FriendRequest.query.get_or_404(request_id)
+    
+    if friend_request.friend_id != current_user.id:
+        flash('You are not authorized to accept this friend request.', 'danger')
+        return redirect(url_for('social.friends'))
+    
+    friend_request.status = 'accepted'
+    publish(user_channel(friend_request.user_id), 'friend_accepted', {
+        'id': current_user.id, 'username': current_user.username,
+        'url': url_for('social.friend_profile', friend_id=current_user.id),
+    })
+    db.session.commit()
+    friend_graph().invalidate(friend_request.user_id, friend_request.friend_id)
+    
+    friend = User.query.get(friend_request.user_id)
+    flash(f'You are now friends with {friend.username}!', 'success')
+    return redirect(url_for('social.friends'))
+
+@bp.route('/friend_profile/<int:friend_id>')
+@login_required
+def friend_profile(friend_id):
+    """Display a friend's profile"""
+    # Get the friend user
+    friend = User.query.get_or_404(friend_id)
+    
+    # Check if they are actually friends
+    friendship = friend_graph().friendship(current_user.id, friend_id)
+    
+    if not friendship:
+        flash('You are not friends with this user.', 'danger')
+        return redirect(url_for('social.friends'))
+    
+    # Calculate friendship duration
+    friendship_date = friendship.updated_at if friendship.updated_at else friendship.created_at
+    duration = datetime.now() - friendship_date
+    
+    if duration.days < 1:
+        friendship_duration = "Less than a day"
+    elif duration.days < 30:
+        friendship_duration = f"{duration.days} day{'s' if duration.days > 1 else ''}"
+    elif duration.days < 365:
+        months = duration.days // 30
+        friendship_duration = f"{months} month{'s' if months > 1 else ''}"
+    else:
+        years = duration.days // 365
+        friendship_duration = f"{years} year{'s' if years > 1 else ''}"
+    
+    # Get recent games (you'll need to implement this based on your game tracking system)
+    # For now, this is a placeholder - replace with your actual recent games query
+    recent_games = []  # Replace with actual query
+    
+    return render_template('friend_profile.html', 
+                         friend=friend, 
+                         friendship_duration=friendship_duration,
+                         recent_games=recent_games)
+
+@bp.route('/remove_friend/<int:friend_id>', methods=['POST'])
+@login_required
+def remove_friend(friend_id):
+    # Find the friendship record
+    friendship = friend_graph().friendship(current_user.id, friend_id)
+    
+    if not friendship:
+        flash('You are not friends with this user.', 'danger')
+        return redirect(url_for('social.friends'))
+    
+    # Remove the friendship
+    db.session.delete(friendship)
+    db.session.commit()
+    friend_graph().invalidate(current_user.id, friend_id)
+    
+    friend = User.query.get(friend_id)
+    flash(f'You have removed {friend.username} from your friends list.', 'success')
+    return redirect(url_for('social.friends'))
+
+@bp.route('/decline_friend/<int:request_id>')
+@login_required
+def decline_friend(request_id):
+    friend_request = FriendRequest.query.get_or_404(request_id)
+    
+    if friend_request.friend_id != current_user.id:
+        flash('You are not authorized to decline this friend request.', 'danger')
+        return redirect(url_for('social.friends'))
+    
+    # Delete the friend request (or we could set status to 'declined' if we want to keep records)
+    db.session.delete(friend_request)
+    db.session.commit()
+    friend_graph().invalidate(friend_request.user_id, friend_request.friend_id)
+    
+    flash('Friend request declined.', 'info')
+    return redirect(url_for('social.friends'))
+
+def get_top_users(limit=LEADERBOARD_SIZE):
+    """Return the richest users, served from the coins index"""
+    return User.query.order_by(User.coins.desc(), User.id).limit(limit).all()
+
+def get_user_rank(user):
+    """Return the user's 1-based rank; users with equal coins share a rank"""
+    return rank_index().rank(user.coins)
+
+def get_coins_to_next_rank(user):
+    """Return how many coins the user needs to move up one rank (0 if already #1)"""
+    return rank_index().coins_to_next_rank(user.coins)
+
+def get_rank_neighbours(user, count=2):
+    """Return (above, below): up to `count` users on either side of the user's rank"""
+    # Users tied with this one come first, then those with more (or fewer) coins. Each
+    # part is a range on the coins index; an OR of the two would scan the whole table.
+    above = User.query.filter(User.coins == user.coins, User.id < user.id).order_by(User.id.desc()).limit(count).all()
+    if len(above) < count:
+        above += User.query.filter(User.coins > user.coins).order_by(
+            User.coins.asc(), User.id.desc()).limit(count - len(above)).all()
+    below = User.query.filter(User.coins == user.coins, User.id > user.id).order_by(User.id).limit(count).all()
+    if len(below) < count:
+        below += User.query.filter(User.coins < user.coins).order_by(
+            User.coins.desc(), User.id).limit(count - len(below)).all()
+    return list(reversed(above)), below
+
+@bp.route('/leaderboard')
+@login_required
+def leaderboard():
+    if not current_user.is_authenticated:
+        flash("Please log in to view the leaderboard.", "warning")
+        return redirect(url_for('auth.login'))
+
+    top_users = get_top_users()
+    
+    # Rank and next-rank gap come from count/min queries on the coins index,
+    # so we never load the whole user table
+    user_rank = get_user_rank(current_user)
+    coins_to_next_rank = get_coins_to_next_rank(current_user)
+    users_above, users_below = get_rank_neighbours(current_user)
+    
+    return render_template('leaderboard.html', 
+                         top_users=top_users,
+                         user_rank=user_rank,
+                         coins_to_next_rank=coins_to_next_rank,
+                         users_above=users_above,
+                         users_below=users_below)
+
+@bp.route('/leaderboard/friends')
+@login_required
+def friends_leaderboard():
+    board = friend_graph().leaderboard(current_user.id)
+    user_entry = next(entry for entry in board if entry['id'] == current_user.id)
+    return render_template('friends_leaderboard.html', board=board, user_entry=user_entry)
+
+@bp.route('/api/leaderboard/friends')
+@login_required
+def friends_leaderboard_api():
+    board = friend_graph().leaderboard(current_user.id)
+    user_entry = next(entry for entry in board if entry['id'] == current_user.id)
+    return jsonify(rank=user_entry['rank'], size=len(board), leaderboard=board)
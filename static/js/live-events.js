@@ -0,0 +1,39 @@
+// Live updates for the signed-in player, pushed by the server over /events.
+// Balances update every [data-live-coins] element, and friend requests show
+// a notice. Each event is also dispatched on document as `arcade:<event>`
+// first; a page that calls preventDefault() on it handles the event itself.
+(function () {
+    const url = document.currentScript.dataset.url;
+    if (!window.EventSource || window.arcadeEvents) return;
+    const source = window.arcadeEvents = new EventSource(url);
+
+    function relay(name, handler) {
+        source.addEventListener(name, function (event) {
+            const data = JSON.parse(event.data);
+            const relayed = new CustomEvent('arcade:' + name, { detail: data, cancelable: true });
+            if (document.dispatchEvent(relayed) && handler) handler(data);
+        });
+    }
+
+    function notify(text, url) {
+        const notice = document.createElement('div');
+        notice.className = 'custom-flash alert-info alert-dismissible fade show';
+        notice.setAttribute('role', 'alert');
+        const link = document.createElement('a');
+        link.href = url;
+        link.textContent = text;
+        const close = document.createElement('button');
+        close.type = 'button';
+        close.className = 'btn-close';
+        close.dataset.bsDismiss = 'alert';
+        notice.append(link, close);
+        (document.querySelector('.container') || document.body).prepend(notice);
+    }
+
+    relay('balance', data => {
+        document.querySelectorAll('[data-live-coins]').forEach(element => element.textContent = data.coins);
+    });
+    relay('leaderboard');
+    relay('friend_request', data => notify(`${data.username} sent you a friend request.`, data.url));
+    relay('friend_accepted', data => notify(`${data.username} accepted your friend request.`, data.url));
+})();
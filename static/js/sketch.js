@@ -1,74 +1,24 @@
-
-let Engine = Matter.Engine,
-  Composite = Matter.Composite,
-  Bodies = Matter.Bodies;
-
-let engine;
-let world;
-let particles = [];
-let plinkos = [];
-let bounds = [];
-let rows = 13;
-let spacing = 40;
-let topPlinkoPos;
-let cols;
-let fixedPayouts = [4, 2, 1.4, 1, 0.8, 0.5, 0.5, 0.3, 0.5, 0.5, 0.8, 1, 1.4, 2, 4];
+// The server decides every drop; this file only draws the board and animates
+// the left/right path each ball was given.
+let rows = window.PLINKO_CONFIG.rows;
+let fixedPayouts = window.PLINKO_CONFIG.payouts;
+let spacing = 36;
+let boardTop = 60;
+let stepMs = 110;
+let balls = [];
 
 function setup() {
   let canvas = createCanvas(600, 600);
   canvas.parent("plinko-canvas-container");
-  engine = Engine.create();
-  world = engine.world;
-
-  cols = fixedPayouts.length - 1;
-
-  for (let row = 0; row < rows - 1; row++) {
-    let pinsInRow = row + 3;
-    for (let col = 0; col < pinsInRow; col++) {
-      let x = width / 2 - ((pinsInRow - 1) * spacing) / 2 + col * spacing;
-      let y = 100 + row * spacing;
-      let plinko = new Plinko(x, y, 5);
-      plinkos.push(plinko);
-      if (row === 0 && col === 1) {
-        topPlinkoPos = { x, y };
-      }
-    }
-  }
 
-  let slotCount = fixedPayouts.length;
-  let slotWidth = width * 0.9 / slotCount;
-  let xOffset = width * 0.05;
-  
-  
-  
   const container = document.getElementById("plinko-button-wrapper");
   const dropBtn = createButton('Drop Ball');
   dropBtn.parent(container);
   dropBtn.id('drop-ball-button');
-  dropBtn.mousePressed((e) => {
-    console.log(e)
+  dropBtn.mousePressed(() => {
     const bet = getCurrentBet();
-    if (topPlinkoPos && currentUserCoins() >= bet) {
-      const csrf = document.querySelector('input[name="csrf_token"]').value;
-
-      fetch('/games/plinko/start', {
-        method: 'POST',
-        headers: { 'X-CSRFToken': csrf },
-        body: new URLSearchParams({
-          'csrf_token': csrf,
-          'bet_amount': bet,
-        })
-      })
-        .then(res => res.json())
-        .then(data => {
-          if (data.success) {
-            let jitter = random(-2, 2);
-            particles.push(new Particle(topPlinkoPos.x + jitter, topPlinkoPos.y - 90, 5));
-            document.getElementById('balance').textContent = data.new_balance;
-          } else {
-            alert(data.message);
-          }
-        });
+    if (currentUserCoins() >= bet) {
+      playDrop(bet);
     }
   });
 
@@ -82,7 +32,7 @@ function setup() {
     const numBalls = parseInt(document.getElementById("num-balls").value || "1");
     const totalCost = bet * numBalls;
 
-    if (!topPlinkoPos || isNaN(numBalls) || numBalls < 1) {
+    if (isNaN(numBalls) || numBalls < 1) {
       alert("Enter a valid number of balls.");
       return;
     }
@@ -92,116 +42,162 @@ function setup() {
       return;
     }
 
-    const csrf = document.querySelector('input[name="csrf_token"]').value;
-
-    // Send a single POST to deduct the full amount
-    fetch('/games/plinko/start', {
-      method: 'POST',
-      headers: { 'X-CSRFToken': csrf },
-      body: new URLSearchParams({
-        'csrf_token': csrf,
-        'bet_amount': totalCost, // Total cost upfront
-        'auto_drop': true
-      })
+    playBatch(bet, numBalls);
+  });
+}
+
+// Auto Drop settles every ball in one request, then replays them one by one
+function playBatch(bet, count) {
+  const csrf = document.querySelector('input[name="csrf_token"]').value;
+
+  fetch('/games/plinko/batch', {
+    method: 'POST',
+    headers: { 'X-CSRFToken': csrf, 'Content-Type': 'application/json' },
+    body: JSON.stringify({ bet: bet, count: count, rows: rows })
+  })
+    .then(res => res.json())
+    .then(data => {
+      if (!data.success) {
+        alert(data.message);
+        return;
+      }
+      let balance = data.new_balance - data.win_amount;
+      document.getElementById('balance').textContent = balance;
+      data.slots.forEach((slot, i) => {
+        setTimeout(() => {
+          const winAmount = Math.floor(bet * fixedPayouts[slot]);
+          balance += winAmount;
+          balls.push(new Ball(randomPath(slot), slot, winAmount, balance));
+        }, i * 250); // Delay each drop
+      });
+    });
+}
+
+// Any ordering of `slot` right bounces lands in the same slot
+function randomPath(slot) {
+  const path = new Array(rows).fill(0).fill(1, 0, slot);
+  return shuffle(path);
+}
+
+function playDrop(bet) {
+  const csrf = document.querySelector('input[name="csrf_token"]').value;
+
+  fetch('/games/plinko/play', {
+    method: 'POST',
+    headers: { 'X-CSRFToken': csrf },
+    body: new URLSearchParams({
+      'csrf_token': csrf,
+      'bet_amount': bet,
+      'rows': rows,
     })
+  })
     .then(res => res.json())
     .then(data => {
       if (data.success) {
-        document.getElementById('balance').textContent = data.new_balance;
-        for (let i = 0; i < numBalls; i++) {
-          let jitter = random(-5, 5);
-          setTimeout(() => {
-            particles.push(new Particle(topPlinkoPos.x + jitter, topPlinkoPos.y - 90, 5));
-          }, i * 250); // Delay each drop
-        }
+        // Show the stake leaving now and the winnings when the ball lands
+        document.getElementById('balance').textContent = data.new_balance - data.win_amount;
+        balls.push(new Ball(data.path, data.slot, data.win_amount, data.new_balance));
       } else {
         alert(data.message);
       }
     });
-  });
+}
 
+// Pin `col` of row `row`; row r holds r + 3 pins centred on the canvas
+function pinX(row, col) {
+  return width / 2 - ((row + 2) * spacing) / 2 + col * spacing;
+}
+
+function slotX(slot) {
+  return width / 2 + (slot - rows / 2) * spacing;
+}
 
+function Ball(path, slot, winAmount, newBalance) {
+  // Waypoints: above the board, the pin hit on each row, then the slot
+  this.points = [{ x: width / 2, y: boardTop - spacing }];
+  let rights = 0;
+  for (let row = 0; row < rows; row++) {
+    this.points.push({ x: pinX(row, 1 + rights), y: boardTop + row * spacing - 6 });
+    rights += path[row];
+  }
+  this.points.push({ x: slotX(slot), y: height - 30 });
+  this.slot = slot;
+  this.winAmount = winAmount;
+  this.newBalance = newBalance;
+  this.start = millis();
 }
 
+Ball.prototype.position = function () {
+  let t = (millis() - this.start) / stepMs;
+  let i = Math.min(Math.floor(t), this.points.length - 2);
+  let f = Math.min(t - i, 1);
+  let a = this.points[i];
+  let b = this.points[i + 1];
+  // Small hop between pins so the ball reads as bouncing
+  return { x: lerp(a.x, b.x, f), y: lerp(a.y, b.y, f * f) - sin(f * PI) * 6 };
+};
+
+Ball.prototype.done = function () {
+  return millis() - this.start >= stepMs * (this.points.length - 1);
+};
+
 function draw() {
   animateSlots();
   background(0);
-  Engine.update(engine);
-
-  for (let p of plinkos) p.show();
-  for (let b of bounds) b.show();
-
-  for (let i = particles.length - 1; i >= 0; i--) {
-    let particle = particles[i];
-    particle.show();
-    if (particle.body.position.y > height - 30) {
-      let x = particle.body.position.x;
-      let bet = getCurrentBet();
-      processPlinkoResult(x, bet);
-      Composite.remove(world, particle.body);
-      particles.splice(i, 1);
+
+  fill(0, 255, 0);
+  stroke(255);
+  for (let row = 0; row < rows; row++) {
+    for (let col = 0; col < row + 3; col++) {
+      ellipse(pinX(row, col), boardTop + row * spacing, 10);
+    }
+  }
+
+  fill(255);
+  for (let i = balls.length - 1; i >= 0; i--) {
+    let ball = balls[i];
+    let pos = ball.position();
+    ellipse(pos.x, pos.y, 10);
+    if (ball.done()) {
+      landBall(ball);
+      balls.splice(i, 1);
     }
   }
 
   textAlign(CENTER);
-  textSize(16);
-  let slotWidth = width * 0.9 / (cols + 1);
-  let xOffset = width * 0.05;
-  
-for (let i = 0; i < fixedPayouts.length; i++) {
-    let x = xOffset + i * slotWidth + slotWidth / 2;
+  textSize(12);
+  noStroke();
+  for (let i = 0; i < fixedPayouts.length; i++) {
+    let x = slotX(i);
     let y = height - 20;
     let mult = fixedPayouts[i];
     fill(mult >= 5 ? '#e74c3c' : mult >= 2 ? '#e67e22' : mult >= 1 ? '#f1c40f' : '#3498db');
     rectMode(CENTER);
-    
+
     let bounce = 1 + slotAnimations[i] * 0.3;
-    rect(x, y + slotAnimations[i] * 5, 40 * bounce, 25 * bounce, 8);
+    rect(x, y + slotAnimations[i] * 5, (spacing - 4) * bounce, 25 * bounce, 8);
 
     fill(255);
     text(`${mult}x`, x, y + 5);
   }
 }
 
-function processPlinkoResult(x, bet) {
-  let slotWidth = width * 0.9 / (cols + 1);
-  let xOffset = width * 0.05;
-  let slotIndex = Math.floor((x - xOffset) / slotWidth);
-  slotIndex = Math.max(0, Math.min(fixedPayouts.length - 1, slotIndex));
-  let multiplier = fixedPayouts[slotIndex];
-  let payout = Math.floor(bet * multiplier);
-  slotAnimations[slotIndex] = 1;
-
-  const csrf = document.querySelector('input[name="csrf_token"]').value;
-
-  fetch('/games/plinko/payout', {
-    method: 'POST',
-    headers: { 'X-CSRFToken': csrf },
-    body: new URLSearchParams({
-      'csrf_token': csrf,
-      'payout': payout,
-    })
-  })
-    .then(res => res.json())
-    .then(data => {
-      if (data.success) {
-        const balanceElem = document.getElementById('balance');
-        balanceElem.textContent = data.new_balance;
-
-        const plus = document.createElement("span");
-        plus.textContent = ` +${payout}`;
-        plus.style.color = "lime";
-        plus.style.marginLeft = "10px";
-        plus.style.transition = "opacity 1s ease";
-        plus.style.opacity = 1;
-        plus.style.fontWeight = 'bold';
-        balanceElem.parentNode.appendChild(plus);
-        setTimeout(() => plus.style.opacity = 0, 800);
-        setTimeout(() => plus.remove(), 1800);
-      } else {
-        alert(data.message);
-      }
-    });
+function landBall(ball) {
+  slotAnimations[ball.slot] = 1;
+
+  const balanceElem = document.getElementById('balance');
+  balanceElem.textContent = ball.newBalance;
+
+  const plus = document.createElement("span");
+  plus.textContent = ` +${ball.winAmount}`;
+  plus.style.color = "lime";
+  plus.style.marginLeft = "10px";
+  plus.style.transition = "opacity 1s ease";
+  plus.style.opacity = 1;
+  plus.style.fontWeight = 'bold';
+  balanceElem.parentNode.appendChild(plus);
+  setTimeout(() => plus.style.opacity = 0, 800);
+  setTimeout(() => plus.remove(), 1800);
 }
 
 function getCurrentBet() {
@@ -222,4 +218,4 @@ function animateSlots() {
       if (slotAnimations[i] < 0) slotAnimations[i] = 0;
     }
   }
-}
\ No newline at end of file
+}
@@ -0,0 +1,104 @@
+"""Fixtures shared by the tests: the arcade on a throwaway SQLite database."""
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+from werkzeug.security import generate_password_hash
+
+import commands
+from app import create_app
+from extensions import db
+from games import game_state_store
+from models import User
+
+PASSWORD = 'correct horse'
+PASSWORD_HASH = generate_password_hash(PASSWORD)  # hashing is slow, and every user shares it
+
+
+def make_app(tmp_path, **config):
+    """Build the arcade on a fresh database in `tmp_path`; `config` overrides the test settings"""
+    app = create_app({
+        'SECRET_KEY': 'test',
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'arcade.db'}",
+        'UPLOAD_FOLDER': str(tmp_path / 'avatars'),
+        'RESPONSE_CACHE_DIR': str(tmp_path / 'response_cache'),
+        'TESTING': True,
+        'WTF_CSRF_ENABLED': False,
+        **config,
+    })
+    with app.app_context():
+        commands.create_tables()
+    return app
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = make_app(tmp_path)
+    yield app
+    dispatcher = app.extensions.get('mail_dispatcher')
+    if dispatcher is not None:
+        dispatcher.stop()
+
+
+def add_user(name, coins=1000):
+    """Add a confirmed user who can sign in with PASSWORD; returns their id"""
+    user = User(username=name, email=f'{name}@example.com', password=PASSWORD_HASH,
+                email_confirmed=True, coins=coins)
+    db.session.add(user)
+    db.session.commit()
+    return user.id
+
+
+@pytest.fixture
+def users(app):
+    """Ids of three players with 1000 coins each"""
+    with app.app_context():
+        return [add_user(f'player{i}') for i in range(3)]
+
+
+@pytest.fixture
+def login(app):
+    """Return a function that signs a new test client in as the named user"""
+    def login(name):
+        client = app.test_client()
+        response = client.post('/login', data={'email': f'{name}@example.com', 'password': PASSWORD})
+        assert response.status_code == 302
+        return client
+    return login
+
+
+@pytest.fixture
+def client(users, login):
+    """A test client signed in as player0"""
+    return login('player0')
+
+
+def stored_game(app, client, name, state=None):
+    """Return the stored state of the client's `name` game, replacing it first if `state` is given"""
+    with app.test_request_context():
+        with client.session_transaction() as session:
+            game_id = session.get(f'{name}_game_id')
+        if game_id is None:
+            return None
+        store = game_state_store()
+        if state is not None:
+            store.set(game_id, state)
+            db.session.commit()
+        return store.get(game_id)
+
+
+@contextmanager
+def counted_statements(app):
+    """Collect the SQL statements the app runs inside the block"""
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
@@ -0,0 +1,47 @@
+from math import comb, prod
+
+import numpy as np
+import pytest
+
+import arcade_sim
+import mines_odds
+import paytables
+
+ROUNDS = 400000
+
+
+def closed_form_rtp(opts):
+    """Chance of reaching the cashout times its payout, from the odds tables"""
+    if opts.game == 'mines':
+        survive = comb(mines_odds.GRID_SIZE - opts.mines, opts.reveals) / comb(mines_odds.GRID_SIZE, opts.reveals)
+        payout = int(opts.bet * mines_odds.multiplier(opts.mines, opts.reveals))
+    elif opts.game == 'ladder':
+        survive = (opts.safe_spots / 3) ** (opts.level - 1)
+        payout = int(opts.bet * paytables.next_multiplier(opts.level, opts.safe_spots))
+    else:
+        steps = range(1, int(opts.cashout_time / paytables.BALLOON_HAZARD_STEP) + 1)
+        survive = prod(1 - paytables.balloon_pop_chance(k * paytables.BALLOON_HAZARD_STEP) for k in steps)
+        payout = int(opts.bet * paytables.balloon_multiplier(opts.cashout_time))
+    return survive * payout / opts.bet
+
+
+@pytest.mark.parametrize('argv', [
+    ['mines'],
+    ['mines', '--mines', '20', '--reveals', '2'],
+    ['ladder'],
+    ['ladder', '--safe-spots', '2', '--level', '6'],
+    ['balloon'],
+    ['balloon', '--cashout-time', '1.5'],
+])
+def test_simulated_rtp_matches_the_odds(argv):
+    opts = arcade_sim.parse_args(argv)
+    returns = arcade_sim.SIMULATORS[opts.game](np.random.default_rng(5), ROUNDS, opts) / opts.bet
+    margin = 4 * returns.std() / np.sqrt(ROUNDS)
+    assert abs(returns.mean() - closed_form_rtp(opts)) < margin
+
+
+def test_balloon_pop_times_follow_the_hazard_curve():
+    times = arcade_sim.balloon_pop_times(np.random.default_rng(5), ROUNDS)
+    first = paytables.BALLOON_HAZARD_STEP
+    assert np.all(np.isclose(times / first, np.round(times / first)))
+    assert abs(np.mean(times == first) - paytables.balloon_pop_chance(first)) < 0.002
@@ -0,0 +1,118 @@
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from PIL import Image
+
+import avatars
+from conftest import PASSWORD
+from extensions import db
+from models import User
+
+
+def picture(size=(400, 300), color=(200, 40, 90), fmt='PNG', **options):
+    """Encoded bytes of a two-tone test picture"""
+    image = Image.new('RGB', size, color)
+    image.paste((20, 160, 60), (0, 0, size[0] // 3, size[1]))
+    data = io.BytesIO()
+    image.save(data, format=fmt, **options)
+    return data.getvalue()
+
+
+@pytest.fixture
+def processed(app):
+    """Process uploads on one thread; calling the fixture waits for the uploads sent so far"""
+    pool = app.extensions['avatar_pool'] = ThreadPoolExecutor(max_workers=1)
+    yield lambda: pool.submit(lambda: None).result()
+    pool.shutdown()
+
+
+def upload(client, name, data, filename='me.png'):
+    return client.post('/update_profile', data={
+        'username': name, 'email': f'{name}@example.com', 'bio': '',
+        'avatar': (io.BytesIO(data), filename),
+    })
+
+
+def avatar_of(app, user_id):
+    with app.app_context():
+        return db.session.get(User, user_id).avatar
+
+
+def test_every_size_and_format_is_written_square(tmp_path):
+    key = avatars.process_avatar(picture(fmt='JPEG'), str(tmp_path))
+
+    assert avatars.is_variant_key(key)
+    assert sorted(os.listdir(tmp_path)) == sorted(os.path.basename(path)
+                                                  for path in avatars.variant_paths(str(tmp_path), key))
+    for size in avatars.AVATAR_SIZES:
+        for fmt in avatars.AVATAR_FORMATS:
+            with Image.open(tmp_path / avatars.variant_name(key, size, fmt)) as image:
+                assert (image.format.lower(), image.size) == (fmt, (size, size))
+
+
+def test_upload_switches_the_avatar_once_processed(app, users, client, processed):
+    old = avatar_of(app, users[0])
+    upload(client, 'player0', picture())
+    processed()
+
+    key = avatar_of(app, users[0])
+    assert key != old and avatars.variants_exist(app.config['UPLOAD_FOLDER'], key)
+    page = client.get('/profile').get_data(as_text=True)
+    assert f'/avatars/{avatars.variant_name(key, 150, "webp")}' in page
+
+
+def test_unreadable_upload_is_refused(app, users, client, processed):
+    old = avatar_of(app, users[0])
+    response = upload(client, 'player0', b'not an image', filename='me.png')
+    processed()
+
+    assert response.status_code == 302
+    assert avatar_of(app, users[0]) == old
+    assert not os.path.exists(app.config['UPLOAD_FOLDER']) or not os.listdir(app.config['UPLOAD_FOLDER'])
+
+
+def test_variants_are_cached_for_good(app, users, client, processed):
+    upload(client, 'player0', picture())
+    processed()
+    key = avatar_of(app, users[0])
+
+    response = client.get(f'/avatars/{avatars.variant_name(key, 64, "png")}')
+    assert response.status_code == 200
+    assert response.cache_control.immutable
+    assert response.cache_control.max_age == 31536000
+
+
+def test_same_picture_is_stored_once_however_it_was_encoded(app, users, login, processed):
+    from PIL import PngImagePlugin
+
+    metadata = PngImagePlugin.PngInfo()
+    metadata.add_text('Comment', 'exported again')
+    upload(login('player0'), 'player0', picture())
+    upload(login('player1'), 'player1', picture(optimize=True, pnginfo=metadata), filename='copy.png')
+    processed()
+
+    key = avatar_of(app, users[0])
+    assert avatar_of(app, users[1]) == key
+    assert len(os.listdir(app.config['UPLOAD_FOLDER'])) == len(avatars.AVATAR_SIZES) * len(avatars.AVATAR_FORMATS)
+
+
+def test_shared_files_are_removed_with_their_last_user(app, users, login, processed):
+    folder = app.config['UPLOAD_FOLDER']
+    alice, bob = login('player0'), login('player1')
+    upload(alice, 'player0', picture())
+    upload(bob, 'player1', picture())
+    processed()
+    shared = avatar_of(app, users[0])
+
+    # Alice moves on; Bob still shows the shared picture
+    upload(alice, 'player0', picture(color=(10, 10, 240)))
+    processed()
+    assert avatar_of(app, users[0]) != shared
+    assert avatars.variants_exist(folder, shared)
+
+    # Bob was its last user
+    bob.post('/delete_account', data={'password': PASSWORD})
+    assert not any(os.path.exists(path) for path in avatars.variant_paths(folder, shared))
+    assert avatars.variants_exist(folder, avatar_of(app, users[0]))
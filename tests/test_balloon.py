@@ -0,0 +1,78 @@
+import time
+
+import pytest
+
+import paytables
+from conftest import stored_game
+from extensions import db
+from models import User
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """The server's clock, moved forward by hand"""
+    class Clock:
+        now = time.time()
+
+        def __call__(self):
+            return self.now
+
+    clock = Clock()
+    monkeypatch.setattr(time, 'time', clock)
+    return clock
+
+
+def start_round(app, client, pop_time):
+    client.post('/games/balloon_rise', data={'bet': 100})
+    stored_game(app, client, 'balloon', dict(stored_game(app, client, 'balloon'), pop_time=pop_time))
+
+
+def launch(client):
+    # Opening the stream starts the clock; the events themselves are not needed here
+    client.get('/games/balloon_rise/stream', buffered=False).close()
+
+
+def coins(app, user_id):
+    with app.app_context():
+        return db.session.get(User, user_id).coins
+
+
+def test_cashout_pays_for_the_time_the_server_saw(app, users, client, clock):
+    start_round(app, client, pop_time=30.0)
+    launch(client)
+    clock.now += 4.0
+    assert client.get('/games/balloon_rise/check').json == {
+        'status': 'ok', 'multiplier': round(paytables.balloon_multiplier(4.0), 2)}
+
+    client.get('/games/balloon_rise/cashout?multiplier=100')
+    assert coins(app, users[0]) == 900 + int(100 * paytables.balloon_multiplier(4.0))
+    assert client.get('/games/balloon_rise/check').json == {'status': 'ended'}
+
+
+def test_clock_only_starts_when_the_balloon_launches(app, users, client, clock):
+    start_round(app, client, pop_time=30.0)
+    clock.now += 60.0  # the page sat open before launching
+    launch(client)
+    clock.now += 1.0
+    client.get('/games/balloon_rise/cashout')
+    assert coins(app, users[0]) == 900 + int(100 * paytables.balloon_multiplier(1.0))
+
+
+def test_cashout_after_the_pop_point_pays_nothing(app, users, client, clock):
+    start_round(app, client, pop_time=2.0)
+    launch(client)
+    clock.now += 2.0
+    assert client.get('/games/balloon_rise/check').json == {'status': 'popped'}
+    client.get('/games/balloon_rise/cashout')
+    assert coins(app, users[0]) == 900
+
+
+def test_stream_sends_the_curve_then_the_pop_but_never_the_pop_point(app, users, client):
+    start_round(app, client, pop_time=paytables.BALLOON_HAZARD_STEP)
+    body = client.get('/games/balloon_rise/stream').get_data(as_text=True)
+
+    events = [block.split('\n')[0] for block in body.strip().split('\n\n')]
+    assert events == ['event: schedule', 'event: pop']
+    assert 'pop_time' not in body
+    assert f'"multiplier": {round(paytables.balloon_multiplier(paytables.BALLOON_HAZARD_STEP), 2)}' in body
+    assert client.get('/games/balloon_rise/stream').get_data(as_text=True) == 'event: ended\ndata: {}\n\n'
@@ -0,0 +1,141 @@
+"""Microbenchmarks for the game math and the game state serialization.
+
+These time the hot pieces in isolation with pytest-benchmark. They are
+marked slow, so they only run when asked for:
+
+    python -m pytest -m slow tests/test_benchmarks.py
+
+To follow them over time, save a run with --benchmark-autosave and check
+later runs against the last saved one with --benchmark-compare
+--benchmark-compare-fail=median:20%, which fails on anything more than 20%
+slower. Compare runs from the same machine.
+"""
+import json
+import random
+
+import pytest
+
+import mines_odds
+import paytables
+from blackjack_engine import BlackjackEngine, Shoe
+
+pytest.importorskip('pytest_benchmark')
+pytestmark = pytest.mark.slow
+
+
+def test_blackjack_score(benchmark):
+    hands = [(total, aces) for total in range(2, 31) for aces in range(3)]
+    score = BlackjackEngine._score
+    benchmark(lambda: [score(total, aces) for total, aces in hands])
+
+
+def test_blackjack_round(benchmark):
+    engine = BlackjackEngine(Shoe())
+
+    def play():
+        engine.deal(10)
+        while not engine.game_over and engine.score(engine.active_hand) < 17:
+            engine.hit()
+        if not engine.game_over:
+            engine.stand()
+    benchmark(play)
+    if benchmark.enabled:
+        assert 1 / benchmark.stats.stats.median > 10_000  # hands per second on a six-deck shoe
+
+
+def test_mines_multiplier(benchmark):
+    picks = [(mines, revealed) for mines in range(mines_odds.MIN_MINES, mines_odds.MAX_MINES + 1)
+             for revealed in range(mines_odds.GRID_SIZE - mines + 1)]
+    multiplier = mines_odds.multiplier
+    benchmark(lambda: [multiplier(mines, revealed) for mines, revealed in picks])
+    if benchmark.enabled:
+        # A table lookup, not a loop over the revealed tiles
+        assert benchmark.stats.stats.median / len(picks) < 2e-6
+
+
+def test_ladder_next_multiplier(benchmark):
+    picks = [(level, safe_spots) for level in range(1, 11) for safe_spots in (1, 2)]
+    next_multiplier = paytables.next_multiplier
+    benchmark(lambda: [next_multiplier(level, safe_spots) for level, safe_spots in picks])
+
+
+@pytest.mark.parametrize('formula', [paytables.balloon_multiplier, paytables.balloon_pop_chance],
+                         ids=['multiplier', 'pop_chance'])
+def test_balloon_formulas(benchmark, formula):
+    times = [i * paytables.BALLOON_HAZARD_STEP for i in range(100)]
+    benchmark(lambda: [formula(t) for t in times])
+
+
+def test_balloon_pop_time(benchmark):
+    benchmark(paytables.balloon_pop_time)
+
+
+def test_slots_spin(benchmark):
+    # The single-spin route: draw three symbols, then score them
+    def spin():
+        symbols = random.choices(paytables.SLOT_SYMBOLS, paytables.SLOT_WEIGHTS, k=3)
+        return paytables.slots_multiplier(symbols)
+    benchmark(spin)
+
+
+def test_slots_batch_1000(benchmark):
+    # The batch route: draw every reel at once and score by table lookup
+    def spin_batch():
+        reels = random.choices(range(len(paytables.SLOT_SYMBOLS)), cum_weights=paytables.SLOT_CUM_WEIGHTS, k=3000)
+        return sum(paytables.SLOT_MULTIPLIER_TABLE[paytables.slot_index(*reels[i:i + 3])]
+                   for i in range(0, 3000, 3))
+    benchmark(spin_batch)
+
+
+def mines_state():
+    return {'bet': 100, 'mines': 5, 'mine_positions': [3, 7, 11, 18, 22],
+            'safe_revealed': [0, 1, 2, 4, 5, 6], 'grid_size': 25, 'active': True}
+
+
+def blackjack_states():
+    engine = BlackjackEngine(Shoe())
+    engine.deal(100)
+    engine.hit()
+    return engine.to_state(), engine.shoe.to_state()
+
+
+def round_trip(state):
+    # What the SQL game state store does on every save and load
+    return json.loads(json.dumps(state, separators=(',', ':')))
+
+
+def test_state_mines_json(benchmark):
+    state = mines_state()
+    benchmark(round_trip, state)
+
+
+def test_state_blackjack_json(benchmark):
+    hand, shoe = blackjack_states()
+    benchmark(lambda: (round_trip(hand), round_trip(shoe)))
+
+
+def test_state_blackjack_restore(benchmark):
+    hand, shoe = blackjack_states()
+    benchmark(lambda: BlackjackEngine.from_state(hand, Shoe.from_state(shoe)).scores)
+
+
+def signed_session(app, session):
+    serializer = app.session_interface.get_signing_serializer(app)
+    return lambda: serializer.loads(serializer.dumps(session))
+
+
+def test_session_sign_ids(app, benchmark):
+    # The session cookie as it is now: the login, theme and opaque game ids
+    benchmark(signed_session(app, {
+        '_user_id': '42', '_fresh': True, 'theme': 'dark', 'csrf_token': 'c' * 40,
+        'mines_game_id': 'm' * 22, 'blackjack_game_id': 'b' * 22, 'blackjack_shoe_game_id': 's' * 22,
+    }))
+
+
+def test_session_sign_game_blobs(app, benchmark):
+    # The same cookie carrying whole game states, as the games did before the state store
+    hand, shoe = blackjack_states()
+    benchmark(signed_session(app, {
+        '_user_id': '42', '_fresh': True, 'theme': 'dark', 'csrf_token': 'c' * 40,
+        'mines_game': mines_state(), 'blackjack': hand, 'blackjack_shoe': shoe,
+    }))
@@ -0,0 +1,44 @@
+from conftest import stored_game
+
+ONE_DECK = sorted(bytes([1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 10, 10, 10] * 4))
+
+
+def deal(client, bet=10):
+    client.get('/games/blackjack?action=new')
+    client.post('/games/blackjack', data={'bet': bet})
+
+
+def test_hands_are_dealt_from_one_shoe_across_requests(app, client):
+    app.config['BLACKJACK_DECKS'] = 2
+    deal(client)
+    shoe = stored_game(app, client, 'blackjack_shoe')
+    assert sorted(bytes.fromhex(shoe['cards'])) == sorted(bytes(ONE_DECK) * 2)
+    assert shoe['position'] >= 4
+
+    for _ in range(3):
+        client.get('/games/blackjack?action=stand')
+        deal(client)
+        later = stored_game(app, client, 'blackjack_shoe')
+        assert later['cards'] == shoe['cards']
+        assert later['position'] >= shoe['position'] + 4
+        shoe = later
+
+    # The hand on the table is the four cards before the shoe's position
+    hand = stored_game(app, client, 'blackjack')
+    cards, position = bytes.fromhex(shoe['cards']), shoe['position']
+    assert hand['player_hands'] == [list(cards[position - 4:position - 2])]
+    assert hand['dealer'] == list(cards[position - 2:position])
+
+
+def test_shoe_is_reshuffled_once_the_cut_card_is_out(app, client):
+    app.config['BLACKJACK_DECKS'] = 1
+    deal(client)
+    shoe = stored_game(app, client, 'blackjack_shoe')
+    client.get('/games/blackjack?action=stand')
+    cut_card = int(len(ONE_DECK) * shoe['penetration'])
+    stored_game(app, client, 'blackjack_shoe', dict(shoe, position=cut_card))
+
+    deal(client)
+    fresh = stored_game(app, client, 'blackjack_shoe')
+    assert fresh['position'] == 4
+    assert sorted(bytes.fromhex(fresh['cards'])) == ONE_DECK
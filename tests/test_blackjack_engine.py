@@ -0,0 +1,98 @@
+import pytest
+
+from blackjack_engine import BlackjackEngine, Shoe
+
+
+def rigged(*cards):
+    """A one-deck shoe that deals `cards` first (player, player, dealer, dealer, then draws), then tens"""
+    cards = bytes(cards) + bytes([10] * (52 - len(cards)))
+    return Shoe.from_state({'decks': 1, 'penetration': 0.75, 'cards': cards.hex(), 'position': 0})
+
+
+def dealt(*cards, bet=10):
+    engine = BlackjackEngine(rigged(*cards))
+    engine.deal(bet)
+    return engine
+
+
+@pytest.mark.parametrize('cards, payout, message', [
+    ((10, 9, 10, 7), 20, "You win!"),
+    ((10, 6, 10, 8), 0, "Dealer wins!"),
+    ((10, 8, 10, 8), 10, "It's a push!"),
+    ((10, 8, 10, 6, 10), 20, "You win!"),  # dealer draws to 26
+])
+def test_stand_settles_against_the_dealer(cards, payout, message):
+    engine = dealt(*cards)
+    assert engine.stand() == payout
+    assert engine.message == message
+    assert engine.game_over and not engine.can_double and not engine.can_split
+    assert engine.dealer_score >= 17
+
+
+def test_dealer_does_not_draw_when_every_hand_busts():
+    engine = dealt(10, 6, 10, 2, 10)
+    assert engine.hit() == 0
+    assert engine.game_over
+    assert engine.scores == [26]
+    assert engine.dealer == [10, 2]
+
+
+def test_aces_count_as_eleven_only_while_they_fit():
+    engine = dealt(1, 6, 10, 7, 10, 1)
+    assert engine.score(0) == 17
+    assert engine.hit() == 0
+    assert engine.score(0) == 17
+    assert engine.hit() == 0
+    assert engine.score(0) == 18
+    assert engine.stand() == 20
+
+
+def test_double_doubles_the_stake_and_draws_one_card():
+    engine = dealt(5, 6, 10, 7, 10)
+    assert engine.can_double and not engine.can_split
+    assert engine.double() == 40
+    assert engine.bets == [20]
+    assert engine.player_hands == [[5, 6, 10]]
+    assert engine.game_over
+
+
+def test_split_plays_each_hand_and_settles_them_together():
+    engine = dealt(8, 8, 10, 7, 3, 10)
+    assert engine.can_split
+    assert engine.split() == 0
+    assert engine.player_hands == [[8, 3], [8, 10]]
+    assert engine.bets == [10, 10]
+    assert (engine.active_hand, engine.can_double, engine.can_split) == (0, True, False)
+
+    assert engine.stand() == 0
+    assert (engine.active_hand, engine.game_over) == (1, False)
+    assert engine.stand() == 20
+    assert engine.message == "Game over! Results: 1 win, 1 loss. Net change: 0 coins."
+
+
+def test_double_after_split_only_raises_that_hand():
+    engine = dealt(8, 8, 10, 7, 10, 3, 10)
+    engine.split()
+    assert engine.stand() == 0
+    assert engine.player_hands[1] == [8, 3]
+    assert engine.double() == 20 + 40
+    assert engine.bets == [10, 20]
+    assert engine.scores == [18, 21]
+
+
+def test_state_round_trip_keeps_running_totals():
+    engine = dealt(1, 8, 10, 6)
+    engine.hit()
+    restored = BlackjackEngine.from_state(engine.to_state(), engine.shoe)
+    assert restored.scores == engine.scores == [19]
+    assert restored.dealer_score == engine.dealer_score == 16
+    assert restored.stand() == 20
+
+
+def test_shoe_reshuffles_at_the_cut_card():
+    shoe = Shoe(decks=1)
+    assert sorted(shoe.cards) == sorted(bytes([1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 10, 10, 10] * 4))
+    shoe.position = shoe.cut_card
+    engine = BlackjackEngine(shoe)
+    engine.deal(10)
+    assert shoe.position == 4
@@ -0,0 +1,89 @@
+from sqlalchemy import func
+
+from coins import adjust_coins
+from extensions import db
+from models import CoinLedger, User
+
+
+def ledger_total(user_id):
+    return db.session.query(func.coalesce(func.sum(CoinLedger.delta), 0)).filter_by(user_id=user_id).scalar()
+
+
+def play_every_game(client):
+    for _ in range(3):
+        client.post('/games/slots/spin', json={'bet': 5})
+    client.post('/games/slots/spin_batch', json={'bet': 2, 'count': 50})
+
+    client.post('/games/plinko/play', data={'bet_amount': 10})
+    client.post('/games/plinko/batch', json={'bet': 3, 'count': 20})
+
+    for _ in range(3):
+        client.post('/games/mines', data={'bet': 10, 'mines': 3})
+        for tile in range(2):
+            if client.post(f'/games/mines/pick/{tile}').json.get('game_over'):
+                break
+        client.get('/games/mines/cashout')
+        client.get('/games/mines?reset=true')
+
+    for action in ('stand', 'double', 'hit'):
+        client.post('/games/blackjack', data={'bet': 10})
+        client.get(f'/games/blackjack?action={action}')
+        client.get('/games/blackjack?action=stand')
+        client.get('/games/blackjack?action=new')
+
+    client.post('/ladder_climb', data={'bet': 10, 'safe_spots': 2})
+    client.post('/ladder_pick/left')
+    client.get('/ladder_cashout')
+
+    client.post('/games/balloon_rise', data={'bet': 10})
+    client.get('/games/balloon_rise/cashout')
+
+
+def test_ledger_accounts_for_every_coin(app, users, client):
+    play_every_game(client)
+    with app.app_context():
+        user = db.session.get(User, users[0])
+        assert user.coins - 1000 == ledger_total(user.id)
+        games = {game for game, in db.session.query(CoinLedger.game).filter_by(user_id=user.id).distinct()}
+        # A Plinko drop on a 1x slot, or a run of spins that breaks even, changes nothing and records nothing
+        assert games - {'slots', 'plinko'} == {'mines', 'blackjack', 'ladder', 'balloon'}
+        assert games <= {'slots', 'plinko', 'mines', 'blackjack', 'ladder', 'balloon'}
+        # Other players' balances are untouched
+        assert [u.coins for u in User.query.filter(User.id != user.id)] == [1000, 1000]
+
+
+def test_debit_beyond_the_balance_is_refused(app, users):
+    with app.app_context():
+        user = db.session.get(User, users[0])
+        assert not adjust_coins(user, -1001, 'slots', 'spin')
+        assert adjust_coins(user, -1000, 'slots', 'spin')
+        db.session.commit()
+        assert user.coins == 0
+        assert ledger_total(user.id) == -1000
+
+
+def test_net_win_still_needs_the_stake_covered(app, users):
+    with app.app_context():
+        user = db.session.get(User, users[0])
+        assert not adjust_coins(user, 500, 'slots', 'batch x300', stake=1500)
+        assert adjust_coins(user, 500, 'slots', 'batch x200', stake=1000)
+        db.session.commit()
+        assert user.coins == 1500
+        assert db.session.query(CoinLedger.delta).filter_by(user_id=user.id).all() == [(500,)]
+
+
+def test_rolled_back_change_leaves_no_trace(app, users):
+    with app.app_context():
+        user = db.session.get(User, users[0])
+        assert adjust_coins(user, -100, 'slots', 'spin')
+        db.session.rollback()
+        assert db.session.get(User, users[0]).coins == 1000
+        assert CoinLedger.query.count() == 0
+
+
+def test_ledger_outlives_the_account(app, users, client):
+    client.post('/games/slots/spin', json={'bet': 5})
+    client.post('/delete_account', data={'password': 'correct horse'})
+    with app.app_context():
+        assert db.session.get(User, users[0]) is None
+        assert CoinLedger.query.filter_by(game='slots').count() == 1
@@ -0,0 +1,65 @@
+import json
+
+import pytest
+
+from coins import adjust_coins
+from events import coins_channel, event_broker, on_commit, user_channel
+from extensions import db
+from models import User
+
+
+@pytest.fixture(params=['memory', 'sql'])
+def broker(request, app):
+    app.config.update(EVENT_BROKER=request.param, EVENT_POLL_INTERVAL=0.05)
+    with app.app_context():
+        yield event_broker()
+
+
+def frames(subscription, timeout=0.3):
+    return [(name, json.loads(data)) for _, name, data in subscription.wait(timeout)]
+
+
+def test_balance_change_is_published_on_commit(broker, users):
+    user = db.session.get(User, users[0])
+    subscription = broker.subscribe([user_channel(user.id), coins_channel(user.id)])
+    adjust_coins(user, -10, 'slots', 'spin')
+    assert frames(subscription, timeout=0.1) == []
+    db.session.commit()
+    assert frames(subscription) == [
+        ('balance', {'coins': 990, 'delta': -10, 'game': 'slots'}),
+        ('leaderboard', {'id': user.id, 'coins': 990}),
+    ]
+
+
+def test_rollback_publishes_nothing(broker, users):
+    user = db.session.get(User, users[0])
+    subscription = broker.subscribe([user_channel(user.id)])
+    called = []
+    adjust_coins(user, -10, 'slots', 'spin')
+    on_commit(called.append, 'rolled back')
+    db.session.rollback()
+    assert frames(subscription) == []
+
+    # The dropped events do not ride along with the next commit
+    adjust_coins(user, 25, 'slots', 'payout')
+    on_commit(called.append, 'committed')
+    db.session.commit()
+    assert frames(subscription) == [('balance', {'coins': 1025, 'delta': 25, 'game': 'slots'})]
+    assert called == ['committed']
+
+
+def test_stream_delivers_the_players_balance(app, users, client, login):
+    app.config['EVENT_KEEPALIVE'] = 0.1
+    response = client.get('/events', buffered=False)
+    assert response.mimetype == 'text/event-stream'
+    chunks = iter(response.response)
+    assert next(chunks) == b'retry: 3000\n\n'
+
+    login('player1').post('/games/slots/spin', json={'bet': 5})  # someone else's balance
+    client.post('/games/slots/spin', json={'bet': 5})
+    frame = next(chunk for chunk in chunks if b'event: balance' in chunk)
+    data = json.loads(frame.decode().split('data: ')[1])
+    assert data['game'] == 'slots'
+    with app.app_context():
+        assert data['coins'] == db.session.get(User, users[0]).coins
+    response.close()
@@ -0,0 +1,96 @@
+import pytest
+
+import games.balloon
+import games.blackjack
+import games.ladder
+import games.mines
+from extensions import db
+from games import game_state_store
+from models import User
+
+
+@pytest.fixture(params=['memory', 'sql'])
+def store(request, app):
+    app.config['GAME_STATE_BACKEND'] = request.param
+    with app.app_context():
+        yield game_state_store()
+
+
+def test_routes_get_copies_of_the_stored_state(store):
+    store.set('g', {'safe_revealed': [1], 'active': True})
+    state = store.get('g')
+    state['safe_revealed'].append(2)
+    state['active'] = False
+    assert store.get('g') == {'safe_revealed': [1], 'active': True}
+
+
+def test_replace_only_swaps_the_state_it_expects(store):
+    store.set('g', {'level': 1})
+    assert not store.replace('g', {'level': 2}, {'level': 3})
+    assert store.replace('g', {'level': 1}, {'level': 2})
+    assert not store.replace('g', {'level': 1}, None)
+    assert store.replace('g', {'level': 2}, None)
+    assert store.get('g') is None
+    assert not store.replace('missing', {'level': 1}, None)
+
+
+def twin(app, client):
+    """A second client on the same session, like a second tab sending the same request"""
+    other = app.test_client()
+    other.set_cookie('session', client.get_cookie('session').value)
+    return other
+
+
+@pytest.mark.parametrize('backend', ['memory', 'sql'])
+@pytest.mark.parametrize('module, start, cash_out', [
+    (games.mines, ('/games/mines', {'bet': 100, 'mines': 1}), '/games/mines/cashout'),
+    (games.ladder, ('/ladder_climb', {'bet': 100}), '/ladder_cashout'),
+    (games.balloon, ('/games/balloon_rise', {'bet': 100}), '/games/balloon_rise/cashout'),
+])
+def test_racing_cashouts_pay_once(app, users, client, monkeypatch, backend, module, start, cash_out):
+    app.config['GAME_STATE_BACKEND'] = backend
+    client.post(start[0], data=start[1])
+    other = twin(app, client)
+
+    # Both requests read the game before either settles it
+    name = module.plugin.name
+    with app.test_request_context():
+        with client.session_transaction() as session:
+            game_id = session[f'{name}_game_id']
+        snapshot = game_state_store().get(game_id)
+    if name == 'balloon':
+        snapshot['pop_time'] = 1000.0
+        with app.app_context():
+            game_state_store().set(game_id, snapshot)
+            db.session.commit()
+        monkeypatch.setattr(module, 'load_round', lambda: dict(snapshot))
+    else:
+        monkeypatch.setattr(module, 'load_game_state', lambda name: dict(snapshot))
+
+    client.get(cash_out)
+    other.get(cash_out)
+    with app.app_context():
+        assert db.session.get(User, users[0]).coins == 1000
+
+
+@pytest.mark.parametrize('backend', ['memory', 'sql'])
+def test_racing_blackjack_actions_settle_once(app, users, client, monkeypatch, backend):
+    from models import CoinLedger
+
+    app.config['GAME_STATE_BACKEND'] = backend
+    client.post('/games/blackjack', data={'bet': 10})
+    other = twin(app, client)
+    with app.test_request_context():
+        with client.session_transaction() as session:
+            snapshot = game_state_store().get(session['blackjack_game_id'])
+    load_game_state = games.blackjack.load_game_state
+    monkeypatch.setattr(games.blackjack, 'load_game_state',
+                        lambda name: dict(snapshot) if name == 'blackjack' else load_game_state(name))
+
+    client.get('/games/blackjack?action=double')
+    other.get('/games/blackjack?action=double')
+    with app.app_context():
+        reasons = [reason for reason, in db.session.query(CoinLedger.reason)]
+        assert reasons.count('double') == 1
+        assert reasons.count('payout') <= 1
+        assert db.session.get(User, users[0]).coins == 1000 + sum(delta for delta, in db.session.query(CoinLedger.delta))
@@ -0,0 +1,71 @@
+import importlib.metadata
+
+import pytest
+from flask import Blueprint
+
+from conftest import PASSWORD, add_user, make_app
+from extensions import db
+from games import GamePlugin, GameRegistry, game_registry
+from models import Game
+
+dice_bp = Blueprint('dice', __name__)
+dice_plugin = GamePlugin('dice', 'Dice', dice_bp, 'dice.dice', odds='test_games:DICE_ODDS')
+DICE_ODDS = {'six': 6}
+
+
+@dice_bp.route('/games/dice')
+def dice():
+    return 'dice'
+
+
+def signed_in(app):
+    with app.app_context():
+        add_user('player0')
+    client = app.test_client()
+    client.post('/login', data={'email': 'player0@example.com', 'password': PASSWORD})
+    return client
+
+
+def test_every_built_in_game_is_served_by_default(app, client):
+    with app.app_context():
+        plugins = list(game_registry())
+    assert [plugin.name for plugin in plugins] == ['blackjack', 'mines', 'slots', 'plinko', 'balloon', 'ladder']
+    assert all(plugin.engine is not None for plugin in plugins)
+    catalogue = client.get('/games').get_data(as_text=True)
+    assert all(plugin.title in catalogue for plugin in plugins)
+
+
+def test_a_node_serves_only_the_games_it_lists(tmp_path):
+    app = make_app(tmp_path, GAMES=['plinko', 'slots'])
+    client = signed_in(app)
+    with app.app_context():
+        assert [plugin.name for plugin in game_registry()] == ['plinko', 'slots']
+        db.session.add(Game(name='Mines', description='Find the gems', icon='mines'))
+        db.session.commit()
+        mines_id = Game.query.filter_by(name='Mines').one().id
+
+    assert client.get('/games/plinko').status_code == 200
+    assert client.get('/games/mines').status_code == 404
+    assert client.get(f'/play_game/{mines_id}').status_code == 404
+    assert client.get('/games/mines/odds').status_code == 404
+    catalogue = client.get('/games').get_data(as_text=True)
+    assert 'Plinko' in catalogue and 'Mines' not in catalogue
+
+
+def test_unknown_games_are_refused_at_startup(tmp_path):
+    with pytest.raises(ValueError, match='craps'):
+        make_app(tmp_path, GAMES=['slots', 'craps'])
+
+
+def test_installed_packages_add_games(tmp_path, monkeypatch):
+    installed = importlib.metadata.EntryPoint('dice', 'test_games:dice_plugin', 'arcade.games')
+    monkeypatch.setattr(importlib.metadata, 'entry_points',
+                        lambda group: [installed] if group == 'arcade.games' else [])
+    assert GameRegistry().entry_points['dice'] == 'test_games:dice_plugin'
+
+    app = make_app(tmp_path, GAMES=['dice'])
+    client = signed_in(app)
+    assert client.get('/games/dice').get_data(as_text=True) == 'dice'
+    response = client.get('/games/dice/odds')
+    assert response.json == DICE_ODDS
+    assert response.cache_control.max_age == 86400
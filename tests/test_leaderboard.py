@@ -0,0 +1,120 @@
+import random
+import statistics
+import time
+
+import pytest
+from flask_login import login_user
+from sqlalchemy import event, insert
+
+import social
+from coins import adjust_coins
+from conftest import add_user
+from extensions import db
+from models import User
+
+
+def ranked(users):
+    """The leaderboard order, worked out the slow way"""
+    return sorted(users, key=lambda user: (-user.coins, user.id))
+
+
+def test_rank_queries_match_a_full_sort(app):
+    rng = random.Random(7)
+    with app.app_context():
+        for i in range(40):
+            add_user(f'p{i}', coins=rng.choice([0, 50, 100, 100, 100, 250, 1000, 5000]))
+        order = ranked(User.query.all())
+
+        assert [user.id for user in social.get_top_users(10)] == [user.id for user in order[:10]]
+        for position, user in enumerate(order):
+            assert social.get_user_rank(user) == 1 + sum(other.coins > user.coins for other in order)
+            richer = [other.coins for other in order if other.coins > user.coins]
+            assert social.get_coins_to_next_rank(user) == (min(richer) - user.coins if richer else 0)
+            above, below = social.get_rank_neighbours(user)
+            assert above == order[max(position - 2, 0):position]
+            assert below == order[position + 1:position + 3]
+
+
+def test_rank_index_follows_committed_changes(app, users):
+    def ranks():
+        return {user.id: social.get_user_rank(user) for user in User.query}
+
+    def expected():
+        return {user.id: 1 + sum(other.coins > user.coins for other in User.query) for user in User.query}
+
+    with app.app_context():
+        app.config['LEADERBOARD_RANK_TTL'] = 3600  # no reloads: only the updates keep it right
+        assert ranks() == expected()
+        index = social.rank_index()
+
+        adjust_coins(db.session.get(User, users[1]), 500, 'slots', 'spin')
+        db.session.commit()
+        rich_id = add_user('rich', coins=9000)
+        assert ranks() == expected()
+
+        adjust_coins(db.session.get(User, users[2]), -300, 'slots', 'spin')
+        db.session.rollback()
+        user = db.session.get(User, users[0])
+        user.coins = 1200
+        db.session.delete(db.session.get(User, rich_id))
+        db.session.commit()
+        assert ranks() == expected()
+        assert social.get_coins_to_next_rank(user) == 300
+        assert len(index._coins) == 3
+
+
+def test_leaderboard_page(app, users, client):
+    with app.app_context():
+        User.query.filter_by(id=users[1]).update({User.coins: 5000})
+        db.session.commit()
+    page = client.get('/leaderboard')
+    assert page.status_code == 200
+    assert b'player1' in page.data
+
+
+# p50 and p99 at a million users may be at most this many times their values at a thousand
+LATENCY_GROWTH_LIMIT = 2
+
+
+@pytest.mark.slow
+def test_leaderboard_latency_from_1k_to_1m_users(app, capsys):
+    """p50/p99 of a leaderboard view as the user table grows from 1k to 1M rows; both must stay flat"""
+    rng = random.Random(1)
+    statements = []
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+        size = 0
+        report = []
+        for target in (1_000, 10_000, 100_000, 1_000_000):
+            while size < target:
+                batch = min(target - size, 50_000)
+                db.session.execute(insert(User), [
+                    {'username': f'bench{i}', 'email': f'bench{i}@example.com', 'password': '!',
+                     'coins': rng.randint(0, 100_000)}
+                    for i in range(size, size + batch)
+                ])
+                size += batch
+            db.session.commit()
+            social.rank_index().clear()  # the rows went in behind the ORM's back
+
+            timings, queries = [], []
+            for i, user_id in enumerate(rng.sample(range(1, size + 1), 501)):
+                with app.test_request_context('/leaderboard'):
+                    login_user(db.session.get(User, user_id))
+                    statements.clear()
+                    start = time.perf_counter()
+                    social.leaderboard()
+                    if i:  # the first view loads the rank index
+                        timings.append(time.perf_counter() - start)
+                        queries.append(len(statements))
+            quantiles = statistics.quantiles(timings, n=100)
+            report.append((size, quantiles[49] * 1000, quantiles[98] * 1000, max(queries)))
+
+    with capsys.disabled():
+        print()
+        for size, p50, p99, most_queries in report:
+            print(f'{size:>9,} users  p50={p50:.2f}ms  p99={p99:.2f}ms  queries<={most_queries}')
+    (_, p50_1k, p99_1k, _), (_, p50_1m, p99_1m, _) = report[0], report[-1]
+    assert p50_1m <= LATENCY_GROWTH_LIMIT * p50_1k
+    assert p99_1m <= LATENCY_GROWTH_LIMIT * p99_1k
+    assert len({most_queries for *_, most_queries in report}) == 1
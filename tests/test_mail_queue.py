@@ -0,0 +1,139 @@
+import asyncio
+import socket
+import time
+
+import pytest
+from aiosmtpd.controller import Controller
+
+from extensions import db
+from mailer import mail_dispatcher
+
+
+class Inbox:
+    """aiosmtpd handler that keeps what it receives; addresses in `flaky` are refused once"""
+
+    def __init__(self, flaky=()):
+        self.received = []
+        self.sessions = set()
+        self.flaky = set(flaky)
+        self.delay = 0
+
+    async def handle_DATA(self, server, session, envelope):
+        await asyncio.sleep(self.delay)
+        refused = self.flaky.intersection(envelope.rcpt_tos)
+        if refused:
+            self.flaky -= refused
+            return '451 Try again later'
+        self.sessions.add(session)
+        self.received.extend(envelope.rcpt_tos)
+        return '250 OK'
+
+
+@pytest.fixture
+def inbox(app):
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        port = s.getsockname()[1]
+    handler = Inbox(flaky={'flaky@example.com'})
+    controller = Controller(handler, hostname='127.0.0.1', port=port)
+    controller.start()
+    app.config.update(MAIL_SERVER='127.0.0.1', MAIL_PORT=port, MAIL_USE_TLS=False,
+                      MAIL_SUPPRESS_SEND=False, MAIL_DEFAULT_SENDER='arcade@example.com')
+    yield handler
+    controller.stop()
+
+
+def wait_for(condition, timeout=30):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.05)
+    return True
+
+
+def test_throughput_over_pooled_connections(app, inbox, capsys):
+    count = 1000
+    recipients = [f'player{i}@example.com' for i in range(count)]
+    with app.app_context():
+        dispatcher = mail_dispatcher()
+        start = time.perf_counter()
+        assert dispatcher.enqueue_many('Hello', recipients, 'text', '<p>html</p>', sender='arcade@example.com') == count
+        db.session.commit()
+        assert wait_for(lambda: len(inbox.received) >= count)
+        elapsed = time.perf_counter() - start
+        assert wait_for(lambda: dispatcher.pending_count() == 0, timeout=5)
+
+    assert sorted(inbox.received) == sorted(recipients)
+    # Each worker keeps one connection open instead of reconnecting per message
+    assert len(inbox.sessions) <= app.config['MAIL_WORKERS']
+    with capsys.disabled():
+        print(f"\nmail: {count} emails in {elapsed:.2f}s ({count / elapsed * 60:,.0f}/minute) "
+              f"over {len(inbox.sessions)} connections")
+
+
+def test_nothing_is_sent_unless_the_request_commits(app, inbox):
+    with app.app_context():
+        dispatcher = mail_dispatcher()
+        dispatcher.enqueue('Rolled back', ['nobody@example.com'], 'text', None)
+        db.session.rollback()
+        dispatcher.enqueue('Committed', ['somebody@example.com'], 'text', None)
+        db.session.commit()
+        assert wait_for(lambda: inbox.received)
+        dispatcher.wake()  # a full sweep finds nothing else to send
+        assert wait_for(lambda: dispatcher.pending_count() == 0, timeout=5)
+    assert inbox.received == ['somebody@example.com']
+
+
+def test_refused_message_is_retried(app, inbox):
+    with app.app_context():
+        dispatcher = mail_dispatcher()
+        dispatcher.backoff = dispatcher.poll_interval = 0.05
+        dispatcher.enqueue('Hello', ['flaky@example.com'], 'text', None)
+        db.session.commit()
+        # The server has the message a moment before the worker records it as sent
+        assert wait_for(lambda: dispatcher.pending_count() == 0, timeout=10)
+        row = db.session.execute(db.select(dispatcher.table)).one()
+    assert inbox.received == ['flaky@example.com']
+    assert (row.status, row.attempts) == ('sent', 2)
+
+
+def test_slow_server_does_not_outlive_the_lease(app, inbox):
+    inbox.delay = 0.05
+    recipients = [f'player{i}@example.com' for i in range(20)]
+    with app.app_context():
+        dispatcher = mail_dispatcher()
+        # The batch takes about 1s to send: three leases, unless the worker renews it
+        dispatcher.lease = 0.3
+        dispatcher.poll_interval = 0.05
+        dispatcher.enqueue_many('Hello', recipients, 'text', None)
+        db.session.commit()
+        assert wait_for(lambda: dispatcher.pending_count() == 0, timeout=10)
+        time.sleep(0.2)
+    assert sorted(inbox.received) == sorted(recipients)
+
+
+def test_worker_that_lost_its_lease_records_nothing(app):
+    with app.app_context():
+        dispatcher = mail_dispatcher()
+        dispatcher.lease = 0
+        dispatcher._insert_batch('Hello', ['a@example.com', 'b@example.com'], 'text', None, None)
+        db.session.commit()
+        first = dispatcher._claim()
+        second = dispatcher._claim()  # the lease has run out, so another worker takes the rows
+        assert [row.id for row in second] == [row.id for row in first]
+
+        dispatcher._finish([row.id for row in first], first[0].claim, status='sent')
+        assert dispatcher.pending_count() == 2
+        assert dispatcher._renew(first[0].claim) == set()
+        dispatcher._finish([row.id for row in second], second[0].claim, status='sent')
+        assert dispatcher.pending_count() == 0
+
+
+def test_signing_up_queues_the_confirmation_email(app, inbox):
+    client = app.test_client()
+    response = client.post('/register', data={'username': 'newbie', 'email': 'newbie@example.com',
+                                              'password': 'long enough', 'confirm_password': 'long enough'})
+    assert response.status_code == 302
+    assert wait_for(lambda: inbox.received)
+    assert inbox.received == ['newbie@example.com']
@@ -0,0 +1,24 @@
+import pytest
+from flask import g
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+import metrics
+from extensions import db
+
+
+def test_failed_statements_leave_no_timing_state_behind(app):
+    timed = []
+    metrics.on_statement(app, lambda statement, seconds: timed.append(statement))
+    with app.test_request_context():
+        app.preprocess_request()
+        info = dict(db.session.connection().info)
+        for _ in range(3):
+            with pytest.raises(OperationalError):
+                db.session.execute(text('SELECT * FROM no_such_table'))
+            db.session.rollback()
+        db.session.execute(text('SELECT 1'))
+
+        assert db.session.connection().info == info
+        assert timed == ['SELECT 1']
+        assert g.metrics['queries'] == 1
@@ -0,0 +1,63 @@
+import random
+from fractions import Fraction
+from math import comb, prod
+
+import mines_odds
+from extensions import db
+from games import game_state_store
+from models import User
+
+GRID = mines_odds.GRID_SIZE
+
+
+def survival_odds(mines, revealed):
+    """Chance of picking `revealed` safe tiles in a row, one pick at a time"""
+    return prod((Fraction(GRID - mines - i, GRID - i) for i in range(revealed)), start=Fraction(1))
+
+
+def test_table_matches_the_closed_form():
+    table = mines_odds.odds_table()
+    assert (table['grid_size'], table['min_mines'], table['max_mines']) == (GRID, 1, GRID - 1)
+    for m in range(1, GRID):
+        assert len(table['multipliers'][m]) == GRID - m + 1
+        for r in range(GRID - m + 1):
+            exact = Fraction(comb(GRID, r), comb(GRID - m, r))
+            assert mines_odds.EXACT_MULTIPLIERS[m][r] == exact
+            assert table['multipliers'][m][r] == mines_odds.multiplier(m, r) == float(exact)
+            assert table['basis_points'][m][r] == exact.numerator * 10000 // exact.denominator
+
+
+def test_random_boards_pay_the_inverse_of_surviving():
+    rng = random.Random(4)
+    for _ in range(500):
+        m = rng.randint(1, GRID - 1)
+        r = rng.randint(0, GRID - m)
+        # A fair game: the multiplier times the chance of reaching it is exactly one
+        assert mines_odds.EXACT_MULTIPLIERS[m][r] * survival_odds(m, r) == 1
+        if r < GRID - m:
+            assert mines_odds.multiplier(m, r + 1) > mines_odds.multiplier(m, r)
+        if m < GRID - 1 and r <= GRID - m - 1:
+            assert mines_odds.multiplier(m + 1, r) >= mines_odds.multiplier(m, r)
+
+
+def test_odds_endpoint_serves_the_table(client):
+    response = client.get('/games/mines/odds')
+    assert response.status_code == 200
+    assert response.cache_control.max_age == 86400
+    assert response.json['multipliers'] == [list(row) for row in mines_odds.MULTIPLIERS]
+
+
+def test_picks_and_cashout_use_the_table(app, users, client):
+    client.post('/games/mines', data={'bet': 100, 'mines': 5})
+    with client.session_transaction() as session:
+        game_id = session['mines_game_id']
+    with app.app_context():
+        mine_positions = game_state_store().get(game_id)['mine_positions']
+    safe = [tile for tile in range(GRID) if tile not in mine_positions]
+
+    for revealed, tile in enumerate(safe[:4], start=1):
+        pick = client.post(f'/games/mines/pick/{tile}').json
+        assert pick['multiplier'] == mines_odds.multiplier(5, revealed)
+    client.get('/games/mines/cashout')
+    with app.app_context():
+        assert db.session.get(User, users[0]).coins == 1000 - 100 + int(100 * mines_odds.multiplier(5, 4))
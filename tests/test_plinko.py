@@ -0,0 +1,72 @@
+import pytest
+
+import paytables
+import plinko_engine
+from extensions import db
+from models import CoinLedger, User
+
+
+def balance(user_id):
+    return db.session.get(User, user_id).coins
+
+
+@pytest.mark.parametrize('rows', sorted(paytables.PLINKO_PAYOUTS))
+def test_slot_is_the_number_of_right_bounces(rows):
+    engine = plinko_engine.get_engine(rows)
+    assert sum(engine.probabilities) == pytest.approx(1)
+    for _ in range(200):
+        path, slot = engine.drop()
+        assert sum(engine.path_bits(path)) == slot
+        assert len(engine.path_bits(path)) == rows
+
+
+def test_server_decides_the_drop_and_pays_its_slot(app, users, client, monkeypatch):
+    rows = paytables.PLINKO_DEFAULT_ROWS
+    monkeypatch.setattr(plinko_engine.random, 'getrandbits', lambda bits: (1 << bits) - 1)
+    # A slot or multiplier sent by the page is not the server's business
+    data = client.post('/games/plinko/play', data={'bet_amount': 100, 'slot': 7, 'multiplier': 1000}).json
+
+    payout = paytables.PLINKO_PAYOUTS[rows][rows]
+    assert data['path'] == [1] * rows
+    assert (data['slot'], data['multiplier']) == (rows, payout)
+    assert data['win_amount'] == int(100 * payout)
+    with app.app_context():
+        assert data['new_balance'] == balance(users[0]) == 1000 - 100 + int(100 * payout)
+
+
+@pytest.mark.parametrize('form', [
+    {'bet_amount': 0},
+    {'bet_amount': 1001},
+    {'bet_amount': 10, 'rows': 12},
+    {'bet_amount': 'ten'},
+])
+def test_bad_drops_are_refused_without_charging(app, users, client, form):
+    assert client.post('/games/plinko/play', data=form).status_code == 400
+    with app.app_context():
+        assert balance(users[0]) == 1000
+
+
+
+def test_batch_pays_the_sum_of_its_drops_in_one_change(app, users, client):
+    payouts = paytables.PLINKO_PAYOUTS[8]
+    data = client.post('/games/plinko/batch', json={'bet': 2, 'count': 400, 'rows': 8}).json
+
+    assert len(data['slots']) == 400 and set(data['slots']) <= set(range(9))
+    assert data['win_amount'] == sum(int(2 * payouts[slot]) for slot in data['slots'])
+    with app.app_context():
+        assert data['new_balance'] == balance(users[0]) == 1000 - 800 + data['win_amount']
+        entries = CoinLedger.query.filter_by(user_id=users[0]).all()
+        net = data['win_amount'] - 800
+        # A batch that breaks even leaves the balance, and so the ledger, untouched
+        assert [(entry.delta, entry.reason) for entry in entries] == ([(net, 'batch x400')] if net else [])
+
+
+@pytest.mark.parametrize('body', [
+    {'bet': 1, 'count': 0},
+    {'bet': 1, 'count': plinko_engine.MAX_BATCH + 1},
+    {'bet': 2, 'count': 501},  # stakes more than the balance, even if the winnings would cover it
+])
+def test_bad_batches_are_refused_without_charging(app, users, client, body):
+    assert client.post('/games/plinko/batch', json=body).status_code == 400
+    with app.app_context():
+        assert balance(users[0]) == 1000
@@ -0,0 +1,79 @@
+import logging
+
+from auth import ADMIN_EMAILS
+from conftest import PASSWORD, add_user, make_app
+from extensions import db
+from models import User
+from query_detector import diff_reports, fingerprint
+
+
+def test_fingerprints_ignore_values():
+    assert fingerprint("SELECT * FROM user WHERE id = 42 AND name = 'o''brien'") == \
+        fingerprint("SELECT *  FROM user\nWHERE id = 7 AND name = 'x'") == \
+        'SELECT * FROM user WHERE id = ? AND name = ?'
+    assert fingerprint('SELECT * FROM user WHERE id IN (?, ?, ?)') == fingerprint('SELECT * FROM user WHERE id IN (?)')
+
+
+def detected_app(tmp_path, **config):
+    app = make_app(tmp_path, QUERY_DETECTOR=True, QUERY_REPEAT_THRESHOLD=5, **config)
+
+    @app.route('/test/one-by-one')
+    def one_by_one():
+        # The N+1 shape: one lookup per row instead of one query for them all
+        ids = [user_id for user_id, in db.session.query(User.id)]
+        return ','.join(db.session.get(User, user_id).username for user_id in ids)
+
+    @app.route('/test/all-at-once')
+    def all_at_once():
+        return ','.join(user.username for user in User.query.all())
+
+    with app.app_context():
+        for i in range(8):
+            add_user(f'player{i}')
+    return app
+
+
+def test_repeated_queries_are_logged_and_reported(tmp_path, caplog):
+    app = detected_app(tmp_path)
+    client = app.test_client()
+    with caplog.at_level(logging.WARNING):
+        client.get('/test/one-by-one')
+        client.get('/test/all-at-once')
+
+    warnings = [record.getMessage() for record in caplog.records if 'Repeated query' in record.getMessage()]
+    assert len(warnings) == 1
+    assert 'in one_by_one' in warnings[0]
+    assert 'from tests/test_query_detector.py:' in warnings[0] and 'metrics.py' not in warnings[0]
+
+    report = app.extensions['query_detector'].report()
+    assert report['one_by_one']['max_queries'] == 9
+    [(statement, repeated)] = report['one_by_one']['repeated'].items()
+    assert statement.startswith('SELECT user.id') and repeated == {'requests': 1, 'max_repeats': 8}
+    assert report['all_at_once']['repeated'] == {}
+    assert report['all_at_once']['max_queries'] == 1
+
+
+def test_slow_queries_are_counted(tmp_path, caplog):
+    app = detected_app(tmp_path, SLOW_QUERY_MS=0)
+    with caplog.at_level(logging.WARNING):
+        app.test_client().get('/test/all-at-once')
+    assert any('Slow query in all_at_once' in record.getMessage() for record in caplog.records)
+    assert app.extensions['query_detector'].report()['all_at_once']['slow_queries'] == 1
+
+
+def test_report_is_served_to_admins_and_diffed(tmp_path):
+    app = detected_app(tmp_path)
+    email = sorted(ADMIN_EMAILS)[0]
+    with app.app_context():
+        db.session.get(User, add_user('admin')).email = email
+        db.session.commit()
+    client = app.test_client()
+    client.post('/login', data={'email': email, 'password': PASSWORD})
+    before = client.get('/admin/queries').json
+    client.get('/test/one-by-one')
+    after = client.get('/admin/queries').json
+
+    assert 'one_by_one' in after
+    lines = diff_reports(before, after)
+    assert any(line.startswith('+ one_by_one') for line in lines)
+    assert diff_reports(after, after) == []
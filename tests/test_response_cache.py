@@ -0,0 +1,82 @@
+import re
+
+import pytest
+
+import main
+from extensions import db
+from models import Game
+
+
+@pytest.fixture(params=['memory', 'disk'])
+def renders(request, app, monkeypatch):
+    """Templates rendered by the home and navbar views, with the cache on the given backend"""
+    app.config['RESPONSE_CACHE'] = request.param
+    rendered = []
+
+    def render_template(name, **context):
+        rendered.append(name)
+        return original(name, **context)
+    original = main.render_template
+    monkeypatch.setattr(main, 'render_template', render_template)
+    return rendered
+
+
+def live_coins(response):
+    return re.findall(rb'data-live-coins>(\d+)<', response.data)
+
+
+def test_revalidation_gets_a_304_without_rendering(renders, client):
+    first = client.get('/')
+    second = client.get('/')
+    assert renders == ['home.html']
+    assert first.data == second.data
+    assert second.headers['ETag'] == first.headers['ETag']
+    assert second.headers['Cache-Control'] == 'private, no-cache'
+
+    revalidated = client.get('/', headers={'If-None-Match': first.headers['ETag']})
+    assert revalidated.status_code == 304
+    assert revalidated.data == b''
+    assert renders == ['home.html']
+
+
+def test_a_bet_changes_the_etag_and_the_balance_shown(renders, client):
+    etag = client.get('/').headers['ETag']
+    coins = client.post('/games/slots/spin', json={'bet': 5}).json['coins']
+
+    page = client.get('/', headers={'If-None-Match': etag})
+    assert page.status_code == 200
+    assert page.headers['ETag'] != etag
+    assert set(live_coins(page)) == {str(coins).encode()}
+    assert renders == ['home.html']
+
+
+def test_each_player_gets_their_own_page(renders, client, login):
+    client.get('/navbar')
+    other = login('player1').get('/navbar')
+    assert renders == ['navbar.html', 'navbar.html']
+    assert b'player1' in other.data and b'player0' not in other.data
+
+
+def test_anonymous_pages_are_shared(renders, app):
+    first = app.test_client().get('/')
+    second = app.test_client().get('/')
+    assert renders == ['home.html']
+    assert second.headers['Cache-Control'] == 'no-cache'
+    assert first.data == second.data
+
+
+def test_catalog_changes_clear_the_cache_once_committed(renders, app, client):
+    client.get('/')
+    with app.app_context():
+        db.session.add(Game(name='Roulette', description='Red or black', icon='roulette.png'))
+        db.session.commit()
+    assert b'Roulette' in client.get('/').data
+    assert renders == ['home.html', 'home.html']
+
+    with app.app_context():
+        game = Game.query.filter_by(name='Roulette').one()
+        game.description = 'Never saved'
+        db.session.flush()
+        db.session.rollback()
+    assert client.get('/').status_code == 200
+    assert renders == ['home.html', 'home.html']
@@ -0,0 +1,56 @@
+import itertools
+import json
+
+import pytest
+
+import paytables
+from extensions import db
+from models import CoinLedger, User
+
+
+def paid(spin, bet):
+    return bet * paytables.SLOT_MULTIPLIER_TABLE[paytables.slot_index(*spin)]
+
+
+def test_lookup_table_matches_the_payout_rules():
+    symbols = paytables.SLOT_SYMBOLS
+    for spin in itertools.product(range(len(symbols)), repeat=3):
+        assert paid(spin, 1) == paytables.slots_multiplier([symbols[i] for i in spin])
+
+
+def test_batch_settles_every_spin_as_one_change(app, users, client):
+    data = client.post('/games/slots/spin_batch', json={'bet': 3, 'count': 200}).json
+
+    assert len(data['spins']) == 200
+    assert data['wins'] == [paid(spin, 3) for spin in data['spins']]
+    assert data['win'] == sum(data['wins'])
+    with app.app_context():
+        assert data['coins'] == db.session.get(User, users[0]).coins == 1000 - 600 + data['win']
+        assert CoinLedger.query.filter_by(user_id=users[0]).count() == 1
+
+
+def test_streamed_batch_sends_a_line_per_spin_then_the_total(app, users, client):
+    response = client.post('/games/slots/spin_batch', json={'bet': 2, 'count': 50, 'stream': True}, buffered=False)
+    assert response.is_streamed
+    assert response.mimetype == 'application/x-ndjson'
+
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    *spins, summary = lines
+    assert len(spins) == 50
+    assert all(line['win'] == paid(line['spin'], 2) for line in spins)
+    assert summary == {'done': True, 'win': sum(line['win'] for line in spins), 'coins': summary['coins']}
+    with app.app_context():
+        assert summary['coins'] == db.session.get(User, users[0]).coins == 1000 - 100 + summary['win']
+
+
+@pytest.mark.parametrize('body', [
+    {'bet': 1, 'count': 0},
+    {'bet': 1, 'count': paytables.SLOT_MAX_BATCH + 1},
+    {'bet': 0, 'count': 10},
+    {'bet': 11, 'count': 100},
+    {'bet': 'all', 'count': 10},
+])
+def test_bad_batches_are_refused_without_charging(app, users, client, body):
+    assert client.post('/games/slots/spin_batch', json=body).status_code == 400
+    with app.app_context():
+        assert db.session.get(User, users[0]).coins == 1000
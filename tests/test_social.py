@@ -0,0 +1,153 @@
+from coins import adjust_coins
+from conftest import add_user, counted_statements
+from extensions import db
+from models import FriendRequest, User
+from social import friend_graph
+
+
+def befriend(user_id, friend_id):
+    friendship = FriendRequest(user_id=user_id, friend_id=friend_id, status='accepted')
+    db.session.add(friendship)
+    db.session.commit()
+    friend_graph().invalidate(user_id, friend_id)
+    return friendship
+
+
+class FrozenRows(list):
+    """Rows already fetched, standing in for the Result they came from"""
+
+    def all(self):
+        return list(self)
+
+
+def test_lookup_racing_an_invalidation_is_not_cached(app, users, monkeypatch):
+    alice, bob, _ = users
+    with app.app_context():
+        friendship = befriend(alice, bob)
+        graph = friend_graph()
+        scalars = db.session.scalars
+
+        def unfriend_during_lookup(*args, **kwargs):
+            # Another request removes the friendship after this lookup read it
+            result = list(scalars(*args, **kwargs))
+            db.session.delete(friendship)
+            db.session.commit()
+            graph.invalidate(alice, bob)
+            return result
+
+        monkeypatch.setattr(db.session, 'scalars', unfriend_during_lookup)
+        assert graph.friend_ids(alice) == {bob}
+        monkeypatch.undo()
+
+        assert graph.friend_ids(alice) == frozenset()
+
+
+def test_leaderboard_racing_a_balance_change_is_not_cached(app, users, monkeypatch):
+    alice, bob, _ = users
+    with app.app_context():
+        befriend(alice, bob)
+        graph = friend_graph()
+        execute = db.session.execute
+
+        def win_during_lookup(*args, **kwargs):
+            # Bob's win commits after this board read the balances
+            rows = execute(*args, **kwargs).all()
+            adjust_coins(db.session.get(User, bob), 500, 'slots', 'win')
+            db.session.commit()
+            return FrozenRows(rows)
+
+        monkeypatch.setattr(db.session, 'execute', win_during_lookup)
+        graph.leaderboard(alice)
+        monkeypatch.undo()
+
+        assert {row['id']: row['coins'] for row in graph.leaderboard(alice)} == {alice: 1000, bob: 1500}
+
+
+def user_with_friends(name, count):
+    """Add `name` with `count` friends and as many pending requests; returns the friends' names"""
+    user_id = add_user(name)
+    friends = []
+    for i in range(count):
+        friends.append(f'{name}-friend{i}')
+        befriend(user_id, add_user(friends[-1]))
+        db.session.add(FriendRequest(user_id=add_user(f'{name}-fan{i}'), friend_id=user_id))
+    db.session.commit()
+    return friends
+
+
+def test_friends_page_queries_do_not_grow_with_friends(app, login):
+    queries = {}
+    for count in (2, 25):
+        with app.app_context():
+            friends = user_with_friends(f'social{count}', count)
+        client = login(f'social{count}')
+        with counted_statements(app) as statements:
+            page = client.get('/friends').get_data(as_text=True)
+        queries[count] = len(statements)
+        assert all(name in page for name in friends)
+        assert all(f'social{count}-fan{i}' in page for i in range(count))
+    assert queries[25] == queries[2]
+
+
+def test_friend_lookups_are_cached_until_a_friendship_changes(app, users, login):
+    alice, bob = login('player0'), login('player1')
+    with counted_statements(app) as cold:
+        alice.get('/friends')
+    with counted_statements(app) as warm:
+        alice.get('/friends')
+    assert any('UNION ALL' in statement for statement in cold)
+    assert not any('UNION ALL' in statement for statement in warm)
+
+    # Accepting a request drops both users' cached friend sets
+    bob.get('/friends')
+    bob.post('/add_friend', data={'username': 'player0'})
+    with app.app_context():
+        request_id = FriendRequest.query.filter_by(user_id=users[1]).one().id
+    alice.get(f'/accept_friend/{request_id}')
+    assert f'/friend_profile/{users[1]}' in alice.get('/friends').get_data(as_text=True)
+    assert f'/friend_profile/{users[0]}' in bob.get('/friends').get_data(as_text=True)
+
+
+def test_friend_leaderboard_ranks_friends_richest_first(app, users, login):
+    with app.app_context():
+        owner = add_user('owner', coins=1000)
+        for name, coins in [('rich', 5000), ('tied', 1000), ('poor', 10)]:
+            befriend(owner, add_user(name, coins=coins))
+        befriend(users[0], add_user('outsider', coins=9000))  # on nobody's board but player0's
+        befriend(users[0], owner)
+    data = login('owner').get('/api/leaderboard/friends').json
+
+    # Ties share a rank and are listed oldest account first
+    assert [(row['username'], row['coins'], row['rank']) for row in data['leaderboard']] == [
+        ('rich', 5000, 1), ('player0', 1000, 2), ('owner', 1000, 2), ('tied', 1000, 2), ('poor', 10, 5)]
+    assert (data['rank'], data['size']) == (2, 5)
+
+
+def test_friend_leaderboard_queries_do_not_grow_with_friends(app, login):
+    queries = {}
+    for count in (2, 25):
+        with app.app_context():
+            user_with_friends(f'board{count}', count)
+        client = login(f'board{count}')
+        with counted_statements(app) as statements:
+            assert client.get('/api/leaderboard/friends').json['size'] == count + 1
+        queries[count] = len(statements)
+    assert queries[25] == queries[2]
+
+
+def test_friend_leaderboard_shows_a_friend_win_once_it_commits(app, users, login):
+    with app.app_context():
+        befriend(users[0], users[1])
+    alice, bob = login('player0'), login('player1')
+    with counted_statements(app) as cold:
+        alice.get('/api/leaderboard/friends')
+    with counted_statements(app) as warm:
+        alice.get('/api/leaderboard/friends')
+    assert any('ORDER BY user.coins DESC' in statement for statement in cold)
+    assert not any('ORDER BY user.coins DESC' in statement for statement in warm)
+
+    bob.post('/games/plinko/batch', json={'bet': 1, 'count': 100})
+    with app.app_context():
+        coins = db.session.get(User, users[1]).coins
+    board = alice.get('/api/leaderboard/friends').json['leaderboard']
+    assert {row['id']: row['coins'] for row in board}[users[1]] == coins